@@ -0,0 +1,413 @@
+"""Offline benchmarks for the local (Layer 1) pipeline.
+
+Usage:
+    python -m jarvis.bench transcribe recording.wav [--modes fixed,vad,sliding]
+    python -m jarvis.bench wake fixtures/ [--baseline]
+    python -m jarvis.bench wake --vocab words.txt
+    python -m jarvis.bench encode [--encoders auto,pillow] [--frames 20]
+    python -m jarvis.bench pack [--minutes 60] [--budget 4000]
+    python -m jarvis.bench resample [--rates 48000:16000,24000:48000]
+
+Wake word fixtures are WAV files with an optional sidecar `<name>.json`
+holding {"wake_at": [seconds, ...]}, the times at which each spoken wake
+word ends. Files without a sidecar (or an empty list) are negatives.
+
+`wake --vocab` scores the wake word matcher on text alone: the share of a
+non-wake vocabulary (one word per line, plus known confusables) that would
+trigger or pre-connect at each threshold, against how many common
+mis-transcriptions of the wake word still match.
+"""
+
+import argparse
+import json
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from jarvis.config import (
+    SEND_SAMPLE_RATE,
+    VAD_BLOCK_SECONDS,
+    WHISPER_MODEL,
+    WAKE_WORD,
+    WAKE_SPOTTER_MODEL,
+    SCREEN_MAX_WIDTH,
+    SCREEN_JPEG_QUALITY,
+)
+from jarvis.utils.audio_utils import resample
+
+
+def load_wav(path, sample_rate=SEND_SAMPLE_RATE):
+    """Read a 16-bit PCM WAV file as mono int16 at `sample_rate`."""
+    with wave.open(str(path), "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return resample(audio, rate, sample_rate)
+
+
+def iter_blocks(audio, block_seconds=VAD_BLOCK_SECONDS, sample_rate=SEND_SAMPLE_RATE):
+    """Yield float32 blocks the size of the capture callback's blocks."""
+    size = int(block_seconds * sample_rate)
+    for i in range(0, len(audio) - size + 1, size):
+        yield np.multiply(audio[i:i + size], 1.0 / 32768.0, dtype=np.float32)
+
+
+def bench_transcribe(args):
+    from faster_whisper import WhisperModel
+    from jarvis.layer1.audio_capture import VoiceActivityGate
+    from jarvis.layer1.transcription import build_segmenter
+
+    audio = load_wav(args.wav)
+    duration = len(audio) / SEND_SAMPLE_RATE
+    model = WhisperModel(args.model, device="cpu", compute_type="int8")
+    print(f"{args.wav}: {duration:.1f}s of audio, model={args.model}")
+    print(f"{'mode':<8} {'whisper s':>10} {'busy s':>8} {'RTF':>6} {'vs fixed':>9} {'words':>6}")
+
+    baseline = None
+    for mode in args.modes.split(","):
+        gate = VoiceActivityGate() if mode != "fixed" else None
+        segmenter, merger = build_segmenter(mode, gate=gate)
+        whisper_samples = 0
+        busy = 0.0
+        words = 0
+
+        def run(start, chunk, final=False):
+            nonlocal whisper_samples, busy, words
+            started = time.perf_counter()
+            segments, _ = model.transcribe(
+                chunk, beam_size=1, language="en", vad_filter=False,
+                word_timestamps=merger is not None,
+            )
+            segments = list(segments)
+            busy += time.perf_counter() - started
+            whisper_samples += len(chunk)
+            if merger is not None:
+                text = merger.merge(start / SEND_SAMPLE_RATE, len(chunk) / SEND_SAMPLE_RATE,
+                                    segments, final=final)
+            else:
+                text = " ".join(s.text.strip() for s in segments)
+            words += len(text.split())
+
+        for block in iter_blocks(audio):
+            for start, chunk in segmenter.feed(block):
+                run(start, chunk)
+        for start, chunk in segmenter.flush():
+            run(start, chunk, final=True)
+
+        whisper_seconds = whisper_samples / SEND_SAMPLE_RATE
+        if baseline is None and mode == "fixed":
+            baseline = busy
+        rtf = busy / whisper_seconds if whisper_seconds else 0.0
+        relative = f"{busy / baseline:.2f}x" if baseline else "-"
+        print(f"{mode:<8} {whisper_seconds:>10.1f} {busy:>8.2f} {rtf:>6.2f} {relative:>9} {words:>6}")
+
+
+# Detections within this window (seconds, relative to the labelled end of the
+# wake word) count as hits; anything else is a false trigger.
+_WAKE_MATCH_WINDOW = (-0.5, 3.0)
+
+
+def _score_detections(detections, wake_at):
+    """Match detection times to labels; return (latencies, false_triggers, missed)."""
+    pending = sorted(wake_at)
+    latencies = []
+    false_triggers = 0
+    for t in detections:
+        hit = next((w for w in pending
+                    if _WAKE_MATCH_WINDOW[0] <= t - w <= _WAKE_MATCH_WINDOW[1]), None)
+        if hit is None:
+            false_triggers += 1
+        else:
+            pending.remove(hit)
+            latencies.append(t - hit)
+    return latencies, false_triggers, len(pending)
+
+
+def _spotter_detections(spotter, audio):
+    """Stream audio through the spotter; detection time = stream time + compute."""
+    detections = []
+    for i, block in enumerate(iter_blocks(audio)):
+        started = time.perf_counter()
+        if spotter.feed(block):
+            detections.append((i + 1) * VAD_BLOCK_SECONDS + time.perf_counter() - started)
+    return detections
+
+
+def _transcript_detections(model, audio):
+    """The transcript path: fixed chunks, full model, substring match.
+
+    Adds 0.25 s, the average wait of the wake loop's 0.5 s poll.
+    """
+    from jarvis.layer1.transcription import FixedChunker
+
+    detections = []
+    chunker = FixedChunker()
+    for start, chunk in (c for block in iter_blocks(audio) for c in chunker.feed(block)):
+        started = time.perf_counter()
+        segments, _ = model.transcribe(chunk, beam_size=1, language="en", vad_filter=False)
+        text = " ".join(s.text for s in segments).lower()
+        if WAKE_WORD in text:
+            end = (start + len(chunk)) / SEND_SAMPLE_RATE
+            detections.append(end + time.perf_counter() - started + 0.25)
+    return detections
+
+
+# Ordinary words that score high on raw edit-distance similarity to "jarvis".
+_WAKE_CONFUSABLES = [
+    "jars", "jar", "java", "paris", "davis", "travis", "marvin", "various",
+    "harvest", "arrives", "carries", "varies", "arise", "service", "nervous",
+    "jarred", "jargon", "jury", "charges", "garbage", "carvings", "marvel",
+]
+# Ways Whisper renders a spoken "Jarvis".
+_WAKE_VARIANTS = ["jarvis", "jarvis's", "jervis", "jarvus", "jarves", "javis", "jarvi", "jarviss"]
+_WAKE_THRESHOLDS = (0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 1.0)
+
+
+def _bench_wake_vocab(path):
+    from jarvis.layer1.wake_word import word_score
+
+    words = set(_WAKE_CONFUSABLES)
+    if path:
+        words.update(w.strip().lower() for w in Path(path).read_text().split())
+    words -= set(_WAKE_VARIANTS)
+    scores = {w: word_score(w) for w in words if w}
+    print(f"{len(scores)} non-wake words, {len(_WAKE_VARIANTS)} wake word renderings")
+    print(f"{'threshold':>9} {'false accepts':>14} {'rate':>8} {'recall':>7}  examples")
+    for threshold in _WAKE_THRESHOLDS:
+        accepted = sorted((w for w, score in scores.items() if score >= threshold),
+                          key=lambda w: -scores[w])
+        recall = sum(word_score(w) >= threshold for w in _WAKE_VARIANTS) / len(_WAKE_VARIANTS)
+        print(f"{threshold:>9.2f} {len(accepted):>14} {len(accepted) / len(scores):>8.2%} "
+              f"{recall:>7.2f}  {' '.join(accepted[:6])}")
+
+
+def bench_wake(args):
+    from jarvis.layer1.wake_word import KeywordSpotter
+
+    if args.vocab is not None or not args.fixtures:
+        _bench_wake_vocab(args.vocab)
+        if not args.fixtures:
+            return
+
+    fixtures = sorted(Path(args.fixtures).glob("*.wav"))
+    if not fixtures:
+        raise SystemExit(f"No WAV fixtures in {args.fixtures}")
+
+    engines = {"spotter": KeywordSpotter(model_name=args.model)}
+    engines["spotter"].load()
+    if args.baseline:
+        from faster_whisper import WhisperModel
+        engines["transcript"] = WhisperModel(WHISPER_MODEL, device="cpu", compute_type="int8")
+
+    for name, engine in engines.items():
+        latencies = []
+        false_triggers = missed = 0
+        total_seconds = 0.0
+        for path in fixtures:
+            sidecar = path.with_suffix(".json")
+            wake_at = json.loads(sidecar.read_text()).get("wake_at", []) if sidecar.exists() else []
+            audio = load_wav(path)
+            total_seconds += len(audio) / SEND_SAMPLE_RATE
+            if name == "spotter":
+                engine.reset()
+                detections = _spotter_detections(engine, audio)
+            else:
+                detections = _transcript_detections(engine, audio)
+            file_latencies, file_false, file_missed = _score_detections(detections, wake_at)
+            latencies += file_latencies
+            false_triggers += file_false
+            missed += file_missed
+            print(f"[{name}] {path.name}: hits={len(file_latencies)} missed={file_missed} "
+                  f"false={file_false}")
+
+        hours = total_seconds / 3600
+        print(f"[{name}] {len(fixtures)} files, {total_seconds:.0f}s of audio")
+        if latencies:
+            lat = np.array(latencies) * 1000
+            print(f"[{name}] latency ms: mean={lat.mean():.0f} p50={np.percentile(lat, 50):.0f} "
+                  f"p90={np.percentile(lat, 90):.0f} max={lat.max():.0f}")
+        recall = len(latencies) / (len(latencies) + missed) if latencies or missed else 0.0
+        print(f"[{name}] recall={recall:.2f} false triggers={false_triggers} "
+              f"({false_triggers / hours if hours else 0:.1f}/hour)")
+
+
+_RESOLUTIONS = [(1920, 1080), (2560, 1440), (3840, 2160), (5120, 2880)]
+
+
+def _synthetic_screen(width, height, seed=0):
+    """A BGRA buffer that looks vaguely like a desktop: flat panels plus text-like noise."""
+    rng = np.random.default_rng(seed)
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[:] = (240, 240, 240, 255)
+    for _ in range(12):
+        x, y = rng.integers(0, width - 200), rng.integers(0, height - 150)
+        w, h = rng.integers(200, width // 2), rng.integers(150, height // 2)
+        pixels[y:y + h, x:x + w, :3] = rng.integers(0, 255, 3)
+    text_rows = rng.random((height // 4, width // 2)) < 0.15
+    pixels[::4, ::2, :3][text_rows] = 20
+    return bytearray(pixels.tobytes())
+
+
+def _legacy_encode(raw, size):
+    """The original path: mss `.rgb` copy, full-res frombytes, LANCZOS, new BytesIO."""
+    import io
+
+    from mss.screenshot import ScreenShot
+    from PIL import Image
+
+    shot = ScreenShot(raw, {"left": 0, "top": 0, "width": size[0], "height": size[1]})
+    img = Image.frombytes("RGB", shot.size, shot.rgb)
+    width, height = img.size
+    if width > SCREEN_MAX_WIDTH:
+        img = img.resize((SCREEN_MAX_WIDTH, int(height * SCREEN_MAX_WIDTH / width)),
+                         Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=SCREEN_JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def bench_encode(args):
+    from jarvis.layer1.frame_encoder import get_encoder
+
+    paths = {"legacy": _legacy_encode}
+    for name in args.encoders.split(","):
+        try:
+            encoder = get_encoder(name)
+        except ImportError as e:
+            print(f"skipping {name}: {e}")
+            continue
+        paths[f"{name}:{encoder.name}" if name == "auto" else name] = encoder.encode
+
+    print(f"{'resolution':<11} " + " ".join(f"{name:>18}" for name in paths))
+    for width, height in _RESOLUTIONS:
+        raw = _synthetic_screen(width, height)
+        cells = []
+        for encode in paths.values():
+            encode(raw, (width, height))
+            started = time.perf_counter()
+            for _ in range(args.frames):
+                data = encode(raw, (width, height))
+            ms = (time.perf_counter() - started) / args.frames * 1000
+            cells.append(f"{ms:>8.1f} ms {len(data) // 1024:>4d}KB")
+        print(f"{width}x{height:<6} " + " ".join(f"{c:>18}" for c in cells))
+
+
+_PACK_TOPICS = [
+    "the quarterly budget review moved to Thursday afternoon",
+    "remember to email Dana the slides before the demo",
+    "the staging deploy failed because the migration timed out",
+    "we should book the flight to Berlin for the conference",
+]
+_PACK_FILLER = ["yeah", "okay so anyway", "Thank you. Thank you. Thank you.", "hmm let me see"]
+
+
+def bench_pack(args):
+    from jarvis.layer1.frame_encoder import get_encoder
+    from jarvis.layer2.context_pack import ContextPacker
+    from jarvis.utils.buffer import FrameBuffer, TranscriptBuffer
+
+    rng = np.random.default_rng(0)
+    now = time.time()
+    transcript = TranscriptBuffer(args.minutes)
+    count = int(args.minutes * 60 / 3)
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.3:
+            text = _PACK_FILLER[rng.integers(len(_PACK_FILLER))]
+        else:
+            text = f"{_PACK_TOPICS[rng.integers(len(_PACK_TOPICS))]} and item {i}"
+        transcript.add(text, timestamp=now - args.minutes * 60 + i * 3)
+    transcript.add("hey Jarvis what did we say about the staging deploy", timestamp=now)
+
+    encoder = get_encoder()
+    frames = FrameBuffer(args.frames)
+    for i in range(args.frames):
+        raw = _synthetic_screen(1280, 800, seed=i // 3)  # runs of identical screens
+        frames.add(encoder.encode(raw, (1280, 800)))
+
+    packer = ContextPacker(token_budget=args.budget)
+    segments = transcript.get_segments(now - args.minutes * 60 - 1)
+    started = time.perf_counter()
+    packed = packer.pack(segments, frames.get_frames(), now=now)
+    elapsed = (time.perf_counter() - started) * 1000
+    raw_tokens = sum(len(text) for _, text in segments) // 4
+
+    print(f"{len(segments)} segments (~{raw_tokens} tokens unpacked), {args.frames} frames")
+    print(f"packed in {elapsed:.1f} ms: {packed.report}")
+    print(f"frames kept: {[f.frame_id for f in packed.frames]}")
+    print("--- transcript (last 10 lines) ---")
+    print("\n".join(packed.text.splitlines()[-10:]))
+
+
+def bench_resample(args):
+    from jarvis.utils.audio_utils import StreamResampler
+
+    rng = np.random.default_rng(0)
+    print(f"{'rates':<14} {'taps':>5} {'Msamples/s':>11} {'x realtime':>11} {'chunk error':>12}")
+    for pair in args.rates.split(","):
+        orig, target = (int(r) for r in pair.split(":"))
+        audio = (rng.standard_normal(int(orig * args.seconds)) * 3000).astype(np.int16)
+        block = int(orig * VAD_BLOCK_SECONDS)
+
+        resampler = StreamResampler(orig, target)
+        started = time.perf_counter()
+        chunks = [resampler.process(audio[i:i + block]) for i in range(0, len(audio), block)]
+        elapsed = time.perf_counter() - started
+        streamed = np.concatenate(chunks)
+
+        # Streaming in blocks must give the same samples as one big call.
+        whole = StreamResampler(orig, target).process(audio)
+        error = float(np.abs(streamed - whole).max())
+        print(f"{pair:<14} {resampler._taps:>5} {len(audio) / elapsed / 1e6:>11.1f} "
+              f"{args.seconds / elapsed:>11.0f} {error:>12.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jarvis local pipeline benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("transcribe", help="Whisper compute per transcription mode")
+    p.add_argument("wav", help="16-bit PCM WAV recording")
+    p.add_argument("--modes", default="fixed,vad,sliding",
+                   help="Comma-separated modes; put 'fixed' first to get relative cost")
+    p.add_argument("--model", default=WHISPER_MODEL)
+    p.set_defaults(func=bench_transcribe)
+
+    p = sub.add_parser("wake", help="Wake word latency and false-trigger rate")
+    p.add_argument("fixtures", nargs="?", help="Directory of WAV fixtures (+ optional .json labels)")
+    p.add_argument("--vocab", help="Word list for the text-only false-accept measurement")
+    p.add_argument("--model", default=WAKE_SPOTTER_MODEL)
+    p.add_argument("--baseline", action="store_true",
+                   help="Also measure the transcript substring-match path")
+    p.set_defaults(func=bench_wake)
+
+    p = sub.add_parser("encode", help="Screen frame encode time per resolution")
+    p.add_argument("--encoders", default="auto,pillow",
+                   help="Comma-separated encoders to compare against the legacy path")
+    p.add_argument("--frames", type=int, default=20)
+    p.set_defaults(func=bench_encode)
+
+    p = sub.add_parser("pack", help="Context packing on synthetic buffers")
+    p.add_argument("--minutes", type=float, default=60)
+    p.add_argument("--frames", type=int, default=10)
+    p.add_argument("--budget", type=int, default=4000)
+    p.set_defaults(func=bench_pack)
+
+    p = sub.add_parser("resample", help="Streaming resampler throughput")
+    p.add_argument("--rates", default="48000:16000,44100:16000,24000:48000",
+                   help="Comma-separated source:target rate pairs")
+    p.add_argument("--seconds", type=float, default=60)
+    p.set_defaults(func=bench_resample)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -25,30 +25,209 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
 LIVE_API_MODEL = "gemini-2.5-flash-native-audio-preview-12-2025"
 BACKGROUND_MODEL = "gemini-3-flash-preview"
 
+# Client-side rate limits, shared by every caller in the process. Each
+# entry is a quota group: the listed models share one limiter, so the Live
+# session and background tasks draw on the same API key's budget and back
+# off together. Limits are requests per minute (token bucket holding up to
+# `burst`) and concurrent calls (a Live session holds one for its lifetime,
+# so leave room for a speculative one next to TASK_WORKERS). A 429 halves
+# the rate and holds all callers back for a jittered exponential backoff,
+# at least as long as the server's Retry-After; successes let the rate
+# recover. Models in no group get their own limiter with the default limits
+RATE_LIMITS = {
+    "gemini": {
+        "models": [LIVE_API_MODEL, BACKGROUND_MODEL],
+        "rpm": 60, "burst": 5, "concurrency": 5,
+    },
+}
+RATE_LIMIT_DEFAULT = {"rpm": 60, "burst": 5, "concurrency": 4}
+RATE_LIMIT_MAX_RETRIES = 4
+RATE_LIMIT_BACKOFF_BASE_SECONDS = 2
+RATE_LIMIT_BACKOFF_MAX_SECONDS = 60
+
 # Audio settings
 SEND_SAMPLE_RATE = 16000
 RECEIVE_SAMPLE_RATE = 24000
 AUDIO_CHANNELS = 1
 AUDIO_CHUNK_SIZE = 1024
 AUDIO_FORMAT_WIDTH = 2  # 16-bit = 2 bytes
+AUDIO_RING_SECONDS = 30  # captured audio kept for consumers that fall behind
+# Mic and speaker run at these rates (None = the device's native rate) and
+# audio is resampled to/from the API's rates in software
+AUDIO_CAPTURE_RATE = None
+PLAYBACK_DEVICE_RATE = None
+
+# Playback: the output device pulls PLAYBACK_BLOCK_MS blocks from a ring
+# buffer; a response starts playing once PLAYBACK_JITTER_MS is buffered
+PLAYBACK_BLOCK_MS = 20
+PLAYBACK_JITTER_MS = 60
+PLAYBACK_BUFFER_SECONDS = 120
 
 # Transcription settings
 WHISPER_MODEL = "base"
+# "vad": transcribe padded speech regions only
+# "sliding": overlapping windows merged by word timestamps (better recall at chunk edges)
+# "fixed": back-to-back chunks, speech or not (legacy)
+TRANSCRIPTION_MODE = "vad"
 TRANSCRIPTION_CHUNK_SECONDS = 3
+TRANSCRIPTION_WINDOW_SECONDS = 5.0
+TRANSCRIPTION_HOP_SECONDS = 3.0
+# Whisper runs off the event loop in a worker pool fed by a bounded queue
+WHISPER_WORKERS = 1
+WHISPER_WORKER_KIND = "thread"  # "thread" (shared model) or "process" (model per process)
+TRANSCRIPTION_QUEUE_MAX = 8
+TRANSCRIPTION_BACKLOG_HIGH_WATER = 3  # queued jobs before the backlog policy kicks in
+# "drop": discard the oldest queued audio
+# "merge": coalesce queued jobs into fewer, longer Whisper calls
+# "downgrade": switch to WHISPER_FALLBACK_MODEL until the backlog clears
+TRANSCRIPTION_BACKLOG_POLICY = "merge"
+WHISPER_FALLBACK_MODEL = "tiny.en"
+
+# Voice activity detection (only speech regions reach Whisper)
+VAD_BLOCK_SECONDS = 0.1  # matches the audio callback block size
+VAD_MIN_RMS = 0.003  # ~-50 dBFS; anything quieter is always treated as silence
+VAD_SNR_RATIO = 3.0  # speech must be this many times louder than the noise floor
+VAD_PADDING_SECONDS = 0.3  # audio kept before and after each speech region
+# A sound whose level stays within VAD_STEADY_RATIO for this long (a fan,
+# hum, a noisy room at startup) becomes the new noise floor
+VAD_STEADY_SECONDS = 5
+VAD_STEADY_RATIO = 1.5
+VAD_MAX_REGION_SECONDS = TRANSCRIPTION_CHUNK_SECONDS
 
 # Buffer settings
-TRANSCRIPT_BUFFER_MINUTES = 5
+TRANSCRIPT_BUFFER_MINUTES = 60
+TRANSCRIPT_CONTEXT_MINUTES = 5  # recent transcript handed to Live sessions and tasks
+# On-disk history of transcripts and frames that outlives the in-memory
+# buffers and restarts; the oldest segments are deleted past the size caps.
+# Off by default: it keeps every transcript and up to
+# CONTEXT_LOG_FRAME_MAX_BYTES of screenshots on disk
+CONTEXT_LOG_ENABLED = False
+CONTEXT_LOG_DIR = "~/.jarvis/context"
+CONTEXT_LOG_SEGMENT_BYTES = 16 * 1024 * 1024
+CONTEXT_LOG_TRANSCRIPT_MAX_BYTES = 64 * 1024 * 1024
+CONTEXT_LOG_FRAME_MAX_BYTES = 1024 * 1024 * 1024
+CONTEXT_LOG_RETENTION_INTERVAL_SECONDS = 60
+TRANSCRIPT_MAX_LOOKBACK_MINUTES = 240  # longest history a background task may ask for
+# Background tasks get the transcript excerpts most relevant to the task
+# (BM25 over buffered segments) instead of the whole recent transcript
+TASK_CONTEXT_TOP_K = 8
+TASK_CONTEXT_TOKEN_BUDGET = 1500
+# Background tasks run on a small worker pool; identical requests still in
+# flight share one run, and a session's tasks are cancelled when it ends
+TASK_WORKERS = 2
+TASK_QUEUE_MAX = 16
+# Results of recent background tasks are reused when the same task (same
+# description and context) comes in again. The disk tier lets them survive
+# restarts; off by default, since results are built from the transcript
+TASK_CACHE_ENABLED = True
+TASK_CACHE_MAX_ENTRIES = 64
+TASK_CACHE_TTL_SECONDS = 600
+TASK_CACHE_DISK_ENABLED = False
+TASK_CACHE_DIR = "~/.jarvis/task_cache"
+TASK_CACHE_DISK_MAX_ENTRIES = 256
+# Stream background task output and pass early findings to the Live session
+# once enough text has arrived, at a paragraph or sentence boundary
+TASK_STREAMING_ENABLED = True
+TASK_PROGRESS_MIN_CHARS = 400
+TASK_PROGRESS_MAX_CHARS = 1000
+TASK_PROGRESS_MIN_INTERVAL_SECONDS = 8
+# Context injected when a Live session starts is packed into a token budget:
+# transcript segments ranked by recency and relevance to what was just said,
+# repeats collapsed, and the most visually distinct buffered frames
+CONTEXT_PACK_TOKEN_BUDGET = 4000
+CONTEXT_PACK_MAX_FRAMES = 3
+CONTEXT_PACK_IMAGE_TOKENS = 258  # tokens the Live API charges per image
+CONTEXT_PACK_RECENCY_HALF_LIFE_SECONDS = 120
+CONTEXT_PACK_RELEVANCE_WEIGHT = 1.0
+CONTEXT_PACK_QUERY_SECONDS = 20  # the latest speech is the relevance query
+CONTEXT_PACK_MIN_FRAME_DISTANCE = 3.0  # mean grey-level difference for frames to count as distinct
 SCREEN_BUFFER_MAX_FRAMES = 10
+# Bound the frame buffer by memory instead of frame count (None = count mode).
+# Frames are then kept as high-quality source JPEGs, at most
+# SCREEN_SOURCE_WIDTH wide (crops at native resolution), and re-encoded on
+# demand at the size and quality each consumer asks for. A 1080p source is
+# roughly 150-400 KB, so the default holds a few dozen frames.
+SCREEN_BUFFER_MAX_BYTES = 8 * 1024 * 1024
+SCREEN_SOURCE_WIDTH = 1600
+SCREEN_SOURCE_QUALITY = 90
+SCREEN_CONTEXT_MAX_WIDTH = 1280  # frames injected as context at session start
 SCREEN_CAPTURE_FPS = 1
+# Adaptive capture rate: speed up while the screen changes or a Live session
+# is active, back off towards SCREEN_IDLE_INTERVAL_SECONDS on a static screen
+SCREEN_ADAPTIVE_RATE = True
+SCREEN_MIN_INTERVAL_SECONDS = 0.5
+SCREEN_IDLE_INTERVAL_SECONDS = 8.0
+SCREEN_BACKOFF_FACTOR = 1.5
+SCREEN_CPU_BUDGET = 0.05  # fraction of one core screen capture may use
 SCREEN_MAX_WIDTH = 1024
 SCREEN_JPEG_QUALITY = 50
+SCREEN_JPEG_ENCODER = "auto"  # "auto", "simplejpeg", "turbojpeg" or "pillow"
+SCREEN_RESAMPLE = "bilinear"  # filter for the final resize after an integer reduce
+# Native-resolution crop of the changed area, stored next to each thumbnail
+SCREEN_CROP_ENABLED = True
+SCREEN_CROP_MIN_SIZE = (640, 400)  # crops are grown to at least this (width, height)
+SCREEN_CROP_MAX_SIZE = (1280, 800)  # larger changes are left to the thumbnail
+SCREEN_CROP_CURSOR = False  # fall back to the area around the mouse cursor (needs pynput)
+# Skip encoding frames that have not visibly changed since the last stored one
+SCREEN_CHANGE_DETECTION = True
+SCREEN_CHANGE_GRID = (16, 9)  # cells compared between frames (columns, rows)
+SCREEN_CHANGE_THRESHOLD = 4.0  # mean abs difference (0-255) for a cell to count as changed
 
 # Wake word settings
 WAKE_WORD = "jarvis"
 WAKE_WORD_DEBOUNCE_SECONDS = 5
+# Fast keyword-spotting path: a tiny Whisper model on short overlapping
+# windows, running alongside the full transcriber
+WAKE_SPOTTER_ENABLED = True
+WAKE_SPOTTER_MODEL = "tiny.en"
+WAKE_SPOTTER_WINDOW_SECONDS = 1.2
+WAKE_SPOTTER_HOP_SECONDS = 0.4
+# A heard word is only compared with the wake word if it starts with the same
+# letter and its length is within WAKE_MAX_LENGTH_DIFF; then its fuzzy
+# similarity must reach WAKE_MATCH_THRESHOLD. Chosen with
+# 'python -m jarvis.bench wake --vocab words.txt'
+WAKE_MAX_LENGTH_DIFF = 1
+WAKE_MATCH_THRESHOLD = 0.8
+# A spotter window scoring at least this is a wake candidate: the Live API
+# connection is opened speculatively and kept warm for a short while. The
+# same first-letter and length check applies, so only near-misses such as
+# "jervis" or "jarvi" get here
+WAKE_CANDIDATE_THRESHOLD = 0.7
 
 # Session settings
 SILENCE_TIMEOUT_SECONDS = 30
+# Uplink to the Live API: mic audio goes out in fixed-size packets through a
+# bounded queue; packets are coalesced when the socket falls behind and the
+# oldest are dropped once the queue holds UPLINK_QUEUE_MAX_SECONDS of audio
+UPLINK_AUDIO_PACKET_MS = 40
+UPLINK_QUEUE_MAX_SECONDS = 2.0
+UPLINK_MAX_COALESCE_MS = 200
+UPLINK_FRAME_MAX_AGE_SECONDS = 2.0  # queued screen frames older than this are dropped
+# Screen frames are only sent when a new one was captured, no more often than
+# an interval and at a JPEG quality that adapt to the measured uplink: backed
+# off while sends are slow or frames would exceed their share of throughput
+UPLINK_FRAME_INTERVAL_SECONDS = 1.0  # starting interval
+UPLINK_FRAME_MIN_INTERVAL_SECONDS = 0.5
+UPLINK_FRAME_MAX_INTERVAL_SECONDS = 4.0
+UPLINK_JPEG_QUALITY_MIN = 25
+UPLINK_JPEG_QUALITY_MAX = 60
+UPLINK_VIDEO_BANDWIDTH_SHARE = 0.5  # fraction of measured throughput frames may use
+# Throughput is bytes drained per wall-clock window while the sender is backlogged
+UPLINK_THROUGHPUT_WINDOW_SECONDS = 2.0
+UPLINK_CONGESTION_LATENCY_SECONDS = 0.3  # send latency treated as a congested link
+LIVE_PRECONNECT_ENABLED = True
+LIVE_PRECONNECT_TTL_SECONDS = 10  # unused speculative connections are closed after this
+LIVE_PRECONNECT_MAX_PER_MINUTE = 3  # further candidates within the minute are ignored
+LIVE_CONNECT_TIMEOUT_SECONDS = 10
+
+# Built-in metrics, independent of Langfuse: Prometheus text at
+# http://METRICS_HTTP_HOST:METRICS_HTTP_PORT/metrics (JSON at /metrics.json;
+# None disables), and optionally a JSON snapshot file rewritten periodically
+METRICS_HTTP_HOST = "127.0.0.1"
+METRICS_HTTP_PORT = 9464
+METRICS_JSON_PATH = None  # e.g. "~/.jarvis/metrics.json"
+METRICS_JSON_INTERVAL_SECONDS = 60
+METRICS_HISTOGRAM_SUB_BUCKETS = 32  # histogram precision: about 1/32 relative error
 
 # Langfuse
 LANGFUSE_HOST = os.environ.get("LANGFUSE_HOST", "http://localhost:3001")
@@ -1,127 +1,354 @@
 import asyncio
 import logging
-import threading
+import time
+from collections import deque
+
 import numpy as np
-import sounddevice as sd
-from faster_whisper import WhisperModel
 
 from jarvis.config import (
     SEND_SAMPLE_RATE,
     AUDIO_CHANNELS,
-    WHISPER_MODEL,
-    TRANSCRIPTION_CHUNK_SECONDS,
+    AUDIO_CAPTURE_RATE,
+    AUDIO_RING_SECONDS,
+    TRANSCRIPTION_MODE,
+    VAD_BLOCK_SECONDS,
+    VAD_MIN_RMS,
+    VAD_SNR_RATIO,
+    VAD_PADDING_SECONDS,
+    VAD_MAX_REGION_SECONDS,
+    VAD_STEADY_SECONDS,
+    VAD_STEADY_RATIO,
 )
+from jarvis.layer1.transcription import TranscriptionScheduler, build_segmenter
+from jarvis.utils.audio_utils import StreamResampler, to_int16, peak
 from jarvis.utils.buffer import TranscriptBuffer
-from jarvis.utils.observe import trace_span, flush
+from jarvis.utils.ring_buffer import AudioRingBuffer
 
 log = logging.getLogger("jarvis.audio")
 
+_POLL_SECONDS = 0.2
+_STATS_LOG_INTERVAL_SECONDS = 60
+
+# Noise floor tracking: fall quickly when the room gets quieter, rise slowly
+# with the background. The floor only moves on blocks classified as
+# silence (or on a steady sound, see is_speech); letting speech blocks pull
+# it up makes long speech sink below the SNR threshold within seconds.
+_NOISE_FLOOR_FALL = 0.2
+_NOISE_FLOOR_RISE = 0.005
+
+
+class VoiceActivityGate:
+    """Streaming energy-based voice activity detector.
+
+    Fed one float32 block at a time (the 100 ms callback blocks). Silent
+    blocks are held back in a short pre-roll and dropped once they age out;
+    speech is collected into regions, padded on both sides, and returned as
+    soon as the speech ends or the region reaches its maximum length.
+    """
+
+    def __init__(
+        self,
+        sample_rate=SEND_SAMPLE_RATE,
+        block_seconds=VAD_BLOCK_SECONDS,
+        padding_seconds=VAD_PADDING_SECONDS,
+        max_region_seconds=VAD_MAX_REGION_SECONDS,
+        min_rms=VAD_MIN_RMS,
+        snr_ratio=VAD_SNR_RATIO,
+        steady_seconds=VAD_STEADY_SECONDS,
+        steady_ratio=VAD_STEADY_RATIO,
+    ):
+        self.sample_rate = sample_rate
+        self._pad_blocks = max(1, round(padding_seconds / block_seconds))
+        self._max_region_samples = int(max_region_seconds * sample_rate)
+        self._min_rms = min_rms
+        self._snr_ratio = snr_ratio
+        self._noise_floor = min_rms
+        self._steady_ratio = steady_ratio
+        self._recent_rms = deque(maxlen=max(1, round(steady_seconds / block_seconds)))
+
+        self._preroll = deque(maxlen=self._pad_blocks)
+        self._region = []
+        self._region_samples = 0
+        self._region_start = 0
+        self._silent_run = 0
+        self._position = 0
+
+        self.speech_samples = 0
+        self.skipped_samples = 0
+        self.region_count = 0
+
+    def is_speech(self, block):
+        """Classify a float32 block; silent blocks update the noise floor estimate.
+
+        The floor is frozen while blocks are classified as speech. The one
+        exception is a sound that has held a steady level (within
+        `steady_ratio`) for the whole steady window: speech never does, so
+        that level is taken as the new floor.
+        """
+        rms = float(np.sqrt(np.mean(np.square(block)))) if len(block) else 0.0
+        self._recent_rms.append(rms)
+        threshold = max(self._min_rms, self._noise_floor * self._snr_ratio)
+        if rms >= threshold:
+            recent = self._recent_rms
+            if len(recent) == recent.maxlen and max(recent) <= min(recent) * self._steady_ratio:
+                self._noise_floor = max(recent)
+                return False
+            return True
+        rate = _NOISE_FLOOR_FALL if rms < self._noise_floor else _NOISE_FLOOR_RISE
+        self._noise_floor += rate * (rms - self._noise_floor)
+        return False
+
+    def feed(self, block):
+        """Feed one block; return a list of finished (start_sample, audio) regions."""
+        start = self._position
+        self._position += len(block)
+        speech = self.is_speech(block)
+        regions = []
+
+        if self._region:
+            self._append(block)
+            if speech:
+                self._silent_run = 0
+            else:
+                self._silent_run += 1
+            if self._silent_run >= self._pad_blocks:
+                regions.append(self._close())
+            elif self._region_samples >= self._max_region_samples:
+                regions.append(self._close())
+        elif speech:
+            preroll = sum(len(b) for b in self._preroll)
+            self._region_start = start - preroll
+            for b in self._preroll:
+                self._append(b)
+            self._preroll.clear()
+            self._append(block)
+            if self._region_samples >= self._max_region_samples:
+                regions.append(self._close())
+        else:
+            if len(self._preroll) == self._preroll.maxlen:
+                self.skipped_samples += len(self._preroll[0])
+            self._preroll.append(block)
+
+        return regions
+
+    def skip(self, samples):
+        """Account for samples lost upstream; closes the open region."""
+        regions = self.flush()
+        self._preroll.clear()
+        self._position += samples
+        return regions
+
+    def flush(self):
+        """Close any open region, e.g. when the stream stops."""
+        if self._region:
+            return [self._close()]
+        return []
+
+    def _append(self, block):
+        self._region.append(block)
+        self._region_samples += len(block)
+
+    def _close(self):
+        audio = np.concatenate(self._region)
+        region = (self._region_start, audio)
+        self.speech_samples += self._region_samples
+        self.region_count += 1
+        self._region_start += self._region_samples
+        self._region = []
+        self._region_samples = 0
+        self._silent_run = 0
+        return region
+
+    def stats(self):
+        transcribed = self.speech_samples / self.sample_rate
+        skipped = self.skipped_samples / self.sample_rate
+        total = transcribed + skipped
+        return {
+            "transcribed_seconds": transcribed,
+            "skipped_seconds": skipped,
+            "skipped_ratio": skipped / total if total else 0.0,
+            "regions": self.region_count,
+        }
+
 
 class AudioCapture:
     """Captures system audio and transcribes it locally using faster-whisper."""
 
-    def __init__(self, transcript_buffer: TranscriptBuffer, device=None):
+    def __init__(self, transcript_buffer: TranscriptBuffer, device=None, mode=TRANSCRIPTION_MODE):
         self.transcript_buffer = transcript_buffer
         self.device = device
+        self.mode = mode
         self._running = False
-        self._whisper = None
-        self._audio_chunks = []
-        self._lock = threading.Lock()
+        self._loop = None
+        self._audio_events = set()
+        self.ring = AudioRingBuffer(int(AUDIO_RING_SECONDS * SEND_SAMPLE_RATE))
+        self._whisper_reader = self.ring.reader("whisper")
         self._chunk_count = 0
-
-    def _load_whisper(self):
-        if self._whisper is None:
-            log.info("Loading Whisper model: %s", WHISPER_MODEL)
-            self._whisper = WhisperModel(
-                WHISPER_MODEL, device="cpu", compute_type="int8"
-            )
-            log.info("Whisper model loaded")
+        self._vad = VoiceActivityGate() if mode != "fixed" else None
+        self._segmenter, self._merger = build_segmenter(mode, gate=self._vad)
+        self.scheduler = TranscriptionScheduler(
+            self._handle_result, word_timestamps=self._merger is not None
+        )
+        self._stream_samples = 0
+        self._resampler = None
+        self._peak = 0.0
 
     def _audio_callback(self, indata, frames, time_info, status):
         if status:
             log.warning("Audio status: %s", status)
-        audio_data = indata[:, 0].copy()
-        with self._lock:
-            self._audio_chunks.append(audio_data)
-
-    def _get_and_clear_chunks(self):
-        with self._lock:
-            chunks = self._audio_chunks.copy()
-            self._audio_chunks.clear()
-        if chunks:
-            return np.concatenate(chunks)
-        return None
+        samples = indata[:, 0]
+        if self._resampler is not None:
+            samples = to_int16(self._resampler.process(samples))
+        self.ring.write(samples)
+        loop = self._loop
+        if loop is not None:
+            for event in tuple(self._audio_events):
+                loop.call_soon_threadsafe(event.set)
+
+    def open_reader(self, name):
+        """Give a new consumer its own cursor into the captured audio stream."""
+        return self.ring.reader(name)
+
+    def audio_event(self):
+        """An asyncio.Event set whenever a captured block lands in the ring."""
+        event = asyncio.Event()
+        self._audio_events.add(event)
+        return event
+
+    def release_audio_event(self, event):
+        self._audio_events.discard(event)
+
+    def _warn_overrun(self, reader, lost):
+        log.warning("Audio consumer '%s' fell behind, dropped %.1fs (overruns=%d)",
+                    reader.name, lost / SEND_SAMPLE_RATE, reader.overruns)
 
     async def start(self):
-        self._load_whisper()
+        await self.scheduler.start()
         self._running = True
+        self._loop = asyncio.get_running_loop()
+
+        # Imported here so the VAD gate can be used without PortAudio.
+        import sounddevice as sd
 
         dev_info = sd.query_devices(self.device, 'input') if self.device is not None else sd.query_devices(kind='input')
         log.info("Using audio device: %s (index=%s, sr=%.0f)",
                  dev_info['name'], dev_info.get('index', self.device), dev_info['default_samplerate'])
 
+        # Capture at the device's own rate and resample in the callback
+        # rather than making the driver convert to SEND_SAMPLE_RATE.
+        rate = int(AUDIO_CAPTURE_RATE or dev_info['default_samplerate'])
+        if rate != SEND_SAMPLE_RATE:
+            self._resampler = StreamResampler(rate, SEND_SAMPLE_RATE)
+
         stream = sd.InputStream(
-            samplerate=SEND_SAMPLE_RATE,
+            samplerate=rate,
             channels=AUDIO_CHANNELS,
             dtype="int16",
             device=self.device,
             callback=self._audio_callback,
-            blocksize=int(SEND_SAMPLE_RATE * 0.1),
+            blocksize=int(rate * VAD_BLOCK_SECONDS),
         )
 
-        with stream:
-            log.info("Audio stream started (rate=%d, channels=%d)", SEND_SAMPLE_RATE, AUDIO_CHANNELS)
-            while self._running:
-                await asyncio.sleep(TRANSCRIPTION_CHUNK_SECONDS)
-                audio_data = self._get_and_clear_chunks()
-                if audio_data is not None and len(audio_data) > 0:
-                    self._chunk_count += 1
-                    rms = np.sqrt(np.mean(audio_data.astype(np.float64) ** 2))
-                    peak = np.max(np.abs(audio_data))
-                    log.debug(
-                        "Audio chunk #%d: samples=%d, duration=%.1fs, rms=%.0f, peak=%d (of 32768)",
-                        self._chunk_count, len(audio_data),
-                        len(audio_data) / SEND_SAMPLE_RATE,
-                        rms, peak,
-                    )
-                    if peak < 100:
-                        log.debug("Audio level very low (peak=%d) — mic may not be capturing", peak)
-                    await self._transcribe(audio_data)
-                else:
-                    log.debug("No audio data received in chunk window")
-
-    async def _transcribe(self, audio_data):
         try:
-            audio_float = audio_data.astype(np.float32) / 32768.0
-            max_val = np.max(np.abs(audio_float))
-            log.debug("Whisper input: max_amplitude=%.4f, duration=%.1fs",
-                       max_val, len(audio_float) / SEND_SAMPLE_RATE)
-
-            segments, info = await asyncio.to_thread(
-                self._whisper.transcribe,
-                audio_float,
-                beam_size=1,
-                language="en",
-                vad_filter=False,
+            with stream:
+                log.info("Audio stream started (rate=%d -> %d, channels=%d, mode=%s)",
+                         rate, SEND_SAMPLE_RATE, AUDIO_CHANNELS, self.mode)
+                await self._run_transcription_loop()
+        finally:
+            await self.scheduler.stop()
+            self._log_stats()
+
+    async def _run_transcription_loop(self):
+        """Feed captured blocks through the segmenter and queue what it emits."""
+        block_size = int(SEND_SAMPLE_RATE * VAD_BLOCK_SECONDS)
+        last_stats_log = time.monotonic()
+        while self._running:
+            await asyncio.sleep(_POLL_SECONDS)
+            blocks, lost = self._whisper_reader.read_blocks(block_size)
+            if lost:
+                self._warn_overrun(self._whisper_reader, lost)
+                for start, audio in self._segmenter.skip(lost):
+                    self._submit(start, audio)
+            for block in blocks:
+                block = np.multiply(block, 1.0 / 32768.0, dtype=np.float32)
+                self._stream_samples += len(block)
+                self._peak = max(self._peak, peak(block))
+                for start, audio in self._segmenter.feed(block):
+                    self._submit(start, audio)
+
+            now = time.monotonic()
+            if now - last_stats_log >= _STATS_LOG_INTERVAL_SECONDS:
+                last_stats_log = now
+                self._log_stats()
+
+        for start, audio in self._segmenter.flush():
+            self._submit(start, audio, final=True)
+
+    def _submit(self, start, audio_float, final=False):
+        self._chunk_count += 1
+        log.debug("Whisper input #%d: start=%.1fs, duration=%.1fs, max_amplitude=%.4f",
+                   self._chunk_count, start / SEND_SAMPLE_RATE,
+                   len(audio_float) / SEND_SAMPLE_RATE, np.max(np.abs(audio_float)))
+        self.scheduler.submit(start, audio_float, final=final)
+
+    def _handle_result(self, job, segments):
+        log.debug("Whisper returned %d segments", len(segments))
+        if self._merger is not None:
+            text = self._merger.merge(
+                job.start / SEND_SAMPLE_RATE, len(job.audio) / SEND_SAMPLE_RATE,
+                segments, final=job.final,
             )
-            segments = list(segments)
-            log.debug("Whisper returned %d segments (lang=%s, prob=%.2f)",
-                       len(segments), info.language, info.language_probability)
+            texts = [text] if text else []
+        else:
+            texts = [s.text.strip() for s in segments if s.text.strip()]
 
-            for segment in segments:
-                text = segment.text.strip()
-                if text:
-                    self.transcript_buffer.add(text)
-                    log.info("TRANSCRIPT: '%s'", text)
+        for text in texts:
+            self.transcript_buffer.add(text)
+            log.info("TRANSCRIPT: '%s'", text)
+
+        if not segments:
+            log.debug("No speech detected in chunk")
+
+    def _log_stats(self):
+        stats = self.transcription_stats()
+        log.info(
+            "Transcription (%s): %.0fs of audio, %.0fs sent to Whisper "
+            "(compute ratio %.2f, RTF %.2f, queue %d, lag %.1fs, dropped %.0fs)",
+            self.mode, stats["stream_seconds"], stats["audio_seconds"],
+            stats["compute_ratio"], stats["real_time_factor"],
+            stats["queue_depth"], stats["lag_seconds"], stats["dropped_seconds"],
+        )
+        if self._peak:
+            log.info("Input peak since last report: %.1f dBFS", 20 * np.log10(self._peak))
+            self._peak = 0.0
+        vad = self.vad_stats()
+        if vad:
+            log.info(
+                "VAD: transcribed %.0fs, skipped %.0fs of silence (%.0f%% saved, %d regions)",
+                vad["transcribed_seconds"], vad["skipped_seconds"],
+                vad["skipped_ratio"] * 100, vad["regions"],
+            )
 
-            if not segments:
-                log.debug("No speech detected in chunk")
+    def transcription_stats(self):
+        """Whisper workload and backlog relative to the captured stream.
 
-        except Exception as e:
-            log.error("Transcription error: %s", e, exc_info=True)
+        `compute_ratio` is seconds of audio transcribed per second captured:
+        1.0 for fixed chunks, lower with VAD gating, and up to window/hop
+        for overlapping windows. `lag_seconds` is how long the latest job
+        waited between capture and transcript.
+        """
+        stats = self.scheduler.stats()
+        stream = self._stream_samples / SEND_SAMPLE_RATE
+        stats["stream_seconds"] = stream
+        stats["compute_ratio"] = stats["audio_seconds"] / stream if stream else 0.0
+        stats["jobs"] = self._chunk_count
+        return stats
 
-    def get_raw_audio_for_streaming(self):
-        return self._get_and_clear_chunks()
+    def vad_stats(self):
+        """Seconds of audio sent to Whisper versus skipped as silence."""
+        if self.mode != "vad":
+            return None
+        return self._vad.stats()
 
     def stop(self):
         self._running = False
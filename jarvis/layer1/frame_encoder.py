@@ -0,0 +1,136 @@
+import io
+import logging
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from jarvis.config import (
+    SCREEN_MAX_WIDTH,
+    SCREEN_JPEG_QUALITY,
+    SCREEN_JPEG_ENCODER,
+    SCREEN_RESAMPLE,
+)
+from jarvis.utils.metrics import histogram
+
+log = logging.getLogger("jarvis.encoder")
+
+_encode_metric = histogram("jarvis_frame_encode_ms", "Time to scale and JPEG-encode one image")
+
+_RESAMPLE_FILTERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "bilinear": Image.Resampling.BILINEAR,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+
+
+class FrameEncoder:
+    """Turns a raw BGRA screen grab into a downscaled JPEG.
+
+    The BGRA buffer from mss is decoded straight into an RGB image (no
+    intermediate `.rgb` copy), shrunk by an integer box-filter `reduce`
+    first and only then resized to the exact width with a cheap filter.
+    Subclasses swap in a different JPEG backend by overriding
+    `_encode_jpeg`.
+    """
+
+    name = "pillow"
+
+    def __init__(self, quality=SCREEN_JPEG_QUALITY, resample=SCREEN_RESAMPLE):
+        self.quality = quality
+        self._resample = _RESAMPLE_FILTERS[resample]
+        self._out = io.BytesIO()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def to_image(raw, size):
+        """Wrap a BGRA buffer as an RGB image in a single decode pass."""
+        return Image.frombuffer("RGB", size, raw, "raw", "BGRX", 0, 1)
+
+    def scale(self, img, max_width=SCREEN_MAX_WIDTH):
+        width, height = img.size
+        if not max_width or width <= max_width:
+            return img
+        factor = width // max_width
+        if factor > 1:
+            img = img.reduce(factor)
+        new_height = int(height * max_width / width)
+        if img.size != (max_width, new_height):
+            img = img.resize((max_width, new_height), self._resample)
+        return img
+
+    def encode_image(self, img, max_width=SCREEN_MAX_WIDTH, quality=None):
+        started = time.perf_counter()
+        img = self.scale(img, max_width)
+        data = self._encode_jpeg(img, quality or self.quality)
+        _encode_metric.record((time.perf_counter() - started) * 1000)
+        return data
+
+    def encode(self, raw, size, max_width=SCREEN_MAX_WIDTH, quality=None):
+        return self.encode_image(self.to_image(raw, size), max_width, quality)
+
+    def _encode_jpeg(self, img, quality):
+        # One output buffer reused across frames; getvalue() hands out a copy.
+        with self._lock:
+            self._out.seek(0)
+            self._out.truncate()
+            img.save(self._out, format="JPEG", quality=quality)
+            return self._out.getvalue()
+
+
+class SimpleJpegEncoder(FrameEncoder):
+    """libjpeg-turbo through the `simplejpeg` package."""
+
+    name = "simplejpeg"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        import simplejpeg
+
+        self._simplejpeg = simplejpeg
+
+    def _encode_jpeg(self, img, quality):
+        return self._simplejpeg.encode_jpeg(
+            np.asarray(img), quality=quality, colorspace="RGB", fastdct=True
+        )
+
+
+class TurboJpegEncoder(FrameEncoder):
+    """libjpeg-turbo through the `PyTurboJPEG` package."""
+
+    name = "turbojpeg"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        from turbojpeg import TJPF_RGB, TurboJPEG
+
+        self._turbo = TurboJPEG()
+        self._pixel_format = TJPF_RGB
+
+    def _encode_jpeg(self, img, quality):
+        return self._turbo.encode(
+            np.asarray(img), quality=quality, pixel_format=self._pixel_format
+        )
+
+
+ENCODERS = {
+    "simplejpeg": SimpleJpegEncoder,
+    "turbojpeg": TurboJpegEncoder,
+    "pillow": FrameEncoder,
+}
+
+
+def get_encoder(name=SCREEN_JPEG_ENCODER, **kwargs):
+    """Build the named encoder; "auto" picks the fastest backend installed."""
+    if name != "auto":
+        return ENCODERS[name](**kwargs)
+    for candidate in ENCODERS.values():
+        try:
+            encoder = candidate(**kwargs)
+        except Exception:
+            continue
+        log.info("Using %s JPEG encoder", encoder.name)
+        return encoder
+    return FrameEncoder(**kwargs)
@@ -1,19 +1,182 @@
 import asyncio
-import io
 import logging
+import time
 
 import mss
-from PIL import Image
+import numpy as np
 
 from jarvis.config import (
     SCREEN_CAPTURE_FPS,
+    SCREEN_ADAPTIVE_RATE,
+    SCREEN_MIN_INTERVAL_SECONDS,
+    SCREEN_IDLE_INTERVAL_SECONDS,
+    SCREEN_BACKOFF_FACTOR,
+    SCREEN_CPU_BUDGET,
+    SCREEN_CHANGE_DETECTION,
+    SCREEN_CHANGE_GRID,
+    SCREEN_CHANGE_THRESHOLD,
+    SCREEN_CROP_ENABLED,
+    SCREEN_CROP_MIN_SIZE,
+    SCREEN_CROP_MAX_SIZE,
+    SCREEN_CROP_CURSOR,
     SCREEN_MAX_WIDTH,
-    SCREEN_JPEG_QUALITY,
+    SCREEN_SOURCE_WIDTH,
+    SCREEN_SOURCE_QUALITY,
 )
+from jarvis.layer1.frame_encoder import get_encoder
 from jarvis.utils.buffer import FrameBuffer
 
 log = logging.getLogger("jarvis.screen")
 
+# Width of the luma thumbnail the change detector compares.
+_DETECTOR_WIDTH = 256
+_COST_SMOOTHING = 0.2
+
+
+class FrameChangeDetector:
+    """Cheap block-diff change detector on the raw BGRA screenshot buffer.
+
+    Samples the green channel of the mss buffer with a stride (no copy of the
+    full frame, no colour conversion) into a small thumbnail, splits it into a
+    grid of cells and compares each cell's mean absolute difference against
+    the last frame that was kept.
+    """
+
+    def __init__(self, grid=SCREEN_CHANGE_GRID, threshold=SCREEN_CHANGE_THRESHOLD):
+        self._cols, self._rows = grid
+        self._threshold = threshold
+        self._previous = None
+        self._step = 1
+        self._cell_size = (1, 1)
+        self.changed_cells = None
+
+    def _thumbnail(self, raw, width, height):
+        pixels = np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4)
+        self._step = max(1, width // _DETECTOR_WIDTH)
+        return pixels[::self._step, ::self._step, 1].astype(np.int16)
+
+    def check(self, raw, width, height):
+        """Return True if the frame differs from the last accepted one.
+
+        The new frame becomes the reference only when it counts as changed,
+        so slow drift still adds up to a change eventually.
+        """
+        thumb = self._thumbnail(raw, width, height)
+        previous = self._previous
+        if previous is None or previous.shape != thumb.shape:
+            self._previous = thumb
+            self.changed_cells = np.ones((self._rows, self._cols), dtype=bool)
+            return True
+
+        diff = np.abs(thumb - previous)
+        h, w = diff.shape
+        rows = min(self._rows, h)
+        cols = min(self._cols, w)
+        cell_h, cell_w = h // rows, w // cols
+        self._cell_size = (cell_w, cell_h)
+        cells = diff[:rows * cell_h, :cols * cell_w].reshape(rows, cell_h, cols, cell_w)
+        self.changed_cells = cells.mean(axis=(1, 3)) > self._threshold
+        if self.changed_cells.any():
+            self._previous = thumb
+            return True
+        return False
+
+    def changed_box(self):
+        """Bounding box (left, top, right, bottom) of the changed cells in screen pixels."""
+        if self.changed_cells is None:
+            return None
+        rows, cols = np.nonzero(self.changed_cells)
+        if len(rows) == 0:
+            return None
+        cell_w, cell_h = self._cell_size
+        scale = self._step
+        return (
+            int(cols.min() * cell_w * scale),
+            int(rows.min() * cell_h * scale),
+            int((cols.max() + 1) * cell_w * scale),
+            int((rows.max() + 1) * cell_h * scale),
+        )
+
+    def reset(self):
+        self._previous = None
+        self.changed_cells = None
+
+
+def fit_crop_box(box, screen_size, min_size=SCREEN_CROP_MIN_SIZE, max_size=SCREEN_CROP_MAX_SIZE):
+    """Grow `box` to at least `min_size` around its centre, clamped to the screen.
+
+    Returns None when the box is larger than `max_size`: a change that big is
+    better served by the full-screen thumbnail.
+    """
+    left, top, right, bottom = box
+    screen_w, screen_h = screen_size
+    width, height = right - left, bottom - top
+    if width > max_size[0] or height > max_size[1]:
+        return None
+    width = min(max(width, min_size[0]), screen_w)
+    height = min(max(height, min_size[1]), screen_h)
+    cx, cy = (left + right) // 2, (top + bottom) // 2
+    left = min(max(0, cx - width // 2), screen_w - width)
+    top = min(max(0, cy - height // 2), screen_h - height)
+    return (left, top, left + width, top + height)
+
+
+class AdaptiveCaptureRate:
+    """Chooses the delay before the next screen capture.
+
+    A changed frame snaps the interval down to the fastest rate; every
+    unchanged frame backs it off geometrically, up to the idle interval in
+    passive mode or the base `SCREEN_CAPTURE_FPS` interval during a Live
+    session. The interval never drops below what keeps the measured capture
+    cost within `cpu_budget` of one core.
+    """
+
+    def __init__(
+        self,
+        base_interval=1.0 / SCREEN_CAPTURE_FPS,
+        min_interval=SCREEN_MIN_INTERVAL_SECONDS,
+        idle_interval=SCREEN_IDLE_INTERVAL_SECONDS,
+        backoff=SCREEN_BACKOFF_FACTOR,
+        cpu_budget=SCREEN_CPU_BUDGET,
+    ):
+        self._base = base_interval
+        self._min = min_interval
+        self._idle = idle_interval
+        self._backoff = backoff
+        self._budget = cpu_budget
+        self._cost = None
+        self.live = False
+        self.interval = base_interval
+
+    @property
+    def ceiling(self):
+        return self._base if self.live else self._idle
+
+    @property
+    def budget_floor(self):
+        if self._cost is None or self._budget <= 0:
+            return self._min
+        return max(self._min, self._cost / self._budget)
+
+    def update(self, changed, cost_seconds):
+        """Record one capture's outcome and CPU cost; return the next interval."""
+        if self._cost is None:
+            self._cost = cost_seconds
+        else:
+            self._cost += _COST_SMOOTHING * (cost_seconds - self._cost)
+
+        if changed:
+            interval = self._min
+        else:
+            interval = self.interval * self._backoff
+        self.interval = min(max(interval, self.budget_floor), max(self.ceiling, self.budget_floor))
+        return self.interval
+
+    def set_live(self, live):
+        self.live = live
+        if live:
+            self.interval = max(self._min, self.budget_floor)
+
 
 class ScreenCapture:
     """Captures screen at regular intervals and stores in rolling buffer."""
@@ -23,51 +186,184 @@ class ScreenCapture:
         self._running = False
         self._sct = None
         self._capture_count = 0
+        self._detector = FrameChangeDetector() if SCREEN_CHANGE_DETECTION else None
+        self._encoder = get_encoder()
+        self._rate = AdaptiveCaptureRate() if SCREEN_ADAPTIVE_RATE else None
+        self._rate_changed = None
+        self._mouse = None
+
+        self.frames_captured = 0
+        self.frames_skipped = 0
+        self.frames_encoded = 0
+        self.crops_encoded = 0
+        self.sources_encoded = 0
 
-    def _capture_frame(self):
+    def _capture_frame(self, force=False):
+        """Grab the screen; return (image, crop_image, crop_box), or None if nothing changed."""
         if self._sct is None:
             self._sct = mss.mss()
 
         monitor = self._sct.monitors[1]
         screenshot = self._sct.grab(monitor)
+        self.frames_captured += 1
 
-        img = Image.frombytes("RGB", screenshot.size, screenshot.rgb)
+        if self._detector is not None:
+            changed = self._detector.check(
+                screenshot.raw, screenshot.width, screenshot.height
+            )
+            if not changed and not force:
+                self.frames_skipped += 1
+                return None
+
+        img = self._encoder.to_image(screenshot.raw, screenshot.size)
+        crop_img = crop_box = None
+        if SCREEN_CROP_ENABLED:
+            crop_box = self._crop_box(monitor, screenshot.size)
+            if crop_box is not None:
+                crop_img = img.crop(crop_box)
+        return img, crop_img, crop_box
+
+    def _store_frame(self, captured):
+        """Add a captured frame to the buffer.
 
-        width, height = img.size
-        if width > SCREEN_MAX_WIDTH:
-            ratio = SCREEN_MAX_WIDTH / width
-            new_height = int(height * ratio)
-            img = img.resize(
-                (SCREEN_MAX_WIDTH, new_height), Image.Resampling.LANCZOS
+        A byte-budgeted buffer gets a high-quality source JPEG (and crop)
+        and encodes variants lazily; a count-bounded one gets finished JPEGs
+        right away.
+        """
+        img, crop_img, crop_box = captured
+        if self.frame_buffer.max_bytes:
+            source = self._encoder.encode_image(img, SCREEN_SOURCE_WIDTH, SCREEN_SOURCE_QUALITY)
+            crop_source = None
+            if crop_img is not None:
+                crop_source = self._encoder.encode_image(crop_img, None, SCREEN_SOURCE_QUALITY)
+            self.sources_encoded += 1
+            self.frame_buffer.add_source(
+                source, self._encode_variant, crop_source=crop_source,
+                crop_box=crop_box, thumbnail_width=SCREEN_MAX_WIDTH,
             )
+            return
+
+        crop = None
+        if crop_img is not None:
+            crop = self._encoder.encode_image(crop_img, max_width=None)
+            self.crops_encoded += 1
+        self.frame_buffer.add(self._encoder.encode_image(img), crop=crop, crop_box=crop_box)
+        self.frames_encoded += 1
+
+    def _encode_variant(self, img, max_width, quality, crop):
+        """Encode callback for source-backed frames, counted like eager encodes."""
+        if crop:
+            self.crops_encoded += 1
+        else:
+            self.frames_encoded += 1
+        return self._encoder.encode_image(img, max_width, quality)
 
-        buffer = io.BytesIO()
-        img.save(buffer, format="JPEG", quality=SCREEN_JPEG_QUALITY)
-        return buffer.getvalue()
+    def _crop_box(self, monitor, screen_size):
+        """Pick the area worth sending at native resolution, if any."""
+        if self._detector is not None:
+            changed = self._detector.changed_box()
+            if changed is not None:
+                box = fit_crop_box(changed, screen_size)
+                if box is not None:
+                    return box
+        if SCREEN_CROP_CURSOR:
+            cursor = self._cursor_position(monitor, screen_size)
+            if cursor is not None:
+                x, y = cursor
+                return fit_crop_box((x, y, x, y), screen_size)
+        return None
+
+    def _cursor_position(self, monitor, screen_size):
+        """Cursor position in screenshot pixels, or None if unknown or off-screen."""
+        if self._mouse is None:
+            try:
+                from pynput.mouse import Controller
+
+                self._mouse = Controller()
+            except Exception as e:
+                log.warning("Cursor crops disabled, cannot read cursor position: %s", e)
+                self._mouse = False
+        if not self._mouse:
+            return None
+
+        x, y = self._mouse.position
+        # mss monitors are in logical points; grabs can be in physical pixels.
+        scale = screen_size[0] / monitor["width"]
+        x = int((x - monitor["left"]) * scale)
+        y = int((y - monitor["top"]) * scale)
+        if 0 <= x < screen_size[0] and 0 <= y < screen_size[1]:
+            return x, y
+        return None
+
+    def _capture_timed(self):
+        started = time.thread_time()
+        captured = self._capture_frame()
+        if captured is not None:
+            self._store_frame(captured)
+        return captured is not None, time.thread_time() - started
 
     async def start(self):
         self._running = True
+        self._rate_changed = asyncio.Event()
         interval = 1.0 / SCREEN_CAPTURE_FPS
-        log.info("Starting screen capture at %d fps", SCREEN_CAPTURE_FPS)
+        if self._rate is not None:
+            log.info("Starting adaptive screen capture (%.1fs-%.0fs interval, cpu budget %.0f%%)",
+                     SCREEN_MIN_INTERVAL_SECONDS, SCREEN_IDLE_INTERVAL_SECONDS,
+                     SCREEN_CPU_BUDGET * 100)
+        else:
+            log.info("Starting screen capture at %d fps", SCREEN_CAPTURE_FPS)
 
         while self._running:
             try:
-                frame_data = await asyncio.to_thread(self._capture_frame)
-                self.frame_buffer.add(frame_data)
+                changed, cost = await asyncio.to_thread(self._capture_timed)
+                if self._rate is not None:
+                    interval = self._rate.update(changed, cost)
                 self._capture_count += 1
                 if self._capture_count % 30 == 0:
-                    log.debug("Captured %d frames (latest: %d bytes)",
-                               self._capture_count, len(frame_data))
+                    log.debug("Screen frames: captured=%d, skipped=%d (unchanged), encoded=%d, "
+                               "interval=%.1fs",
+                               self.frames_captured, self.frames_skipped, self.frames_encoded,
+                               interval)
             except Exception as e:
                 log.error("Screen capture error: %s", e)
-            await asyncio.sleep(interval)
+            await self._sleep(interval)
+
+    async def _sleep(self, interval):
+        """Sleep until the next capture, waking early if the rate is raised."""
+        self._rate_changed.clear()
+        try:
+            await asyncio.wait_for(self._rate_changed.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+    def set_live(self, live):
+        """Capture at the faster live rate while a Live session is open."""
+        if self._rate is None:
+            return
+        self._rate.set_live(live)
+        if self._rate_changed is not None:
+            self._rate_changed.set()
+        log.debug("Screen capture %s live mode (interval=%.1fs)",
+                  "entering" if live else "leaving", self._rate.interval)
 
     def capture_single_frame(self):
-        return self._capture_frame()
+        return self._encoder.encode_image(self._capture_frame(force=True)[0])
+
+    def stats(self):
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_skipped": self.frames_skipped,
+            "frames_encoded": self.frames_encoded,
+            "crops_encoded": self.crops_encoded,
+            "sources_encoded": self.sources_encoded,
+            "buffer_bytes": self.frame_buffer.total_bytes,
+            "interval_seconds": self._rate.interval if self._rate else 1.0 / SCREEN_CAPTURE_FPS,
+        }
 
     def stop(self):
         self._running = False
         if self._sct:
             self._sct.close()
             self._sct = None
-        log.info("ScreenCapture stopped")
+        log.info("ScreenCapture stopped (captured=%d, skipped=%d, encoded=%d)",
+                 self.frames_captured, self.frames_skipped, self.frames_encoded)
@@ -0,0 +1,497 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+from jarvis.config import (
+    SEND_SAMPLE_RATE,
+    WHISPER_MODEL,
+    TRANSCRIPTION_CHUNK_SECONDS,
+    TRANSCRIPTION_WINDOW_SECONDS,
+    TRANSCRIPTION_HOP_SECONDS,
+    WHISPER_WORKERS,
+    WHISPER_WORKER_KIND,
+    TRANSCRIPTION_QUEUE_MAX,
+    TRANSCRIPTION_BACKLOG_HIGH_WATER,
+    TRANSCRIPTION_BACKLOG_POLICY,
+    WHISPER_FALLBACK_MODEL,
+)
+from jarvis.utils.metrics import counter, histogram
+
+log = logging.getLogger("jarvis.transcription")
+
+_rtf_metric = histogram("jarvis_whisper_real_time_factor",
+                        "Whisper compute seconds per second of audio")
+_lag_metric = histogram("jarvis_transcription_lag_seconds",
+                        "Time from queueing audio to its transcript")
+_dropped_metric = counter("jarvis_transcription_dropped_jobs_total",
+                          "Audio jobs dropped from the Whisper backlog")
+
+# Whisper sees at most 30 s at a time; merged jobs stay under that.
+_MAX_MERGED_SECONDS = 28
+_RTF_SMOOTHING = 0.2
+
+
+class FixedChunker:
+    """Cuts the stream into back-to-back chunks, speech or not (legacy mode)."""
+
+    def __init__(self, chunk_seconds=TRANSCRIPTION_CHUNK_SECONDS, sample_rate=SEND_SAMPLE_RATE):
+        self._chunk_samples = int(chunk_seconds * sample_rate)
+        self._blocks = []
+        self._held = 0
+        self._start = 0
+
+    def feed(self, block):
+        self._blocks.append(block)
+        self._held += len(block)
+        if self._held >= self._chunk_samples:
+            return self.flush()
+        return []
+
+    def skip(self, samples):
+        chunks = self.flush()
+        self._start += samples
+        return chunks
+
+    def flush(self):
+        if not self._blocks:
+            return []
+        chunk = (self._start, np.concatenate(self._blocks))
+        self._start += self._held
+        self._blocks = []
+        self._held = 0
+        return [chunk]
+
+
+class SlidingWindow:
+    """Overlapping analysis windows over the audio stream.
+
+    Every `hop` seconds it emits the last `window` seconds, so each window
+    starts with the previous window's tail and words cut at one edge appear
+    whole in the next window. Windows without a single speech block (as
+    judged by the optional VAD gate) are skipped.
+    """
+
+    def __init__(
+        self,
+        window_seconds=TRANSCRIPTION_WINDOW_SECONDS,
+        hop_seconds=TRANSCRIPTION_HOP_SECONDS,
+        gate=None,
+        sample_rate=SEND_SAMPLE_RATE,
+    ):
+        if hop_seconds > window_seconds:
+            raise ValueError("hop must not be longer than the window")
+        self.sample_rate = sample_rate
+        self._window = int(window_seconds * sample_rate)
+        self._hop = int(hop_seconds * sample_rate)
+        self._gate = gate
+        self._blocks = []  # (start_sample, block, is_speech)
+        self._start = 0
+        self._position = 0
+        self.windows = 0
+        self.skipped_windows = 0
+
+    @property
+    def overlap_seconds(self):
+        return (self._window - self._hop) / self.sample_rate
+
+    def feed(self, block):
+        speech = self._gate.is_speech(block) if self._gate is not None else True
+        self._blocks.append((self._position, block, speech))
+        self._position += len(block)
+
+        windows = []
+        while self._position - self._start >= self._window:
+            window = self._cut(self._start, self._start + self._window)
+            if window is not None:
+                windows.append(window)
+            self._start += self._hop
+            self._drop_before(self._start)
+        return windows
+
+    def skip(self, samples):
+        """Account for samples lost upstream; the window restarts after the gap."""
+        self._position += samples
+        self._start = self._position
+        self._blocks = []
+        return []
+
+    def flush(self):
+        if self._position > self._start:
+            window = self._cut(self._start, self._position)
+            self._start = self._position
+            self._blocks = []
+            if window is not None:
+                return [window]
+        return []
+
+    def _cut(self, start, end):
+        parts = []
+        speech = False
+        for block_start, block, is_speech in self._blocks:
+            block_end = block_start + len(block)
+            if block_end <= start or block_start >= end:
+                continue
+            parts.append(block[max(0, start - block_start):end - block_start])
+            speech = speech or is_speech
+        if not speech:
+            self.skipped_windows += 1
+            return None
+        self.windows += 1
+        return (start, np.concatenate(parts))
+
+    def _drop_before(self, position):
+        while self._blocks and self._blocks[0][0] + len(self._blocks[0][1]) <= position:
+            self._blocks.pop(0)
+
+
+class TranscriptMerger:
+    """Merges Whisper output from overlapping windows by absolute timestamp.
+
+    Words are placed on the stream timeline using the window start. A word is
+    emitted once its midpoint is past everything already committed and
+    before the window's tail; words in the tail are left for the next
+    window, which sees them with full context on both sides.
+    """
+
+    def __init__(self, overlap_seconds):
+        self._overlap = overlap_seconds
+        self._committed_until = 0.0
+
+    def merge(self, window_start, window_duration, segments, final=False):
+        """Return the text in `segments` not already emitted by an earlier window."""
+        boundary = float("inf") if final else window_start + window_duration - self._overlap
+        pieces = []
+        committed_until = self._committed_until
+
+        for segment in segments:
+            words = getattr(segment, "words", None) or [segment]
+            for word in words:
+                start = window_start + word.start
+                end = window_start + word.end
+                mid = (start + end) / 2
+                if mid < self._committed_until or mid >= boundary:
+                    continue
+                pieces.append(word.word if word is not segment else " " + segment.text.strip())
+                committed_until = max(committed_until, end)
+
+        self._committed_until = committed_until
+        return "".join(pieces).strip()
+
+
+def build_segmenter(mode, gate=None):
+    """Return (segmenter, merger) for a TRANSCRIPTION_MODE value.
+
+    The merger is None for modes whose pieces never overlap.
+    """
+    if mode == "sliding":
+        window = SlidingWindow(gate=gate)
+        return window, TranscriptMerger(window.overlap_seconds)
+    if mode == "fixed":
+        return FixedChunker(), None
+    if mode == "vad":
+        if gate is None:
+            raise ValueError("vad mode needs a VoiceActivityGate")
+        return gate, None
+    raise ValueError(f"Unknown transcription mode: {mode}")
+
+
+# Models are cached per process: thread workers share one model (with
+# CTranslate2 workers for real parallelism), process workers load their own.
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _get_model(name, num_workers=1):
+    with _models_lock:
+        model = _models.get(name)
+        if model is None:
+            log.info("Loading Whisper model: %s", name)
+            model = WhisperModel(
+                name, device="cpu", compute_type="int8", num_workers=num_workers
+            )
+            _models[name] = model
+            log.info("Whisper model loaded: %s", name)
+        return model
+
+
+def _init_process_worker(name):
+    """ProcessPoolExecutor initializer: load the model in the new worker."""
+    _get_model(name)
+
+
+def _worker_ready():
+    return None
+
+
+def _run_job(model_name, audio, word_timestamps, num_workers=1):
+    """Transcribe one job in a worker; returns (segments, busy_seconds)."""
+    model = _get_model(model_name, num_workers)
+    started = time.perf_counter()
+    segments, _ = model.transcribe(
+        audio,
+        beam_size=1,
+        language="en",
+        vad_filter=False,
+        word_timestamps=word_timestamps,
+    )
+    segments = list(segments)
+    return segments, time.perf_counter() - started
+
+
+class TranscriptionJob:
+    """A piece of audio waiting for Whisper."""
+
+    def __init__(self, start, audio, final=False):
+        self.start = start
+        self.audio = audio
+        self.final = final
+        self.submitted_at = time.monotonic()
+        self.model = None
+        self.merged = 1
+
+    @property
+    def end(self):
+        return self.start + len(self.audio)
+
+
+class TranscriptionScheduler:
+    """Runs Whisper off the event loop with a bounded backlog.
+
+    Jobs go into a bounded queue served by a pool of thread or process
+    workers. Results are handed to `on_result(job, segments)` on the event
+    loop in submission order. When the queue grows past the high-water mark
+    the backlog policy decides what gives: drop the oldest audio, merge
+    queued jobs into fewer Whisper calls, or downgrade to a faster model.
+    """
+
+    def __init__(
+        self,
+        on_result,
+        word_timestamps=False,
+        workers=WHISPER_WORKERS,
+        kind=WHISPER_WORKER_KIND,
+        max_queue=TRANSCRIPTION_QUEUE_MAX,
+        high_water=TRANSCRIPTION_BACKLOG_HIGH_WATER,
+        policy=TRANSCRIPTION_BACKLOG_POLICY,
+        model_name=WHISPER_MODEL,
+        fallback_model=WHISPER_FALLBACK_MODEL,
+        sample_rate=SEND_SAMPLE_RATE,
+    ):
+        if policy not in ("drop", "merge", "downgrade"):
+            raise ValueError(f"Unknown backlog policy: {policy}")
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown Whisper worker kind: {kind}")
+        self._on_result = on_result
+        self._word_timestamps = word_timestamps
+        self._workers = workers
+        self._kind = kind
+        self._max_queue = max_queue
+        self._high_water = high_water
+        self._policy = policy
+        self._model_name = model_name
+        self._fallback_model = fallback_model
+        self.sample_rate = sample_rate
+
+        self._queue = deque()
+        self._wakeup = None
+        self._executor = None
+        self._tasks = []
+        self._dispatch_seq = 0
+        self._deliver_seq = 0
+        self._results = {}
+        self._in_flight = 0
+        self._running = False
+
+        self.processed_jobs = 0
+        self.audio_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.real_time_factor = 0.0
+        self.lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.dropped_jobs = 0
+        self.dropped_seconds = 0.0
+        self.merged_jobs = 0
+        self.downgraded_jobs = 0
+
+    async def start(self):
+        """Start the worker pool and load the model before audio arrives."""
+        loop = asyncio.get_running_loop()
+        if self._kind == "process":
+            # Each process loads its own model as it starts; the model never
+            # crosses the process boundary. One no-op per worker makes the
+            # pool start them all now, and surfaces a failed load here.
+            self._executor = ProcessPoolExecutor(
+                self._workers,
+                initializer=_init_process_worker,
+                initargs=(self._model_name,),
+            )
+            await asyncio.gather(*(
+                loop.run_in_executor(self._executor, _worker_ready)
+                for _ in range(self._workers)
+            ))
+        else:
+            self._executor = ThreadPoolExecutor(
+                self._workers, thread_name_prefix="whisper"
+            )
+            await loop.run_in_executor(
+                self._executor, _get_model, self._model_name, self._num_model_workers()
+            )
+        self._wakeup = asyncio.Event()
+        self._running = True
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self._workers)
+        ]
+        log.info("Transcription scheduler started (%d %s worker(s), policy=%s)",
+                 self._workers, self._kind, self._policy)
+
+    def _num_model_workers(self):
+        return self._workers if self._kind == "thread" else 1
+
+    def submit(self, start, audio, final=False):
+        """Queue audio for transcription without waiting for Whisper."""
+        self._queue.append(TranscriptionJob(start, audio, final))
+        if len(self._queue) > self._high_water:
+            self._apply_backlog_policy()
+        while len(self._queue) > self._max_queue:
+            self._drop_oldest()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _apply_backlog_policy(self):
+        if self._policy == "drop":
+            while len(self._queue) > self._high_water:
+                self._drop_oldest()
+        elif self._policy == "merge":
+            self._merge_queued()
+
+    def _drop_oldest(self):
+        job = self._queue.popleft()
+        self.dropped_jobs += 1
+        _dropped_metric.inc()
+        self.dropped_seconds += len(job.audio) / self.sample_rate
+        log.warning("Transcription backlog: dropped %.1fs of audio (queue=%d)",
+                    len(job.audio) / self.sample_rate, len(self._queue))
+
+    def _merge_queued(self):
+        """Coalesce neighbouring queued jobs into as few Whisper calls as fit."""
+        max_samples = int(_MAX_MERGED_SECONDS * self.sample_rate)
+        merged = deque()
+        for job in self._queue:
+            prev = merged[-1] if merged else None
+            if prev is not None and self._can_merge(prev, job, max_samples):
+                overlap = max(0, prev.end - job.start)
+                prev.audio = np.concatenate((prev.audio, job.audio[overlap:]))
+                prev.final = prev.final or job.final
+                prev.merged += job.merged
+                self.merged_jobs += 1
+            else:
+                merged.append(job)
+        self._queue = merged
+
+    def _can_merge(self, prev, job, max_samples):
+        # With word timestamps the merged audio must stay one continuous
+        # stretch of the timeline; otherwise gaps (silence) can be cut out.
+        if self._word_timestamps and job.start > prev.end:
+            return False
+        overlap = max(0, prev.end - job.start)
+        return len(prev.audio) + len(job.audio) - overlap <= max_samples
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue:
+                if not self._running:
+                    break
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            job = self._queue.popleft()
+            seq = self._dispatch_seq
+            self._dispatch_seq += 1
+            job.model = self._model_name
+            if self._policy == "downgrade" and len(self._queue) >= self._high_water:
+                job.model = self._fallback_model
+                self.downgraded_jobs += 1
+
+            self._in_flight += 1
+            try:
+                segments, busy = await loop.run_in_executor(
+                    self._executor, _run_job, job.model, job.audio,
+                    self._word_timestamps, self._num_model_workers(),
+                )
+                self._record(job, busy)
+            except Exception as e:
+                log.error("Transcription error: %s", e, exc_info=True)
+                segments = None
+            finally:
+                self._in_flight -= 1
+
+            self._results[seq] = (job, segments)
+            self._deliver()
+
+    def _record(self, job, busy):
+        duration = len(job.audio) / self.sample_rate
+        self.processed_jobs += 1
+        self.audio_seconds += duration
+        self.busy_seconds += busy
+        rtf = busy / duration if duration else 0.0
+        if self.processed_jobs == 1:
+            self.real_time_factor = rtf
+        else:
+            self.real_time_factor += _RTF_SMOOTHING * (rtf - self.real_time_factor)
+        self.lag_seconds = time.monotonic() - job.submitted_at
+        _rtf_metric.record(rtf)
+        _lag_metric.record(self.lag_seconds)
+        self.max_lag_seconds = max(self.max_lag_seconds, self.lag_seconds)
+        log.debug("Whisper job: %.1fs audio in %.2fs (rtf=%.2f, model=%s, lag=%.1fs, queue=%d)",
+                  duration, busy, rtf, job.model, self.lag_seconds, len(self._queue))
+
+    def _deliver(self):
+        """Hand finished jobs to the callback strictly in dispatch order."""
+        while self._deliver_seq in self._results:
+            job, segments = self._results.pop(self._deliver_seq)
+            self._deliver_seq += 1
+            if segments is not None:
+                try:
+                    self._on_result(job, segments)
+                except Exception as e:
+                    log.error("Transcription result handler error: %s", e, exc_info=True)
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    def stats(self):
+        return {
+            "queue_depth": len(self._queue),
+            "in_flight": self._in_flight,
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "real_time_factor": self.real_time_factor,
+            "processed_jobs": self.processed_jobs,
+            "audio_seconds": self.audio_seconds,
+            "busy_seconds": self.busy_seconds,
+            "dropped_jobs": self.dropped_jobs,
+            "dropped_seconds": self.dropped_seconds,
+            "merged_jobs": self.merged_jobs,
+            "downgraded_jobs": self.downgraded_jobs,
+        }
+
+    async def stop(self):
+        """Finish queued jobs, then shut the workers down."""
+        self._running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,40 +1,255 @@
+import asyncio
 import logging
+import re
 import time
+from difflib import SequenceMatcher
 
-from jarvis.config import WAKE_WORD, WAKE_WORD_DEBOUNCE_SECONDS
+import numpy as np
+
+from jarvis.config import (
+    SEND_SAMPLE_RATE,
+    VAD_BLOCK_SECONDS,
+    WAKE_WORD,
+    WAKE_WORD_DEBOUNCE_SECONDS,
+    WAKE_SPOTTER_MODEL,
+    WAKE_SPOTTER_WINDOW_SECONDS,
+    WAKE_SPOTTER_HOP_SECONDS,
+    WAKE_MATCH_THRESHOLD,
+    WAKE_CANDIDATE_THRESHOLD,
+    WAKE_MAX_LENGTH_DIFF,
+)
+from jarvis.layer1.audio_capture import VoiceActivityGate
+from jarvis.layer1.transcription import SlidingWindow
 from jarvis.utils.buffer import TranscriptBuffer
 
 log = logging.getLogger("jarvis.wakeword")
 
+_SPOTTER_POLL_SECONDS = 0.1
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def word_score(word, wake_word=WAKE_WORD):
+    """Fuzzy similarity (0..1) of one heard word to the wake word.
+
+    Only words that start with the same letter and are within
+    WAKE_MAX_LENGTH_DIFF letters of its length are compared at all; the
+    edit-distance ratio alone rates short or merely rhyming words ("jars",
+    "davis", "paris") far too close.
+    """
+    wake_word = wake_word.lower()
+    word = word.lower()
+    if word.endswith("'s"):
+        word = word[:-2]
+    if word == wake_word:
+        return 1.0
+    if not word or word[0] != wake_word[0] or abs(len(word) - len(wake_word)) > WAKE_MAX_LENGTH_DIFF:
+        return 0.0
+    return SequenceMatcher(None, word, wake_word).ratio()
+
+
+def wake_word_score(text, wake_word=WAKE_WORD):
+    """Best `word_score` of any word in `text`."""
+    return max((word_score(w, wake_word) for w in _WORD_RE.findall(text.lower())), default=0.0)
+
+
+class KeywordSpotter:
+    """Low-latency wake word engine running on short audio windows.
+
+    Reads its own cursor into the capture ring buffer and runs a tiny Whisper
+    model over overlapping ~1 s windows that contain speech, independently of
+    the full transcriber. `detected` is set the moment a window contains the
+    wake word; `candidate` is set earlier, as soon as a window merely sounds
+    close to it, so callers can start expensive preparation speculatively.
+    """
+
+    def __init__(
+        self,
+        ring=None,
+        model_name=WAKE_SPOTTER_MODEL,
+        window_seconds=WAKE_SPOTTER_WINDOW_SECONDS,
+        hop_seconds=WAKE_SPOTTER_HOP_SECONDS,
+        threshold=WAKE_MATCH_THRESHOLD,
+        candidate_threshold=WAKE_CANDIDATE_THRESHOLD,
+    ):
+        self._ring = ring
+        self._reader = None
+        self._model_name = model_name
+        self._model = None
+        self._window_seconds = window_seconds
+        self._hop_seconds = hop_seconds
+        self._threshold = threshold
+        self._candidate_threshold = candidate_threshold
+        self._window = None
+        self._running = False
+        self._candidate_seen = False
+        self._reset_pending = False
+        self.detected = asyncio.Event()
+        self.candidate = asyncio.Event()
+        self.reset()
+
+        self.windows_checked = 0
+        self.detections = 0
+        self.candidates = 0
+        self.last_text = ""
+        self.last_latency = None
+
+    def load(self):
+        if self._model is None:
+            from faster_whisper import WhisperModel
+
+            log.info("Loading wake word model: %s", self._model_name)
+            self._model = WhisperModel(
+                self._model_name, device="cpu", compute_type="int8"
+            )
+
+    def reset(self):
+        """Forget buffered audio so a heard wake word cannot fire twice."""
+        self._reset_pending = False
+        self._window = SlidingWindow(
+            self._window_seconds, self._hop_seconds, gate=VoiceActivityGate()
+        )
+
+    def request_reset(self):
+        """Thread-safe `reset`: done by the worker before it feeds the next block."""
+        self._reset_pending = True
+
+    def feed(self, block):
+        """Feed one float32 block; return True if the wake word was just heard."""
+        for _, audio in self._window.feed(block):
+            self.windows_checked += 1
+            segments, _ = self._model.transcribe(
+                audio,
+                beam_size=1,
+                language="en",
+                vad_filter=False,
+                without_timestamps=True,
+                condition_on_previous_text=False,
+            )
+            text = " ".join(s.text.strip() for s in segments)
+            score = wake_word_score(text) if text else 0.0
+            if score >= self._candidate_threshold:
+                self._candidate_seen = True
+            if score >= self._threshold:
+                self.last_text = text
+                self.detections += 1
+                self.reset()
+                return True
+        return False
+
+    def _feed_blocks(self, blocks):
+        # Runs in a worker thread. The whole batch is fed even after a
+        # detection: feed() has already reset the window, so the blocks
+        # that follow start a fresh one instead of being lost.
+        detected = False
+        for block in blocks:
+            if self._reset_pending:
+                self.reset()
+            if self.feed(np.multiply(block, 1.0 / 32768.0, dtype=np.float32)):
+                detected = True
+        return detected
+
+    async def run(self):
+        await asyncio.to_thread(self.load)
+        self._reader = self._ring.reader("wake")
+        self._running = True
+        block_size = int(SEND_SAMPLE_RATE * VAD_BLOCK_SECONDS)
+        log.info("Keyword spotter started (model=%s, window=%.1fs, hop=%.1fs)",
+                 self._model_name, self._window_seconds, self._hop_seconds)
+
+        try:
+            while self._running:
+                await asyncio.sleep(_SPOTTER_POLL_SECONDS)
+                blocks, lost = self._reader.read_blocks(block_size)
+                if lost and not self._reset_pending:
+                    self._window.skip(lost)
+                if not blocks:
+                    continue
+                read_at = time.monotonic()
+                detected = await asyncio.to_thread(self._feed_blocks, blocks)
+                if self._candidate_seen:
+                    self._candidate_seen = False
+                    self.candidates += 1
+                    self.candidate.set()
+                if detected:
+                    self.last_latency = time.monotonic() - read_at
+                    log.info("WAKE WORD SPOTTED in: '%s' (%.0f ms after audio arrived)",
+                             self.last_text, self.last_latency * 1000)
+                    self.detected.set()
+        finally:
+            self._reader.close()
+
+    def stop(self):
+        self._running = False
+
 
 class WakeWordDetector:
-    """Detects wake word in transcript buffer with debounce."""
+    """Detects wake word in transcript buffer with debounce.
 
-    def __init__(self, transcript_buffer: TranscriptBuffer):
+    Scans only transcript entries it has not seen before. When a
+    `KeywordSpotter` is attached its detections count too, so the fast path
+    and the transcript path share one debounce.
+    """
+
+    def __init__(self, transcript_buffer: TranscriptBuffer, spotter: KeywordSpotter = None):
         self.transcript_buffer = transcript_buffer
+        self.spotter = spotter
         self._last_trigger_time = 0
         self._wake_word = WAKE_WORD.lower()
-        self._check_count = 0
+        self._seen_seq = transcript_buffer.last_seq
+
+    async def wait_for_wake(self):
+        """Sleep until new transcript text or a spotter hit triggers the wake word."""
+        while True:
+            if self.check():
+                return
+            waiters = [
+                asyncio.ensure_future(
+                    self.transcript_buffer.wait_for_entries(self._seen_seq)
+                )
+            ]
+            if self.spotter is not None:
+                waiters.append(asyncio.ensure_future(self.spotter.detected.wait()))
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
 
     def check(self):
-        self._check_count += 1
         now = time.time()
+
+        spotted = self.spotter is not None and self.spotter.detected.is_set()
+        if spotted:
+            self.spotter.detected.clear()
+
+        entries = self.transcript_buffer.get_entries_since(self._seen_seq)
+        if entries:
+            self._seen_seq = entries[-1][0]
+
         if now - self._last_trigger_time < WAKE_WORD_DEBOUNCE_SECONDS:
             return False
 
-        recent = self.transcript_buffer.get_recent_text(seconds=10)
-        if self._check_count % 20 == 0:
-            full = self.transcript_buffer.get_text()
-            log.debug("Wake word check #%d — recent(10s): '%s' | full buffer: '%s'",
-                       self._check_count, recent[:200], full[:200])
-
-        if self._wake_word in recent.lower():
+        if spotted:
             self._last_trigger_time = now
-            log.info("WAKE WORD DETECTED in: '%s'", recent)
+            log.info("WAKE WORD DETECTED by keyword spotter: '%s'", self.spotter.last_text)
             return True
 
+        cutoff = now - 10
+        for _, ts, text in entries:
+            if ts >= cutoff and self._wake_word in text.lower():
+                self._last_trigger_time = now
+                log.info("WAKE WORD DETECTED in: '%s'", text)
+                return True
+
+        if entries:
+            log.debug("Wake word scan: %d new entries, no match", len(entries))
         return False
 
     def suppress(self):
         """Suppress re-triggering for the debounce period after session ends."""
         self._last_trigger_time = time.time()
+        self._seen_seq = self.transcript_buffer.last_seq
+        if self.spotter is not None:
+            self.spotter.detected.clear()
+            self.spotter.candidate.clear()
+            self.spotter.request_reset()
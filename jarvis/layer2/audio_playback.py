@@ -1,69 +1,215 @@
 import asyncio
+import logging
 import threading
+import time
 
-import pyaudio
+import numpy as np
 
-from jarvis.config import RECEIVE_SAMPLE_RATE, AUDIO_CHANNELS, AUDIO_FORMAT_WIDTH
+from jarvis.config import (
+    RECEIVE_SAMPLE_RATE,
+    AUDIO_CHANNELS,
+    PLAYBACK_BLOCK_MS,
+    PLAYBACK_JITTER_MS,
+    PLAYBACK_BUFFER_SECONDS,
+    PLAYBACK_DEVICE_RATE,
+)
+from jarvis.utils.audio_utils import StreamResampler, to_int16
+from jarvis.utils.metrics import counter
+from jarvis.utils.ring_buffer import AudioRingBuffer
 
+log = logging.getLogger("jarvis.playback")
 
-class AudioPlayback:
-    """Plays audio responses from Gemini Live API."""
+_underrun_metric = counter("jarvis_playback_underruns_total",
+                           "Output callbacks that ran out of audio mid-response")
+_flush_metric = counter("jarvis_playback_flushes_total", "Playback flushed on barge-in")
+
+# Running dry only counts as an underrun if more audio arrives within this
+# long; otherwise it was the end of the response draining.
+_UNDERRUN_GAP_SECONDS = 0.5
+
+
+class PyAudioOutput:
+    """Speaker output through a PyAudio stream in callback mode.
+
+    Without an explicit `rate` the stream runs at the default output
+    device's native rate.
+    """
 
-    def __init__(self):
-        self._queue = asyncio.Queue()
-        self._pya = None
+    def __init__(self, rate=PLAYBACK_DEVICE_RATE, channels=AUDIO_CHANNELS,
+                 block_frames=None):
+        import pyaudio
+
+        self._pya = pyaudio.PyAudio()
+        if rate is None:
+            rate = int(self._pya.get_default_output_device_info()["defaultSampleRate"])
+        self.rate = rate
+        self.channels = channels
+        self.block_frames = block_frames or int(rate * PLAYBACK_BLOCK_MS / 1000)
         self._stream = None
-        self._running = False
 
-    def _ensure_pyaudio(self):
-        if self._pya is None:
-            self._pya = pyaudio.PyAudio()
+    def start(self, fill):
+        """Open the stream; `fill(out)` must write one block of int16 samples into `out`."""
+        import pyaudio
 
-    async def start(self):
-        """Start the audio playback loop."""
-        self._ensure_pyaudio()
-        self._running = True
+        block = np.zeros(self.block_frames * self.channels, dtype=np.int16)
+
+        def callback(in_data, frame_count, time_info, status):
+            out = block if frame_count == self.block_frames else np.zeros(
+                frame_count * self.channels, dtype=np.int16)
+            fill(out)
+            return out.tobytes(), pyaudio.paContinue
 
+        if self._pya is None:
+            self._pya = pyaudio.PyAudio()
         self._stream = self._pya.open(
             format=pyaudio.paInt16,
-            channels=AUDIO_CHANNELS,
-            rate=RECEIVE_SAMPLE_RATE,
+            channels=self.channels,
+            rate=self.rate,
             output=True,
+            frames_per_buffer=self.block_frames,
+            stream_callback=callback,
         )
+        self._stream.start_stream()
 
-        print("[AudioPlayback] Started")
+    def stop(self):
+        if self._stream:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pya:
+            self._pya.terminate()
+            self._pya = None
 
-        while self._running:
-            try:
-                audio_data = await asyncio.wait_for(
-                    self._queue.get(), timeout=0.5
-                )
-                await asyncio.to_thread(self._stream.write, audio_data)
-            except asyncio.TimeoutError:
-                continue
-            except Exception as e:
-                print(f"[AudioPlayback] Error: {e}")
+
+class AudioPlayback:
+    """Plays audio responses from Gemini Live API.
+
+    Incoming chunks are copied into a ring buffer; the output device's
+    callback pulls exactly one block at a time from it, so nothing on the
+    event loop sits between the network and the speaker. Audio is
+    resampled from RECEIVE_SAMPLE_RATE when the device runs at another
+    rate. Playback starts (and restarts after running dry) only once
+    `jitter_ms` of audio is buffered, which absorbs uneven chunk arrival. A
+    callback that finds too little audio plays silence; it counts as an
+    underrun only if more audio follows shortly, so the end of every
+    response is not counted. `flush` drops everything buffered at once, for
+    barge-in.
+    """
+
+    def __init__(self, device=None, jitter_ms=PLAYBACK_JITTER_MS,
+                 buffer_seconds=PLAYBACK_BUFFER_SECONDS):
+        self._device = device or PyAudioOutput()
+        self._channels = self._device.channels
+        self._jitter_samples = int(self._device.rate * jitter_ms / 1000) * self._channels
+        self._ring = AudioRingBuffer(int(self._device.rate * buffer_seconds) * self._channels)
+        self._reader = self._ring.reader("playback")
+        self._resampler = None
+        if self._device.rate != RECEIVE_SAMPLE_RATE:
+            self._resampler = StreamResampler(RECEIVE_SAMPLE_RATE, self._device.rate)
+        self._lock = threading.Lock()
+        self._playing = False
+        self._started = False
+        self._stopped = asyncio.Event()
+        self._ran_dry_at = None
+        self._ran_dry_samples = 0
+
+        self.underruns = 0
+        self.underrun_samples = 0
+        self.played_samples = 0
+        self.lost_samples = 0
+        self.flushes = 0
+        self.flushed_samples = 0
+
+    @property
+    def buffered_ms(self):
+        samples = self._reader.available
+        return samples / self._channels / self._device.rate * 1000
+
+    def _fill(self, out):
+        """Device callback: copy the next block into `out`, silence where there is none."""
+        with self._lock:
+            need = len(out)
+            if not self._playing:
+                if self._reader.available < self._jitter_samples:
+                    out[:] = 0
+                    return
+                self._playing = True
+
+            views, lost = self._reader.read(max_samples=need)
+            self.lost_samples += lost
+            got = 0
+            for view in views:
+                out[got:got + len(view)] = view
+                got += len(view)
+            self.played_samples += got
+            if got < need:
+                out[got:] = 0
+                # Mid-stream underrun or the end of the response: enqueue
+                # tells them apart by whether more audio follows.
+                self._ran_dry_at = time.monotonic()
+                self._ran_dry_samples = need - got
+                self._playing = False
+
+    async def start(self):
+        """Start the output device and keep it running until `stop`."""
+        self._stopped.clear()
+        self._device.start(self._fill)
+        self._started = True
+        log.info("Playback started (jitter buffer %d ms)",
+                 self._jitter_samples / self._channels / self._device.rate * 1000)
+        await self._stopped.wait()
 
     async def enqueue(self, audio_data):
-        """Add audio data to the playback queue."""
-        await self._queue.put(audio_data)
+        """Append 16-bit PCM at RECEIVE_SAMPLE_RATE to the playback buffer."""
+        samples = np.frombuffer(audio_data, dtype=np.int16)
+        if self._resampler is not None:
+            samples = to_int16(self._resampler.process(samples))
+        with self._lock:
+            if self._ran_dry_at is not None:
+                if time.monotonic() - self._ran_dry_at < _UNDERRUN_GAP_SECONDS:
+                    self.underruns += 1
+                    self.underrun_samples += self._ran_dry_samples
+                    _underrun_metric.inc()
+                self._ran_dry_at = None
+        self._ring.write(samples)
+
+    def flush(self):
+        """Drop all buffered audio immediately (e.g. on interruption)."""
+        with self._lock:
+            dropped = self._reader.available
+            self._reader.skip_to_end()
+            self._playing = False
+            self._ran_dry_at = None
+            self.flushes += 1
+            _flush_metric.inc()
+            self.flushed_samples += dropped
+        if self._resampler is not None:
+            self._resampler.reset()
+        log.info("Playback flushed: dropped %.0f ms of audio",
+                 dropped / self._channels / self._device.rate * 1000)
 
     def clear_queue(self):
         """Clear pending audio (e.g., on interruption)."""
-        while not self._queue.empty():
-            try:
-                self._queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
+        self.flush()
+
+    def stats(self):
+        return {
+            "buffered_ms": round(self.buffered_ms, 1),
+            "played_samples": self.played_samples,
+            "underruns": self.underruns,
+            "underrun_samples": self.underrun_samples,
+            "lost_samples": self.lost_samples,
+            "flushes": self.flushes,
+            "flushed_samples": self.flushed_samples,
+        }
 
     def stop(self):
         """Stop playback."""
-        self._running = False
-        if self._stream:
-            self._stream.stop_stream()
-            self._stream.close()
-            self._stream = None
-        if self._pya:
-            self._pya.terminate()
-            self._pya = None
-        print("[AudioPlayback] Stopped")
+        self._stopped.set()
+        if self._started:
+            self._device.stop()
+            self._started = False
+            with self._lock:
+                self._reader.skip_to_end()
+                self._playing = False
+            log.info("Playback stopped: %s", self.stats())
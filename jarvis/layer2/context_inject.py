@@ -1,39 +1,90 @@
+import asyncio
 import logging
+import time
 
+from jarvis.config import SCREEN_CONTEXT_MAX_WIDTH, TRANSCRIPT_CONTEXT_MINUTES
+from jarvis.layer1.frame_encoder import get_encoder
+from jarvis.layer2.context_pack import ContextPacker
 from jarvis.utils.buffer import TranscriptBuffer, FrameBuffer
 
 log = logging.getLogger("jarvis.context")
 
+# Frames read back from the context log for the packer to choose from.
+_LOGGED_FRAME_CANDIDATES = 20
+
 
 class ContextInjector:
-    """Injects buffered context into a Live API session."""
+    """Injects buffered context into a Live API session, packed to a token budget."""
 
     def __init__(
-        self, transcript_buffer: TranscriptBuffer, frame_buffer: FrameBuffer
+        self, transcript_buffer: TranscriptBuffer, frame_buffer: FrameBuffer,
+        context_log=None, packer: ContextPacker = None,
     ):
         self.transcript_buffer = transcript_buffer
         self.frame_buffer = frame_buffer
+        self.context_log = context_log
+        self.packer = packer or ContextPacker()
+        self.last_report = None
+        self._encoder = None
 
     async def inject(self, session):
-        transcript = self.transcript_buffer.get_text()
-        if transcript:
+        """Send the packed transcript and screen frames; return the ids of frames sent."""
+        now = time.time()
+        window = TRANSCRIPT_CONTEXT_MINUTES * 60
+        # Right after a restart the recent window lives only in the context log.
+        segments = await asyncio.to_thread(self.transcript_buffer.get_segments, now - window)
+        frames = self.frame_buffer.get_frames()
+        if not frames and self.context_log is not None:
+            frames = await asyncio.to_thread(
+                self.context_log.read_frames, now - window, None, _LOGGED_FRAME_CANDIDATES,
+                self._encode_logged,
+            )
+
+        packed = await asyncio.to_thread(self.packer.pack, segments, frames, None, now)
+        self.last_report = packed.report
+        log.info("Context pack: %s", packed.report)
+
+        if packed.text:
             context_msg = (
                 f"[Context from recent audio - last few minutes of "
                 f"conversation/audio you've been passively observing]:\n"
-                f"{transcript}"
+                f"{packed.text}"
             )
             log.info("Injecting transcript (%d chars): '%s'",
-                      len(transcript), transcript[:200])
+                      len(packed.text), packed.text[:200])
             await session.inject_context(context_msg)
         else:
             log.info("No transcript to inject")
 
-        frames = self.frame_buffer.get_frames()
-        if frames:
-            to_send = frames[-3:]
-            log.info("Injecting %d screen frames (of %d buffered)", len(to_send), len(frames))
-            for i, (ts, frame_data, _) in enumerate(to_send):
-                log.debug("Frame %d: %d bytes", i, len(frame_data))
-                await session.send_image(frame_data)
+        sent_ids = []
+        if packed.frames:
+            log.info("Injecting %d screen frames (of %d buffered)", len(packed.frames), len(frames))
+            previous = None
+            for i, frame in enumerate(packed.frames):
+                image, crop = await asyncio.to_thread(self._encode, frame)
+                if image == previous:
+                    log.debug("Frame %d: identical to the previous one, skipped", i)
+                    continue
+                log.debug("Frame %d: %d bytes (crop: %s)", i, len(image),
+                          f"{len(crop)} bytes at {frame.crop_box}" if crop else "none")
+                await session.send_image(image)
+                if crop:
+                    await session.send_image(crop)
+                previous = image
+                sent_ids.append(frame.frame_id)
         else:
             log.info("No screen frames to inject")
+        return sent_ids
+
+    def _encode_logged(self, image, max_width, quality, crop):
+        """Encode callback for frames read back from the context log."""
+        if self._encoder is None:
+            self._encoder = get_encoder()
+        return self._encoder.encode_image(image, max_width, quality)
+
+    @staticmethod
+    def _encode(frame):
+        """Context frames are read once, so they get a larger variant than the live stream."""
+        image = frame.jpeg(max_width=SCREEN_CONTEXT_MAX_WIDTH)
+        crop = frame.jpeg(crop=True) if frame.has_crop else None
+        return image, crop
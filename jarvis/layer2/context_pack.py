@@ -0,0 +1,204 @@
+import logging
+import math
+import re
+import time
+
+import numpy as np
+
+from jarvis.config import (
+    CONTEXT_PACK_TOKEN_BUDGET,
+    CONTEXT_PACK_MAX_FRAMES,
+    CONTEXT_PACK_IMAGE_TOKENS,
+    CONTEXT_PACK_RECENCY_HALF_LIFE_SECONDS,
+    CONTEXT_PACK_RELEVANCE_WEIGHT,
+    CONTEXT_PACK_QUERY_SECONDS,
+    CONTEXT_PACK_MIN_FRAME_DISTANCE,
+)
+from jarvis.utils.search_index import tokenize, estimate_tokens
+
+log = logging.getLogger("jarvis.contextpack")
+
+_SENTENCE_RE = re.compile(r"[^.!?]+[.!?]*")
+
+
+def collapse_repeats(text):
+    """Collapse runs of the same sentence ("Thank you. Thank you. Thank you.")."""
+    sentences = [s.strip() for s in _SENTENCE_RE.findall(text) if s.strip()]
+    out = []
+    for sentence in sentences:
+        key = sentence.lower().rstrip(".!?")
+        if out and out[-1][0] == key:
+            out[-1][2] += 1
+        else:
+            out.append([key, sentence, 1])
+    return " ".join(s if n == 1 else f"{s} (x{n})" for _, s, n in out)
+
+
+class PackedContext:
+    """Result of packing: transcript text, chosen frames and what was left out."""
+
+    def __init__(self, text, frames, report):
+        self.text = text
+        self.frames = frames
+        self.report = report
+
+
+class ContextPacker:
+    """Fits buffered transcript and screen frames into a token budget.
+
+    Frames are chosen first: the latest, then greedily whichever buffered
+    frame differs most from those already picked, until `max_frames` or
+    until the rest are near-duplicates. Their image tokens come off the
+    budget. Transcript segments share the remainder: repeats are collapsed,
+    each segment is scored by recency (exponential decay) plus relevance to
+    the most recent speech, and the best-scoring ones are kept and rendered
+    in time order.
+    """
+
+    def __init__(
+        self,
+        token_budget=CONTEXT_PACK_TOKEN_BUDGET,
+        max_frames=CONTEXT_PACK_MAX_FRAMES,
+        image_tokens=CONTEXT_PACK_IMAGE_TOKENS,
+        half_life=CONTEXT_PACK_RECENCY_HALF_LIFE_SECONDS,
+        relevance_weight=CONTEXT_PACK_RELEVANCE_WEIGHT,
+        query_seconds=CONTEXT_PACK_QUERY_SECONDS,
+        min_frame_distance=CONTEXT_PACK_MIN_FRAME_DISTANCE,
+    ):
+        self.token_budget = token_budget
+        self.max_frames = max_frames
+        self.image_tokens = image_tokens
+        self.half_life = half_life
+        self.relevance_weight = relevance_weight
+        self.query_seconds = query_seconds
+        self.min_frame_distance = min_frame_distance
+
+    def pack(self, segments, frames, query=None, now=None):
+        """Pack [(timestamp, text)] segments and ScreenFrames into the budget.
+
+        `query` defaults to the text of the last `query_seconds` of segments.
+        """
+        now = time.time() if now is None else now
+        report = {"token_budget": self.token_budget}
+        chosen = self.select_frames(frames, report)
+        image_cost = sum(self.image_tokens * (2 if f.has_crop else 1) for f in chosen)
+        report["image_tokens"] = image_cost
+        text = self.pack_transcript(
+            segments, max(0, self.token_budget - image_cost), query, now, report
+        )
+        return PackedContext(text, chosen, report)
+
+    def select_frames(self, frames, report=None):
+        report = {} if report is None else report
+        report["frames_considered"] = len(frames)
+        previews = []
+        for frame in frames:
+            try:
+                previews.append((frame, np.asarray(frame.preview(), dtype=np.float32)))
+            except Exception as e:
+                log.debug("Frame %d has no usable preview: %s", frame.frame_id, e)
+        if not previews or self.max_frames <= 0:
+            report["frames_kept"] = 0
+            return []
+
+        chosen = [previews[-1]]
+        rest = previews[:-1]
+        near_duplicates = 0
+        while rest and len(chosen) < self.max_frames:
+            distances = [
+                min(float(np.abs(p - c).mean()) for _, c in chosen) for _, p in rest
+            ]
+            best = int(np.argmax(distances))
+            if distances[best] < self.min_frame_distance:
+                near_duplicates = len(rest)
+                break
+            chosen.append(rest.pop(best))
+
+        report["frames_kept"] = len(chosen)
+        report["frames_near_duplicate"] = near_duplicates
+        report["frames_dropped"] = len(frames) - len(chosen)
+        return sorted((f for f, _ in chosen), key=lambda f: f.timestamp)
+
+    def pack_transcript(self, segments, budget, query=None, now=None, report=None):
+        now = time.time() if now is None else now
+        report = {} if report is None else report
+
+        # Newest first, so a repeated segment is kept at its latest time.
+        unique = []
+        by_key = {}
+        duplicates = 0
+        for ts, text in reversed(segments):
+            text = collapse_repeats(text)
+            key = " ".join(tokenize(text)) or text.strip().lower()
+            if not key:
+                continue
+            if key in by_key:
+                by_key[key][3] += 1
+                duplicates += 1
+                continue
+            entry = [ts, text, tokenize(text), 1]
+            by_key[key] = entry
+            unique.append(entry)
+        unique.reverse()
+
+        if query is None:
+            cutoff = now - self.query_seconds
+            query = " ".join(text for ts, text in segments if ts >= cutoff)
+        relevance = self._relevance(unique, tokenize(query))
+
+        ranked = sorted(
+            range(len(unique)),
+            key=lambda i: 0.5 ** ((now - unique[i][0]) / self.half_life)
+            + self.relevance_weight * relevance[i],
+            reverse=True,
+        )
+        kept = set()
+        used = 0
+        for i in ranked:
+            cost = estimate_tokens(self._render(unique[i]))
+            if used + cost <= budget:
+                kept.add(i)
+                used += cost
+
+        lines = []
+        for i, entry in enumerate(unique):
+            if i in kept:
+                lines.append(self._render(entry))
+            elif lines and lines[-1] != "...":
+                lines.append("...")
+
+        report["segments"] = len(segments)
+        report["segments_kept"] = len(kept)
+        report["segments_dropped"] = len(unique) - len(kept)
+        report["repeats_collapsed"] = duplicates
+        report["transcript_tokens"] = used
+        if len(kept) < len(unique):
+            report["dropped_tokens"] = sum(
+                estimate_tokens(self._render(e)) for i, e in enumerate(unique) if i not in kept
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def _relevance(entries, query_terms):
+        """IDF-weighted query term overlap per entry, scaled to 0..1."""
+        if not entries or not query_terms:
+            return [0.0] * len(entries)
+        n = len(entries)
+        df = {}
+        for entry in entries:
+            for term in set(entry[2]):
+                df[term] = df.get(term, 0) + 1
+        query = set(query_terms)
+        scores = [
+            sum(math.log(1 + n / df[t]) for t in query.intersection(entry[2]))
+            for entry in entries
+        ]
+        top = max(scores)
+        return [s / top if top else 0.0 for s in scores]
+
+    @staticmethod
+    def _render(entry):
+        ts, text, _, count = entry
+        stamp = time.strftime("%H:%M:%S", time.localtime(ts))
+        suffix = f" (repeated {count}x)" if count > 1 else ""
+        return f"[{stamp}] {text}{suffix}"
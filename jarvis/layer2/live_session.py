@@ -1,33 +1,120 @@
 import asyncio
+import json
 import logging
+import re
 import time
 
-from google import genai
 from google.genai import types
 
 from jarvis.config import (
-    GEMINI_API_KEY,
     LIVE_API_MODEL,
     SEND_SAMPLE_RATE,
     SYSTEM_INSTRUCTION,
+    TASK_PROGRESS_MIN_CHARS,
+    TASK_PROGRESS_MAX_CHARS,
+    TASK_PROGRESS_MIN_INTERVAL_SECONDS,
 )
+from jarvis.layer3.scheduler import TaskScheduler, PRIORITIES, PRIORITY_NORMAL
 from jarvis.layer3.tools import get_function_declarations
+from jarvis.utils.genai_client import get_client
+from jarvis.utils.metrics import histogram
+from jarvis.utils.rate_limit import get_limiter, is_rate_limited, retry_after
 from jarvis.utils.observe import trace_span, flush
 
 log = logging.getLogger("jarvis.live")
 
+_wake_metric = histogram("jarvis_wake_to_first_audio_seconds",
+                         "Time from the wake word to the first audio of the reply")
+_connect_metric = histogram("jarvis_live_connect_seconds", "Live API WebSocket connect time")
+_feedback_metric = histogram("jarvis_task_first_feedback_seconds",
+                             "Time from a function call to the first result or progress injected")
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s)|\n")
+
+
+class ProgressChunker:
+    """Cuts streamed task output into progress updates worth speaking.
+
+    Text accumulates until at least `min_chars` have arrived and
+    `min_interval` seconds have passed since the last update, then is cut
+    at the last paragraph break, or failing that the last sentence end, at
+    most `max_chars` in.
+    """
+
+    def __init__(self, min_chars=TASK_PROGRESS_MIN_CHARS, max_chars=TASK_PROGRESS_MAX_CHARS,
+                 min_interval=TASK_PROGRESS_MIN_INTERVAL_SECONDS):
+        self._min_chars = min_chars
+        self._max_chars = max_chars
+        self._min_interval = min_interval
+        self._buffer = ""
+        self._last_emit = None
+
+    def feed(self, text, now=None):
+        """Add streamed text; return an update to send, or None."""
+        now = time.monotonic() if now is None else now
+        self._buffer += text
+        if len(self._buffer) < self._min_chars:
+            return None
+        if self._last_emit is not None and now - self._last_emit < self._min_interval:
+            return None
+        window = self._buffer[:self._max_chars]
+        cut = None
+        for match in _PARAGRAPH_RE.finditer(window):
+            cut = match.start()
+        if cut is None:
+            for match in _SENTENCE_END_RE.finditer(window):
+                cut = match.end()
+        if not cut:
+            if len(self._buffer) < self._max_chars:
+                return None
+            cut = window.rfind(" ") if " " in window else len(window)
+        piece, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:].lstrip()
+        if not piece:
+            return None
+        self._last_emit = now
+        return piece
+
+    def flush(self):
+        """Whatever is left once the stream has ended."""
+        piece, self._buffer = self._buffer.strip(), ""
+        return piece
+
 
 class LiveSession:
-    """Manages a Gemini Live API WebSocket session."""
+    """Manages a Gemini Live API WebSocket session.
+
+    `ready` is set once the connection attempt settles (open or failed), so
+    callers can wait for it instead of guessing. A session may be connected speculatively before
+    the wake word is confirmed; `mark_wake` then starts the wake-to-first-
+    audio clock.
 
-    def __init__(self, on_audio_response=None, on_function_call=None):
+    Function calls are acknowledged at once and run on `scheduler`, which
+    merges repeats of a call still in flight; the session's tasks are
+    cancelled when it closes. A handler may return an async iterator of
+    text instead of a string; early findings are then injected as they
+    stream in (see `ProgressChunker`).
+    """
+
+    def __init__(self, on_audio_response=None, on_function_call=None, on_interrupted=None,
+                 scheduler=None, limiter=None):
         self.on_audio_response = on_audio_response
         self.on_function_call = on_function_call
+        self.on_interrupted = on_interrupted
+        self._scheduler = scheduler or TaskScheduler()
         self._session = None
-        self._client = genai.Client(api_key=GEMINI_API_KEY)
+        self._client = get_client()
+        self._limiter = limiter or get_limiter(LIVE_API_MODEL)
         self._active = False
         self._last_activity = time.time()
-        self._pending_tasks = 0
+
+        self.ready = asyncio.Event()
+        self.connect_started = None
+        self.connect_seconds = None
+        self.limiter_wait_seconds = None
+        self.wake_time = None
+        self.wake_to_first_audio = None
+        self.task_feedback_seconds = []
 
     def _build_config(self):
         tools = get_function_declarations()
@@ -45,19 +132,30 @@ class LiveSession:
     async def connect(self):
         config = self._build_config()
         self._active = True
+        self.connect_started = time.monotonic()
         log.info("Connecting to Gemini Live API (model=%s)...", LIVE_API_MODEL)
 
         try:
-            async with self._client.aio.live.connect(
-                model=LIVE_API_MODEL, config=config
-            ) as session:
-                self._session = session
-                log.info("Connected to Gemini Live API")
-                await self._receive_loop()
+            # A concurrency slot is held for as long as the session is open.
+            async with self._limiter.slot() as waited:
+                self.limiter_wait_seconds = waited
+                async with self._client.aio.live.connect(
+                    model=LIVE_API_MODEL, config=config
+                ) as session:
+                    self._session = session
+                    self.connect_seconds = time.monotonic() - self.connect_started
+                    _connect_metric.record(self.connect_seconds)
+                    log.info("Connected to Gemini Live API in %.0f ms", self.connect_seconds * 1000)
+                    self._limiter.succeeded()
+                    self.ready.set()
+                    await self._receive_loop()
         except Exception as e:
+            if is_rate_limited(e):
+                self._limiter.throttled(hint=retry_after(e))
             log.error("Live API connection error: %s", e, exc_info=True)
         finally:
             self._active = False
+            self.ready.set()
             flush()
 
     async def _receive_loop(self):
@@ -77,6 +175,11 @@ class LiveSession:
                                 part.inline_data.data, bytes
                             ):
                                 log.debug("Received audio chunk: %d bytes", len(part.inline_data.data))
+                                if self.wake_time is not None and self.wake_to_first_audio is None:
+                                    self.wake_to_first_audio = time.monotonic() - self.wake_time
+                                    _wake_metric.record(self.wake_to_first_audio)
+                                    log.info("Wake to first audio: %.0f ms",
+                                             self.wake_to_first_audio * 1000)
                                 if self.on_audio_response:
                                     await self.on_audio_response(part.inline_data.data)
 
@@ -105,6 +208,8 @@ class LiveSession:
                         and response.server_content.interrupted
                     ):
                         log.info("Generation interrupted by user")
+                        if self.on_interrupted:
+                            self.on_interrupted()
 
         except Exception as e:
             log.error("Receive loop error: %s", e, exc_info=True)
@@ -115,33 +220,94 @@ class LiveSession:
     async def _handle_tool_call(self, tool_call):
         for fc in tool_call.function_calls:
             log.info("Function call: %s(%s)", fc.name, fc.args)
-            if self.on_function_call:
-                asyncio.create_task(self._execute_and_respond(fc))
-
-    async def _execute_and_respond(self, fc):
-        self._pending_tasks += 1
-        try:
-            function_response = types.FunctionResponse(
-                id=fc.id, name=fc.name,
-                response={"result": "Task started. I will announce the result when it's ready."}
-            )
-            await self._session.send_tool_response(
-                function_responses=[function_response]
+            if not self.on_function_call:
+                continue
+            try:
+                await self._session.send_tool_response(function_responses=[
+                    types.FunctionResponse(
+                        id=fc.id, name=fc.name,
+                        response={"result": "Task started. I will announce the result when it's ready."},
+                    )
+                ])
+                log.info("Sent immediate ack for %s, running task in background...", fc.name)
+            except Exception as e:
+                log.error("Tool ack error for %s: %s", fc.name, e)
+            args = dict(fc.args or {})
+            priority = PRIORITIES.get(str(args.pop("priority", "")).lower(), PRIORITY_NORMAL)
+            received = time.monotonic()
+            self._scheduler.submit(
+                self._task_key(fc.name, args),
+                lambda fc=fc, args=args, received=received: self._execute_and_respond(
+                    fc.name, args, received
+                ),
+                name=f"{fc.name}: {str(args.get('task_description', ''))[:60]}",
+                priority=priority,
+                owner=self,
             )
-            log.info("Sent immediate ack for %s, running task in background...", fc.name)
 
-            result = await self.on_function_call(fc.name, fc.args)
+    @staticmethod
+    def _task_key(name, args):
+        """Calls with the same name and arguments (ignoring case and spacing) are one task."""
+        normal = {
+            k: " ".join(v.lower().split()) if isinstance(v, str) else v
+            for k, v in args.items()
+        }
+        return name, json.dumps(normal, sort_keys=True, default=str)
+
+    async def _execute_and_respond(self, name, args, received):
+        try:
+            result = await self.on_function_call(name, args)
+            if hasattr(result, "__aiter__"):
+                await self._stream_result(name, result, received)
+                return
             if self._session and self._active:
                 summary = result[:1000] if result else "Task completed."
                 await self.inject_context(
                     f"[Background task completed. Announce these results to the user naturally]: {summary}"
                 )
                 self._last_activity = time.time()
-                log.info("Injected result for %s", fc.name)
+                self._record_feedback(name, received)
+                log.info("Injected result for %s", name)
         except Exception as e:
-            log.error("Tool execution error for %s: %s", fc.name, e)
-        finally:
-            self._pending_tasks -= 1
+            log.error("Tool execution error for %s: %s", name, e)
+
+    async def _stream_result(self, name, stream, received):
+        chunker = ProgressChunker()
+        updates = 0
+        async for text in stream:
+            progress = chunker.feed(text)
+            if progress and self._session and self._active:
+                await self.inject_context(
+                    "[Background task still running. Briefly tell the user what it "
+                    f"has found so far]: {progress}"
+                )
+                self._last_activity = time.time()
+                if not updates:
+                    self._record_feedback(name, received)
+                updates += 1
+                log.info("Injected progress update %d for %s", updates, name)
+
+        rest = chunker.flush()
+        if not (self._session and self._active):
+            return
+        if not updates:
+            message = ("[Background task completed. Announce these results to the user "
+                       f"naturally]: {rest[:TASK_PROGRESS_MAX_CHARS] or 'Task completed.'}")
+            self._record_feedback(name, received)
+        elif rest:
+            message = ("[Background task completed. Announce the rest of its results "
+                       f"naturally]: {rest[:TASK_PROGRESS_MAX_CHARS]}")
+        else:
+            message = "[Background task completed. Everything it found has been shared already.]"
+        await self.inject_context(message)
+        self._last_activity = time.time()
+        log.info("Injected result for %s after %d progress updates", name, updates)
+
+    def _record_feedback(self, name, received):
+        seconds = time.monotonic() - received
+        self.task_feedback_seconds.append(seconds)
+        _feedback_metric.record(seconds)
+        log.info("Time to first feedback for %s: %.1fs", name, seconds)
 
     async def send_audio(self, audio_data):
         if self._session and self._active:
@@ -186,11 +352,23 @@ class LiveSession:
                 turn_complete=True,
             )
 
+    async def wait_ready(self, timeout=None):
+        """Wait until the WebSocket is open; False on timeout or if connecting failed."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self._active and self._session is not None
+
+    def mark_wake(self, wake_time):
+        """Start the wake-to-first-audio clock (a `time.monotonic()` value)."""
+        self.wake_time = wake_time
+
     def is_active(self):
         return self._active
 
     def has_pending_tasks(self):
-        return self._pending_tasks > 0
+        return self._scheduler.pending(owner=self) > 0
 
     def time_since_last_activity(self):
         return time.time() - self._last_activity
@@ -198,5 +376,8 @@ class LiveSession:
     async def close(self):
         self._active = False
         self._session = None
+        cancelled = self._scheduler.cancel_owner(self)
+        if cancelled:
+            log.info("Cancelled %d background task(s) of the closed session", cancelled)
         log.info("Session closed")
         flush()
@@ -0,0 +1,385 @@
+import asyncio
+import logging
+import time
+
+from jarvis.config import (
+    SEND_SAMPLE_RATE,
+    AUDIO_FORMAT_WIDTH,
+    SCREEN_JPEG_QUALITY,
+    UPLINK_AUDIO_PACKET_MS,
+    UPLINK_QUEUE_MAX_SECONDS,
+    UPLINK_MAX_COALESCE_MS,
+    UPLINK_FRAME_INTERVAL_SECONDS,
+    UPLINK_FRAME_MIN_INTERVAL_SECONDS,
+    UPLINK_FRAME_MAX_INTERVAL_SECONDS,
+    UPLINK_FRAME_MAX_AGE_SECONDS,
+    UPLINK_JPEG_QUALITY_MIN,
+    UPLINK_JPEG_QUALITY_MAX,
+    UPLINK_VIDEO_BANDWIDTH_SHARE,
+    UPLINK_CONGESTION_LATENCY_SECONDS,
+    UPLINK_THROUGHPUT_WINDOW_SECONDS,
+)
+from jarvis.utils.metrics import counter, gauge, histogram
+
+log = logging.getLogger("jarvis.uplink")
+
+_queue_metric = gauge("jarvis_uplink_queue_depth", "Packets and frames waiting to be sent")
+_latency_metric = histogram("jarvis_uplink_send_latency_seconds",
+                            "Time from queueing a packet or frame to having sent it")
+_dropped_metric = counter("jarvis_uplink_dropped_total",
+                          "Audio packets and frames dropped from the uplink queue")
+
+_AUDIO = "audio"
+_IMAGE = "image"
+
+# Weight of the newest sample in the send latency and throughput averages.
+_LATENCY_SMOOTHING = 0.1
+_THROUGHPUT_SMOOTHING = 0.2
+
+_BACKOFF_FACTOR = 1.5
+_SPEEDUP_FACTOR = 0.9
+_QUALITY_STEP_DOWN = 10
+_QUALITY_STEP_UP = 5
+
+# Share of a window's sends that must find more data waiting for the window
+# to count as link-limited.
+_SATURATED_SHARE = 0.8
+
+
+class ThroughputMeter:
+    """Uplink throughput from the bytes drained over a wall-clock window.
+
+    A buffered websocket write returns as soon as the data is queued
+    locally, so the duration of a single send says nothing about the link.
+    Instead every send is counted with whether more data was already
+    waiting behind it. In a window where the sender was backlogged nearly
+    throughout, the link was the limit and bytes / elapsed is what it
+    drained; a window where the sender kept up only shows the link is at
+    least as fast as the offered load, which can raise the estimate but
+    never lower it.
+    """
+
+    def __init__(self, window=UPLINK_THROUGHPUT_WINDOW_SECONDS, clock=time.monotonic):
+        self._window = window
+        self._clock = clock
+        self._start = None
+        self._bytes = 0
+        self._sends = 0
+        self._backlogged = 0
+        self.throughput = None  # bytes per second
+
+    def record(self, nbytes, backlogged):
+        now = self._clock()
+        if self._start is None:
+            self._start = now
+        self._bytes += nbytes
+        self._sends += 1
+        self._backlogged += bool(backlogged)
+        elapsed = now - self._start
+        if elapsed < self._window:
+            return
+        rate = self._bytes / elapsed
+        if self._backlogged >= _SATURATED_SHARE * self._sends:
+            if self.throughput is None:
+                self.throughput = rate
+            else:
+                self.throughput += _THROUGHPUT_SMOOTHING * (rate - self.throughput)
+        elif self.throughput is not None and rate > self.throughput:
+            self.throughput = rate
+        self._start = now
+        self._bytes = self._sends = self._backlogged = 0
+
+
+class VideoRateController:
+    """Picks the minimum spacing and JPEG quality of uplinked screen frames.
+
+    Multiplicative-decrease / gradual-increase on two knobs: after each
+    frame send, a congested link (frames waiting too long to go out) or a
+    frame bit rate above `share` of the measured link throughput (see
+    `ThroughputMeter`, fed every send on the socket) lowers quality a step
+    and spaces frames out; otherwise both creep back towards the fast,
+    sharp end.
+    """
+
+    def __init__(
+        self,
+        interval=UPLINK_FRAME_INTERVAL_SECONDS,
+        min_interval=UPLINK_FRAME_MIN_INTERVAL_SECONDS,
+        max_interval=UPLINK_FRAME_MAX_INTERVAL_SECONDS,
+        quality=SCREEN_JPEG_QUALITY,
+        min_quality=UPLINK_JPEG_QUALITY_MIN,
+        max_quality=UPLINK_JPEG_QUALITY_MAX,
+        share=UPLINK_VIDEO_BANDWIDTH_SHARE,
+        congestion_latency=UPLINK_CONGESTION_LATENCY_SECONDS,
+    ):
+        self.interval = interval
+        self.quality = quality
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._min_quality = min_quality
+        self._max_quality = max_quality
+        self._share = share
+        self._congestion_latency = congestion_latency
+        self.meter = ThroughputMeter()
+
+    @property
+    def throughput(self):
+        return self.meter.throughput
+
+    def update(self, frame_bytes, send_latency):
+        """Adjust after a frame send; `send_latency` is how long the frame waited to go out."""
+        congested = send_latency is not None and send_latency > self._congestion_latency
+        throughput = self.throughput
+        over_budget = (
+            throughput is not None
+            and frame_bytes / self.interval > self._share * throughput
+        )
+        if congested or over_budget:
+            self.interval = min(self._max_interval, self.interval * _BACKOFF_FACTOR)
+            self.quality = max(self._min_quality, self.quality - _QUALITY_STEP_DOWN)
+        else:
+            self.interval = max(self._min_interval, self.interval * _SPEEDUP_FACTOR)
+            self.quality = min(self._max_quality, self.quality + _QUALITY_STEP_UP)
+
+
+class Uplink:
+    """Streams microphone audio and screen frames to a Live session.
+
+    An audio pump wakes on every captured block, cuts the new samples into
+    fixed-size packets and queues them; a frame pump queues the latest
+    screen frame when it has not been sent yet, paced and compressed by a
+    `VideoRateController`. One sender drains the bounded queue in order, so
+    the socket sees a steady packet size instead of whatever happened to
+    accumulate.
+
+    When the sender falls behind (a packet waited longer than it lasts),
+    consecutive audio packets are coalesced into one send (up to UPLINK_MAX_COALESCE_MS). When the queue is full
+    the oldest item is dropped, which bounds the lag. Queued frames are
+    dropped once a newer frame is queued or they are older than
+    UPLINK_FRAME_MAX_AGE_SECONDS. A frame only counts as sent once
+    `send_image` returns, so one that is lost is queued again.
+    """
+
+    def __init__(
+        self,
+        session,
+        audio_reader,
+        frame_buffer=None,
+        audio_event=None,
+        packet_ms=UPLINK_AUDIO_PACKET_MS,
+        queue_seconds=UPLINK_QUEUE_MAX_SECONDS,
+        max_coalesce_ms=UPLINK_MAX_COALESCE_MS,
+        frame_max_age=UPLINK_FRAME_MAX_AGE_SECONDS,
+        last_sent_frame_id=None,
+        video_rate=None,
+    ):
+        self._session = session
+        self._reader = audio_reader
+        self._frame_buffer = frame_buffer
+        self._audio_event = audio_event
+        self._packet_ms = packet_ms
+        self._packet_samples = int(SEND_SAMPLE_RATE * packet_ms / 1000)
+        self._packet_bytes = self._packet_samples * AUDIO_FORMAT_WIDTH
+        self._max_coalesce_packets = max(1, max_coalesce_ms // packet_ms)
+        self._queue = asyncio.Queue(maxsize=max(1, int(queue_seconds * 1000 / packet_ms)))
+        self._frame_max_age = frame_max_age
+        self._latest_frame_id = None
+        # The newest frame is queued and neither sent nor lost yet.
+        self._frame_pending = False
+        # Frame ids only grow, so everything up to this one has been sent.
+        self._last_sent_frame_id = last_sent_frame_id
+        self.video_rate = video_rate or VideoRateController()
+        self._running = False
+
+        self.audio_packets_sent = 0
+        self.audio_sends = 0
+        self.audio_bytes_sent = 0
+        self.audio_packets_dropped = 0
+        self.audio_samples_lost = 0
+        self.frames_sent = 0
+        self.frame_bytes_sent = 0
+        self.frames_dropped = 0
+        self.frames_unchanged = 0
+        self.max_queue_depth = 0
+        self.send_latency = None
+        self.max_send_latency = 0.0
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _enqueue(self, kind, payload, frame_id=None):
+        item = (kind, payload, frame_id, time.monotonic())
+        if self._queue.full():
+            dropped = self._queue.get_nowait()
+            self._count_drop(dropped)
+        self._queue.put_nowait(item)
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        _queue_metric.set(self._queue.qsize())
+
+    def _count_drop(self, item):
+        _dropped_metric.inc()
+        if item[0] == _AUDIO:
+            self.audio_packets_dropped += 1
+        else:
+            self.frames_dropped += 1
+            self._frame_lost(item[2])
+
+    def _frame_lost(self, frame_id):
+        # Let the pump queue the newest frame again; on a static screen it
+        # would otherwise never be sent.
+        if frame_id == self._latest_frame_id:
+            self._frame_pending = False
+
+    async def _audio_pump(self):
+        while self._running:
+            if self._audio_event is not None:
+                await self._audio_event.wait()
+                self._audio_event.clear()
+            else:
+                await asyncio.sleep(self._packet_ms / 1000)
+            views, lost = self._reader.read(multiple=self._packet_samples)
+            if lost:
+                self.audio_samples_lost += lost
+                log.warning("Uplink fell behind capture, skipped %d audio samples", lost)
+            if not views:
+                continue
+            pcm = b"".join(views)
+            for offset in range(0, len(pcm), self._packet_bytes):
+                self._enqueue(_AUDIO, pcm[offset:offset + self._packet_bytes])
+
+    async def _frame_pump(self):
+        while self._running:
+            latest = self._frame_buffer.get_latest()
+            sent = self._last_sent_frame_id
+            if latest is not None and (
+                (sent is not None and latest.frame_id <= sent)
+                or (latest.frame_id == self._latest_frame_id and self._frame_pending)
+            ):
+                self.frames_unchanged += 1
+            elif latest is not None:
+                quality = self.video_rate.quality
+                image = await asyncio.to_thread(latest.jpeg, quality=quality)
+                self._latest_frame_id = latest.frame_id
+                self._frame_pending = True
+                self._enqueue(_IMAGE, image, latest.frame_id)
+                if latest.has_crop:
+                    crop = await asyncio.to_thread(latest.jpeg, quality=quality, crop=True)
+                    self._enqueue(_IMAGE, crop, latest.frame_id)
+            await asyncio.sleep(self.video_rate.interval)
+
+    async def _sender(self):
+        held = None
+        while self._running:
+            item = held or await self._queue.get()
+            held = None
+            _queue_metric.set(self._queue.qsize())
+            kind, payload, frame_id, queued_at = item
+
+            if kind == _IMAGE:
+                if frame_id != self._latest_frame_id or (
+                    time.monotonic() - queued_at > self._frame_max_age
+                ):
+                    self._count_drop(item)
+                    continue
+                backlogged = not self._queue.empty()
+                try:
+                    await self._session.send_image(payload)
+                except Exception as e:
+                    log.error("Frame send error: %s", e)
+                    self._frame_lost(frame_id)
+                    continue
+                if self._last_sent_frame_id is None or frame_id > self._last_sent_frame_id:
+                    self._last_sent_frame_id = frame_id
+                if frame_id == self._latest_frame_id:
+                    self._frame_pending = False
+                self.video_rate.meter.record(len(payload), backlogged)
+                self.frames_sent += 1
+                self.frame_bytes_sent += len(payload)
+                self._record_latency(queued_at)
+                self.video_rate.update(len(payload), time.monotonic() - queued_at)
+                continue
+
+            # A packet that waited longer than it lasts means the socket is
+            # behind: merge the audio packets already waiting into one send.
+            packets = [payload]
+            behind = time.monotonic() - queued_at > self._packet_ms / 1000
+            while behind and len(packets) < self._max_coalesce_packets and not self._queue.empty():
+                nxt = self._queue.get_nowait()
+                if nxt[0] != _AUDIO:
+                    held = nxt
+                    break
+                packets.append(nxt[1])
+            data = packets[0] if len(packets) == 1 else b"".join(packets)
+            backlogged = behind or not self._queue.empty()
+            try:
+                await self._session.send_audio(data)
+            except Exception as e:
+                log.error("Audio send error: %s", e)
+                continue
+            # Audio shares the socket, so its bytes count towards the link's
+            # throughput; only frame sends adjust the video rate.
+            self.video_rate.meter.record(len(data), backlogged)
+            self.audio_sends += 1
+            self.audio_packets_sent += len(packets)
+            self.audio_bytes_sent += len(data)
+            self._record_latency(queued_at)
+
+    def _record_latency(self, queued_at):
+        latency = time.monotonic() - queued_at
+        _latency_metric.record(latency)
+        self.max_send_latency = max(self.max_send_latency, latency)
+        if self.send_latency is None:
+            self.send_latency = latency
+        else:
+            self.send_latency += _LATENCY_SMOOTHING * (latency - self.send_latency)
+
+    async def _watch_session(self):
+        while self._running and self._session.is_active():
+            await asyncio.sleep(0.2)
+
+    async def run(self):
+        """Stream until the session closes or `stop` is called."""
+        self._running = True
+        tasks = [
+            asyncio.create_task(self._audio_pump()),
+            asyncio.create_task(self._sender()),
+            asyncio.create_task(self._watch_session()),
+        ]
+        if self._frame_buffer is not None:
+            tasks.append(asyncio.create_task(self._frame_pump()))
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    log.error("Uplink error: %s", task.exception())
+        finally:
+            self._running = False
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            log.info("Uplink ended: %s", self.stats())
+
+    def stop(self):
+        self._running = False
+
+    def stats(self):
+        return {
+            "audio_packets_sent": self.audio_packets_sent,
+            "audio_sends": self.audio_sends,
+            "audio_bytes_sent": self.audio_bytes_sent,
+            "audio_packets_dropped": self.audio_packets_dropped,
+            "audio_samples_lost": self.audio_samples_lost,
+            "frames_sent": self.frames_sent,
+            "frame_bytes_sent": self.frame_bytes_sent,
+            "frames_dropped": self.frames_dropped,
+            "frames_unchanged": self.frames_unchanged,
+            "frame_interval_seconds": round(self.video_rate.interval, 2),
+            "jpeg_quality": self.video_rate.quality,
+            "throughput_kbps": (round(self.video_rate.throughput * 8 / 1000, 1)
+                                if self.video_rate.throughput else None),
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "send_latency_ms": round(self.send_latency * 1000, 1) if self.send_latency else None,
+            "max_send_latency_ms": round(self.max_send_latency * 1000, 1),
+        }
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from jarvis.config import (
+    TASK_CACHE_MAX_ENTRIES,
+    TASK_CACHE_TTL_SECONDS,
+    TASK_CACHE_DISK_ENABLED,
+    TASK_CACHE_DIR,
+    TASK_CACHE_DISK_MAX_ENTRIES,
+)
+from jarvis.utils.metrics import counter
+
+log = logging.getLogger("jarvis.cache")
+
+_hit_metric = counter("jarvis_task_cache_hits_total", "Background task results served from cache")
+_miss_metric = counter("jarvis_task_cache_misses_total", "Background task cache misses")
+
+# Transcript excerpts carry capture times; the same excerpt asked about a
+# minute later should still hit.
+_TIMESTAMP_RE = re.compile(r"\[\d{1,2}:\d{2}(?::\d{2})?\]")
+
+
+def _normalize(text):
+    return " ".join(_TIMESTAMP_RE.sub(" ", text or "").lower().split())
+
+
+def cache_key(*parts):
+    """Hash of the parts, ignoring case, spacing and transcript timestamps."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(_normalize(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU cache of task results that expire after `ttl_seconds`.
+
+    With a `directory`, every entry is also written there as a small JSON
+    file, so results survive restarts; a memory miss falls through to disk
+    and promotes what it finds. Expired files are deleted when found and on
+    startup, and the oldest files go once there are more than
+    `max_disk_entries`.
+    """
+
+    def __init__(self, max_entries=TASK_CACHE_MAX_ENTRIES, ttl_seconds=TASK_CACHE_TTL_SECONDS,
+                 directory=TASK_CACHE_DIR if TASK_CACHE_DISK_ENABLED else None,
+                 max_disk_entries=TASK_CACHE_DISK_MAX_ENTRIES, clock=time.time):
+        self._max_entries = max_entries
+        self._max_disk_entries = max_disk_entries
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (created, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._directory = None
+        if directory:
+            self._directory = os.path.expanduser(directory)
+            try:
+                os.makedirs(self._directory, exist_ok=True)
+                self.prune_disk()
+            except OSError as e:
+                log.error("Task cache directory unavailable, caching in memory only: %s", e)
+                self._directory = None
+
+    def _path(self, key):
+        return os.path.join(self._directory, f"{key}.json")
+
+    def _disk_files(self):
+        return [
+            os.path.join(self._directory, name)
+            for name in os.listdir(self._directory)
+            if name.endswith(".json")
+        ]
+
+    def _fresh(self, created):
+        return self._clock() - created < self._ttl
+
+    def get(self, key):
+        """Cached value for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._fresh(entry[0]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    _hit_metric.inc()
+                    return entry[1]
+                del self._entries[key]
+                self.expired += 1
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                _miss_metric.inc()
+                return None
+            self.hits += 1
+            _hit_metric.inc()
+            self.disk_hits += 1
+            self._store(key, entry)
+            return entry[1]
+
+    def put(self, key, value):
+        entry = (self._clock(), value)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        if self._directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+            created, value = float(record["created"]), record["value"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            log.warning("Unreadable task cache entry %s: %s", key[:12], e)
+            self._remove(path)
+            return None
+        if not self._fresh(created):
+            self.expired += 1
+            self._remove(path)
+            return None
+        return created, value
+
+    def _write_disk(self, key, entry):
+        if self._directory is None:
+            return
+        path = self._path(key)
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"created": entry[0], "value": entry[1]}, f)
+            os.replace(tmp, path)
+            self._enforce_disk_cap()
+        except OSError as e:
+            log.warning("Could not write task cache entry: %s", e)
+
+    def _enforce_disk_cap(self):
+        """Delete the oldest files past `max_disk_entries`; returns how many."""
+        paths = self._disk_files()
+        excess = len(paths) - self._max_disk_entries
+        if excess <= 0:
+            return 0
+        ages = []
+        for path in paths:
+            try:
+                ages.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        ages.sort()
+        for _, path in ages[:excess]:
+            self._remove(path)
+        self.disk_evictions += excess
+        return excess
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def prune_disk(self):
+        """Delete expired and unreadable entries, then apply the size cap."""
+        removed = 0
+        for path in self._disk_files():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    created = float(json.load(f)["created"])
+            except (OSError, ValueError, TypeError, KeyError):
+                created = None
+            if created is None or not self._fresh(created):
+                self._remove(path)
+                removed += 1
+        removed += self._enforce_disk_cap()
+        if removed:
+            log.info("Task cache: removed %d entries from disk", removed)
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._directory is not None:
+            for path in self._disk_files():
+                self._remove(path)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+        }
@@ -0,0 +1,256 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from jarvis.config import TASK_WORKERS, TASK_QUEUE_MAX
+from jarvis.utils.metrics import counter, gauge, histogram
+
+log = logging.getLogger("jarvis.scheduler")
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+PRIORITIES = {"high": PRIORITY_HIGH, "normal": PRIORITY_NORMAL, "low": PRIORITY_LOW}
+
+_run_metric = histogram("jarvis_task_run_seconds", "Background task run time")
+_queue_metric = histogram("jarvis_task_queue_seconds", "Background task wait before a worker picks it up")
+_pending_metric = gauge("jarvis_tasks_pending", "Background tasks queued or running")
+_coalesced_metric = counter("jarvis_tasks_coalesced_total", "Requests merged into a task in flight")
+
+
+def _mark_retrieved(future):
+    # Most submissions are fire-and-forget and nobody awaits the future; a
+    # drop or failure is logged by the scheduler, so without this asyncio
+    # would also report "Future exception was never retrieved".
+    if not future.cancelled():
+        future.exception()
+
+
+class BackgroundTask:
+    """A submitted unit of background work, shared by every identical request."""
+
+    def __init__(self, key, name, factory, priority, owner):
+        self.key = key
+        self.name = name
+        self.priority = priority
+        self.owner = owner
+        self.future = asyncio.get_running_loop().create_future()
+        self.future.add_done_callback(_mark_retrieved)
+        self.requests = 1
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.status = "queued"
+        self._factory = factory
+        self._task = None
+
+    @property
+    def queue_seconds(self):
+        if self.started_at is None:
+            return time.monotonic() - self.submitted_at
+        return self.started_at - self.submitted_at
+
+    @property
+    def run_seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    async def result(self):
+        """Wait for the outcome without cancelling the task if the waiter is cancelled."""
+        return await asyncio.shield(self.future)
+
+
+class TaskScheduler:
+    """Runs background tasks on a bounded pool of asyncio workers.
+
+    Tasks wait in a priority queue (lower number first, FIFO within a
+    priority). A task submitted with the key of one that is still queued or
+    running is not started again: the caller gets the existing task, whose
+    priority is raised if the newcomer's is higher. Each task has an owner
+    (the Live session that asked for it), and `cancel_owner` drops every
+    queued and running task of that owner. When the queue is full the
+    lowest-priority, newest queued task is dropped.
+    """
+
+    def __init__(self, workers=TASK_WORKERS, max_queue=TASK_QUEUE_MAX):
+        self._workers = workers
+        self._max_queue = max_queue
+        self._heap = []
+        self._seq = itertools.count()
+        self._by_key = {}
+        self._running_tasks = set()
+        self._wakeup = None
+        self._worker_tasks = []
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self.ran = 0
+        self.queue_seconds_total = 0.0
+        self.max_queue_seconds = 0.0
+        self.run_seconds_total = 0.0
+        self.max_run_seconds = 0.0
+
+    def _ensure_workers(self):
+        if self._worker_tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self._workers)
+        ]
+        log.info("Task scheduler started (%d workers)", self._workers)
+
+    def submit(self, key, factory, name=None, priority=PRIORITY_NORMAL, owner=None):
+        """Queue `factory()` (a coroutine function) unless an identical task is in flight."""
+        self._ensure_workers()
+        existing = self._by_key.get(key)
+        if existing is not None:
+            existing.requests += 1
+            self.coalesced += 1
+            _coalesced_metric.inc()
+            if priority < existing.priority and existing.status == "queued":
+                existing.priority = priority
+                heapq.heappush(self._heap, (priority, next(self._seq), existing))
+            log.info("Coalesced duplicate task '%s' (%s, %d requests)",
+                     existing.name, existing.status, existing.requests)
+            return existing
+
+        task = BackgroundTask(key, name or str(key), factory, priority, owner)
+        self._by_key[key] = task
+        heapq.heappush(self._heap, (priority, next(self._seq), task))
+        self.submitted += 1
+        _pending_metric.set(len(self._by_key))
+        if self.queue_depth > self._max_queue:
+            self._drop_one()
+        self._wakeup.set()
+        return task
+
+    async def run(self, key, factory, name=None, priority=PRIORITY_NORMAL, owner=None):
+        """Submit and wait for the result."""
+        return await self.submit(key, factory, name, priority, owner).result()
+
+    def _drop_one(self):
+        queued = [t for t in self._by_key.values() if t.status == "queued"]
+        victim = max(queued, key=lambda t: (t.priority, t.submitted_at))
+        log.warning("Task queue full, dropping '%s'", victim.name)
+        self.dropped += 1
+        self._finish(victim, "dropped")
+        victim.future.set_exception(RuntimeError("Task dropped: too many queued tasks"))
+
+    def _pop(self):
+        # Entries for tasks that were re-prioritised, cancelled or dropped
+        # are left in the heap and skipped here.
+        while self._heap:
+            priority, _, task = heapq.heappop(self._heap)
+            if task.status == "queued" and task.priority == priority:
+                return task
+        return None
+
+    async def _worker(self):
+        while True:
+            task = self._pop()
+            if task is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            task.status = "running"
+            task.started_at = time.monotonic()
+            self._running_tasks.add(task)
+            task._task = asyncio.create_task(task._factory())
+            # wait() rather than await, so cancelling the task does not
+            # cancel the worker.
+            await asyncio.wait([task._task])
+            self._running_tasks.discard(task)
+
+            if task.status != "running":
+                continue  # cancelled by cancel_owner, already accounted
+            if task._task.cancelled():
+                self._finish(task, "cancelled")
+                task.future.cancel()
+            elif task._task.exception() is not None:
+                log.error("Task '%s' raised: %r", task.name, task._task.exception())
+                self._finish(task, "failed")
+                task.future.set_exception(task._task.exception())
+            else:
+                self._finish(task, "done")
+                task.future.set_result(task._task.result())
+
+    def _finish(self, task, status):
+        task.status = status
+        task.finished_at = time.monotonic()
+        self._by_key.pop(task.key, None)
+        _pending_metric.set(len(self._by_key))
+        counter(f"jarvis_tasks_{status}_total", f"Background tasks {status}").inc()
+        if status == "done":
+            self.completed += 1
+        elif status == "failed":
+            self.failed += 1
+        elif status == "cancelled":
+            self.cancelled += 1
+        if task.started_at is not None:
+            self.ran += 1
+            self.queue_seconds_total += task.queue_seconds
+            self.max_queue_seconds = max(self.max_queue_seconds, task.queue_seconds)
+            self.run_seconds_total += task.run_seconds
+            self.max_run_seconds = max(self.max_run_seconds, task.run_seconds)
+            _queue_metric.record(task.queue_seconds)
+            _run_metric.record(task.run_seconds)
+        log.info("Task '%s' %s: queued %.1fs, ran %.1fs, %d request(s)",
+                 task.name, status, task.queue_seconds, task.run_seconds, task.requests)
+
+    def cancel_owner(self, owner):
+        """Cancel every queued or running task submitted by `owner`."""
+        tasks = [t for t in self._by_key.values() if t.owner is owner]
+        for task in tasks:
+            running = task.status == "running"
+            self._finish(task, "cancelled")
+            if running:
+                task._task.cancel()
+            task.future.cancel()
+        return len(tasks)
+
+    def pending(self, owner=None):
+        """Number of queued plus running tasks, optionally only `owner`'s."""
+        return sum(1 for t in self._by_key.values() if owner is None or t.owner is owner)
+
+    @property
+    def queue_depth(self):
+        return sum(1 for t in self._by_key.values() if t.status == "queued")
+
+    def stats(self):
+        ran = self.ran
+        return {
+            "queued": self.queue_depth,
+            "running": len(self._running_tasks),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "dropped": self.dropped,
+            "avg_queue_seconds": self.queue_seconds_total / ran if ran else 0.0,
+            "max_queue_seconds": self.max_queue_seconds,
+            "avg_run_seconds": self.run_seconds_total / ran if ran else 0.0,
+            "max_run_seconds": self.max_run_seconds,
+        }
+
+    async def stop(self):
+        """Cancel all tasks and shut the workers down."""
+        for task in list(self._by_key.values()):
+            running = task.status == "running"
+            self._finish(task, "cancelled")
+            if running:
+                task._task.cancel()
+            task.future.cancel()
+        for worker in self._worker_tasks:
+            worker.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
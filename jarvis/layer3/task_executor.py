@@ -1,28 +1,47 @@
 import asyncio
 import logging
-import re
 
-from google import genai
 from google.genai import types
-from google.genai.errors import ClientError, ServerError
 
-from jarvis.config import GEMINI_API_KEY, BACKGROUND_MODEL
+from jarvis.config import BACKGROUND_MODEL, TASK_CACHE_ENABLED, RATE_LIMIT_MAX_RETRIES
+from jarvis.layer3.result_cache import ResultCache, cache_key
+from jarvis.utils.genai_client import get_client
+from jarvis.utils.rate_limit import get_limiter, is_rate_limited, retry_after
 from jarvis.utils.observe import trace_span, generation_span, flush
 
 log = logging.getLogger("jarvis.task")
 
-MAX_RETRIES = 3
-
 
 class TaskExecutor:
-    """Executes background tasks using Gemini 3 Pro."""
-
-    def __init__(self):
-        self._client = genai.Client(api_key=GEMINI_API_KEY)
-
-    async def execute(self, task_description, context=None):
-        log.info("Starting background task: %s", task_description[:150])
+    """Executes background tasks using Gemini 3 Pro.
+
+    Successful results are cached by task description and context (see
+    `ResultCache`); `use_cache=False` skips the lookup and refreshes the
+    entry. Calls go through the model's shared `RateLimiter`, which also
+    retries 429s. `client`, `cache` and `limiter` can be injected, e.g.
+    stubs in tests.
+
+    `execute` returns the whole result; `execute_stream` yields it in
+    pieces as the model generates them.
+    """
+
+    def __init__(self, client=None, cache=None, limiter=None):
+        self._client = client or get_client()
+        self._limiter = limiter or get_limiter(BACKGROUND_MODEL)
+        if cache is None and TASK_CACHE_ENABLED:
+            cache = ResultCache()
+        self.cache = cache
+
+    async def _cached(self, key, use_cache):
+        if key is None or not use_cache:
+            return None
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            log.info("Task result served from cache (%s)", self.cache.stats())
+        return cached
 
+    @staticmethod
+    def _build_request(task_description, context):
         prompt_parts = [f"Task: {task_description}"]
         if context:
             prompt_parts.append(f"\nRelevant context:\n{context}")
@@ -41,42 +60,90 @@ class TaskExecutor:
         config = types.GenerateContentConfig(
             tools=tools,
         )
+        return prompt, config
 
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                response = await self._client.aio.models.generate_content(
+    async def execute(self, task_description, context=None, use_cache=True):
+        log.info("Starting background task: %s", task_description[:150])
+
+        key = cache_key(task_description, context) if self.cache is not None else None
+        cached = await self._cached(key, use_cache)
+        if cached is not None:
+            return cached
+        prompt, config = self._build_request(task_description, context)
+
+        try:
+            response = await self._limiter.call(
+                lambda: self._client.aio.models.generate_content(
                     model=BACKGROUND_MODEL,
                     contents=prompt,
                     config=config,
                 )
-
-                result = response.text if response.text else "Task completed but no text output was generated."
+            )
+        except Exception as e:
+            if is_rate_limited(e):
+                log.error("Task failed after maximum retries due to rate limiting: %s", e)
+                return "Task failed after maximum retries due to rate limiting."
+            error_msg = f"Task failed: {str(e)}"
+            log.error(error_msg, exc_info=True)
+            return error_msg
+        finally:
+            flush()
+
+        result = response.text if response.text else "Task completed but no text output was generated."
+        log.info("Task complete: %s", result[:300])
+        if key is not None and response.text:
+            await asyncio.to_thread(self.cache.put, key, result)
+        return result
+
+    async def execute_stream(self, task_description, context=None, use_cache=True):
+        """Yield the result text piece by piece as the model streams it.
+
+        Errors end the stream with a "Task failed: ..." piece, mirroring
+        `execute`. Rate-limit retries only happen before anything has been
+        yielded.
+        """
+        log.info("Starting background task (streaming): %s", task_description[:150])
+
+        key = cache_key(task_description, context) if self.cache is not None else None
+        cached = await self._cached(key, use_cache)
+        if cached is not None:
+            yield cached
+            return
+        prompt, config = self._build_request(task_description, context)
+
+        for attempt in range(1, RATE_LIMIT_MAX_RETRIES + 1):
+            parts = []
+            try:
+                # The slot is held until the stream is drained.
+                async with self._limiter.slot():
+                    stream = await self._client.aio.models.generate_content_stream(
+                        model=BACKGROUND_MODEL,
+                        contents=prompt,
+                        config=config,
+                    )
+                    async for chunk in stream:
+                        if chunk.text:
+                            parts.append(chunk.text)
+                            yield chunk.text
+                self._limiter.succeeded()
+
+                result = "".join(parts)
+                if not result:
+                    yield "Task completed but no text output was generated."
+                    return
                 log.info("Task complete: %s", result[:300])
-                return result
-
-            except (ClientError, ServerError) as e:
-                if e.code in (429, 503) and attempt < MAX_RETRIES:
-                    delay = self._parse_retry_delay(str(e), default=30)
-                    log.warning("API error %d (attempt %d/%d), retrying in %.0fs...",
-                                e.code, attempt, MAX_RETRIES, delay)
-                    await asyncio.sleep(delay)
-                    continue
-                error_msg = f"Task failed: {str(e)}"
-                log.error(error_msg, exc_info=True)
-                return error_msg
+                if key is not None:
+                    await asyncio.to_thread(self.cache.put, key, result)
+                return
 
             except Exception as e:
-                error_msg = f"Task failed: {str(e)}"
-                log.error(error_msg, exc_info=True)
-                return error_msg
+                if is_rate_limited(e) and not parts and attempt < RATE_LIMIT_MAX_RETRIES:
+                    self._limiter.throttled(attempt, retry_after(e))
+                    continue
+                log.error("Task failed: %s", e, exc_info=True)
+                yield f"Task failed: {str(e)}"
+                return
             finally:
                 flush()
 
-        return "Task failed after maximum retries due to rate limiting."
-
-    @staticmethod
-    def _parse_retry_delay(error_text, default=60):
-        match = re.search(r"retry in ([\d.]+)s", error_text, re.IGNORECASE)
-        if match:
-            return min(float(match.group(1)) + 5, 120)
-        return default
+        yield "Task failed after maximum retries due to rate limiting."
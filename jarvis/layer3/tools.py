@@ -23,6 +23,29 @@ def get_function_declarations():
                     "type": "string",
                     "description": "Relevant context from the conversation or screen that would help complete the task",
                 },
+                "lookback_minutes": {
+                    "type": "integer",
+                    "description": (
+                        "If no context is given, how many minutes of recently overheard "
+                        "audio transcript to attach (for example when the user refers to "
+                        "something said earlier today)"
+                    ),
+                },
+                "fresh": {
+                    "type": "boolean",
+                    "description": (
+                        "true when the user explicitly wants the task redone rather than "
+                        "a recent answer to the same request repeated"
+                    ),
+                },
+                "priority": {
+                    "type": "string",
+                    "enum": ["high", "normal", "low"],
+                    "description": (
+                        "high if the user is waiting on the answer right now, low for "
+                        "nice-to-have follow-ups; defaults to normal"
+                    ),
+                },
             },
             "required": ["task_description"],
         },
@@ -2,16 +2,40 @@ import asyncio
 import logging
 import sys
 import time
+from collections import deque
 
 from jarvis.utils.buffer import TranscriptBuffer, FrameBuffer
+from jarvis.utils.context_log import ContextLog
+from jarvis.utils.search_index import TranscriptIndex
 from jarvis.layer1.audio_capture import AudioCapture
 from jarvis.layer1.screen_capture import ScreenCapture
-from jarvis.layer1.wake_word import WakeWordDetector
+from jarvis.layer1.wake_word import WakeWordDetector, KeywordSpotter
 from jarvis.layer2.live_session import LiveSession
 from jarvis.layer2.context_inject import ContextInjector
+from jarvis.layer2.uplink import Uplink
 from jarvis.layer2.audio_playback import AudioPlayback
 from jarvis.layer3.task_executor import TaskExecutor
-from jarvis.config import SILENCE_TIMEOUT_SECONDS
+from jarvis.layer3.scheduler import TaskScheduler
+from jarvis.config import (
+    SILENCE_TIMEOUT_SECONDS,
+    WAKE_SPOTTER_ENABLED,
+    SCREEN_BUFFER_MAX_FRAMES,
+    SCREEN_BUFFER_MAX_BYTES,
+    TRANSCRIPT_BUFFER_MINUTES,
+    TRANSCRIPT_CONTEXT_MINUTES,
+    TRANSCRIPT_MAX_LOOKBACK_MINUTES,
+    CONTEXT_LOG_ENABLED,
+    TASK_CONTEXT_TOKEN_BUDGET,
+    TASK_STREAMING_ENABLED,
+    LIVE_PRECONNECT_ENABLED,
+    LIVE_PRECONNECT_TTL_SECONDS,
+    LIVE_PRECONNECT_MAX_PER_MINUTE,
+    LIVE_CONNECT_TIMEOUT_SECONDS,
+    METRICS_HTTP_PORT,
+    METRICS_JSON_PATH,
+    METRICS_JSON_INTERVAL_SECONDS,
+)
+from jarvis.utils import metrics
 from jarvis.utils.observe import trace_span, flush
 
 log = logging.getLogger("jarvis.main")
@@ -22,23 +46,45 @@ class Jarvis:
     """Main orchestrator for the Jarvis ambient AI copilot."""
 
     def __init__(self, audio_device=None):
-        self.transcript_buffer = TranscriptBuffer()
-        self.frame_buffer = FrameBuffer()
+        self.context_log = None
+        if CONTEXT_LOG_ENABLED:
+            try:
+                self.context_log = ContextLog()
+            except OSError as e:
+                log.error("Context log unavailable, history will not persist: %s", e)
+        self.transcript_index = TranscriptIndex(TRANSCRIPT_BUFFER_MINUTES)
+        self.transcript_buffer = TranscriptBuffer(
+            TRANSCRIPT_BUFFER_MINUTES, context_log=self.context_log,
+            index=self.transcript_index,
+        )
+        self.frame_buffer = FrameBuffer(
+            SCREEN_BUFFER_MAX_FRAMES, SCREEN_BUFFER_MAX_BYTES, context_log=self.context_log
+        )
 
         self.audio_capture = AudioCapture(
             self.transcript_buffer, device=audio_device
         )
         self.screen_capture = ScreenCapture(self.frame_buffer)
-        self.wake_detector = WakeWordDetector(self.transcript_buffer)
+        self.keyword_spotter = (
+            KeywordSpotter(self.audio_capture.ring) if WAKE_SPOTTER_ENABLED else None
+        )
+        self.wake_detector = WakeWordDetector(
+            self.transcript_buffer, spotter=self.keyword_spotter
+        )
         self.context_injector = ContextInjector(
-            self.transcript_buffer, self.frame_buffer
+            self.transcript_buffer, self.frame_buffer, context_log=self.context_log
         )
         self.audio_playback = AudioPlayback()
         self.task_executor = TaskExecutor()
+        self.task_scheduler = TaskScheduler()
 
         self._running = False
         self._in_session = False
         self._live_session = None
+        self._connect_task = None
+        # Connection opened on a wake word candidate: (session, connect task, expiry)
+        self._speculative = None
+        self._preconnect_times = deque()
 
     async def run(self):
         """Main run loop."""
@@ -52,6 +98,16 @@ class Jarvis:
             async with asyncio.TaskGroup() as tg:
                 tg.create_task(self.audio_capture.start())
                 tg.create_task(self.screen_capture.start())
+                if self.keyword_spotter:
+                    tg.create_task(self.keyword_spotter.run())
+                    if LIVE_PRECONNECT_ENABLED:
+                        tg.create_task(self._preconnect_loop())
+                if self.context_log:
+                    tg.create_task(self.context_log.run_retention())
+                if METRICS_HTTP_PORT:
+                    tg.create_task(metrics.serve(METRICS_HTTP_PORT))
+                if METRICS_JSON_PATH:
+                    tg.create_task(metrics.dump_json(METRICS_JSON_PATH, METRICS_JSON_INTERVAL_SECONDS))
                 tg.create_task(self._wake_word_loop())
         except* KeyboardInterrupt:
             log.info("Shutting down...")
@@ -60,28 +116,100 @@ class Jarvis:
                 log.error("Fatal error: %s", e, exc_info=True)
         finally:
             self._shutdown()
+            await self.task_scheduler.stop()
 
     async def _wake_word_loop(self):
-        """Poll for wake word and activate session."""
+        """Wait for the wake word and activate session."""
         while self._running:
-            if not self._in_session and self.wake_detector.check():
+            await self.wake_detector.wait_for_wake()
+            wake_time = time.monotonic()
+            if not self._in_session:
                 log.info("Wake word detected! Activating session...")
-                await self._start_session()
+                await self._start_session(wake_time)
                 flush()
-            await asyncio.sleep(0.5)
 
-    async def _start_session(self):
-        """Start a Live API session (Layer 2)."""
-        self._in_session = True
-
-        self._live_session = LiveSession(
+    def _open_session(self):
+        session = LiveSession(
             on_audio_response=self._handle_audio_response,
             on_function_call=self._handle_function_call,
+            on_interrupted=self.audio_playback.flush,
+            scheduler=self.task_scheduler,
         )
+        return session, asyncio.create_task(session.connect())
+
+    async def _preconnect_loop(self):
+        """Open a Live connection as soon as the spotter hears a wake word candidate.
+
+        The WebSocket handshake then overlaps the rest of the wake word and
+        its confirmation. Unused connections are closed after
+        LIVE_PRECONNECT_TTL_SECONDS, and at most LIVE_PRECONNECT_MAX_PER_MINUTE
+        are opened, since each holds a Live rate limiter slot and quota.
+        """
+        candidate = self.keyword_spotter.candidate
+        while self._running:
+            timeout = None
+            if self._speculative is not None:
+                timeout = max(0.0, self._speculative[2] - time.monotonic())
+            try:
+                await asyncio.wait_for(candidate.wait(), timeout)
+            except asyncio.TimeoutError:
+                await self._discard_speculative("expired")
+                continue
+            candidate.clear()
+            if self._in_session:
+                continue
+            now = time.monotonic()
+            expires = now + LIVE_PRECONNECT_TTL_SECONDS
+            if self._speculative is None:
+                while self._preconnect_times and now - self._preconnect_times[0] >= 60:
+                    self._preconnect_times.popleft()
+                if len(self._preconnect_times) >= LIVE_PRECONNECT_MAX_PER_MINUTE:
+                    log.debug("Wake word candidate ignored: %d pre-connects in the last minute",
+                              len(self._preconnect_times))
+                    continue
+                self._preconnect_times.append(now)
+                log.info("Wake word candidate heard, pre-connecting to Live API...")
+                session, task = self._open_session()
+            else:
+                session, task, _ = self._speculative
+            self._speculative = (session, task, expires)
+
+    def _take_speculative(self):
+        """Hand over the pre-opened connection, if it is still usable."""
+        speculative, self._speculative = self._speculative, None
+        if speculative is None:
+            return None
+        session, task, _ = speculative
+        if task.done() or (session.ready.is_set() and not session.is_active()):
+            return None
+        return session, task
+
+    async def _discard_speculative(self, reason):
+        speculative, self._speculative = self._speculative, None
+        if speculative is None:
+            return
+        session, task, _ = speculative
+        log.info("Closing pre-connected Live session (%s)", reason)
+        await session.close()
+        task.cancel()
+
+    async def _start_session(self, wake_time=None):
+        """Start a Live API session (Layer 2)."""
+        self._in_session = True
+        self.screen_capture.set_live(True)
+
+        opened = self._take_speculative()
+        if opened is not None:
+            log.info("Using pre-connected Live session (%s)",
+                     "ready" if opened[0].ready.is_set() else "still connecting")
+        else:
+            opened = self._open_session()
+        self._live_session, self._connect_task = opened
+        self._live_session.mark_wake(wake_time or time.monotonic())
 
         try:
             async with asyncio.TaskGroup() as tg:
-                tg.create_task(self._live_session.connect())
+                tg.create_task(self._run_connection(self._connect_task))
                 tg.create_task(self._inject_and_stream())
                 tg.create_task(self.audio_playback.start())
                 tg.create_task(self._silence_monitor())
@@ -90,49 +218,44 @@ class Jarvis:
                 log.error("Session error: %s", e, exc_info=True)
         finally:
             self._in_session = False
+            self.screen_capture.set_live(False)
             self.audio_playback.stop()
             self.wake_detector.suppress()
             log.info("Returned to passive mode")
 
+    @staticmethod
+    async def _run_connection(connect_task):
+        try:
+            await connect_task
+        except asyncio.CancelledError:
+            pass
+
     async def _inject_and_stream(self):
         """Inject context then stream live audio + screen to the session."""
-        await asyncio.sleep(0.5)
+        session = self._live_session
+        if not await session.wait_ready(LIVE_CONNECT_TIMEOUT_SECONDS):
+            log.error("Live API not ready after %ds, ending session", LIVE_CONNECT_TIMEOUT_SECONDS)
+            await session.close()
+            self._connect_task.cancel()
+            return
+        log.info("Live session ready %.0f ms after wake word",
+                 (time.monotonic() - session.wake_time) * 1000)
 
         log.info("Injecting buffered context...")
-        await self.context_injector.inject(self._live_session)
+        injected_frames = await self.context_injector.inject(self._live_session)
 
         log.info("Streaming live audio + screen to session...")
-        frame_count = 0
-        audio_sends = 0
-        last_frame_time = 0
-
-        while self._in_session and self._live_session.is_active():
-            try:
-                audio_data = self.audio_capture.get_raw_audio_for_streaming()
-                if audio_data is not None and len(audio_data) > 0:
-                    pcm_bytes = audio_data.astype("int16").tobytes()
-                    await self._live_session.send_audio(pcm_bytes)
-                    audio_sends += 1
-                    if audio_sends % 50 == 0:
-                        log.debug("Streamed %d audio chunks to Live API", audio_sends)
-
-                now = time.time()
-                if now - last_frame_time >= 1.0:
-                    latest = self.frame_buffer.get_latest()
-                    if latest:
-                        _, frame_data, _ = latest
-                        await self._live_session.send_image(frame_data)
-                        frame_count += 1
-                        last_frame_time = now
-                        if frame_count % 10 == 0:
-                            log.debug("Streamed %d screen frames to Live API", frame_count)
-
-            except Exception as e:
-                log.error("Stream error: %s", e)
-
-            await asyncio.sleep(0.1)
-
-        log.info("Streaming ended (audio_chunks=%d, frames=%d)", audio_sends, frame_count)
+        audio_reader = self.audio_capture.open_reader("live")
+        audio_event = self.audio_capture.audio_event()
+        uplink = Uplink(
+            session, audio_reader, self.frame_buffer, audio_event,
+            last_sent_frame_id=max((i for i in injected_frames if i > 0), default=None),
+        )
+        try:
+            await uplink.run()
+        finally:
+            self.audio_capture.release_audio_event(audio_event)
+            audio_reader.close()
 
     async def _handle_audio_response(self, audio_data):
         await self.audio_playback.enqueue(audio_data)
@@ -143,16 +266,53 @@ class Jarvis:
             context = args.get("context", "")
 
             if not context:
-                context = self.transcript_buffer.get_text()
+                context = await asyncio.to_thread(
+                    self._task_context, task_desc, args.get("lookback_minutes")
+                )
 
             log.info("Delegating to Gemini 3 Pro: %s", task_desc[:150])
 
-            result = await self.task_executor.execute(task_desc, context)
+            use_cache = not args.get("fresh", False)
+            if TASK_STREAMING_ENABLED:
+                return self.task_executor.execute_stream(task_desc, context, use_cache=use_cache)
+            result = await self.task_executor.execute(task_desc, context, use_cache=use_cache)
             return result
         else:
             log.warning("Unknown function call: %s", name)
             return f"Unknown function: {name}"
 
+    def _task_context(self, task_desc, lookback_minutes=None):
+        """Transcript context for a background task that came without any.
+
+        An explicit lookback gets that span of transcript verbatim; otherwise
+        the excerpts most relevant to the task, falling back to the tail of
+        the recent transcript, within TASK_CONTEXT_TOKEN_BUDGET.
+        """
+        minutes = None
+        if lookback_minutes:
+            try:
+                minutes = max(int(float(lookback_minutes)), 1)
+            except (TypeError, ValueError, OverflowError):
+                log.warning("Ignoring invalid lookback_minutes: %r", lookback_minutes)
+        if minutes:
+            # Without the context log only the in-memory buffer is there.
+            available = (TRANSCRIPT_MAX_LOOKBACK_MINUTES if self.context_log is not None
+                         else TRANSCRIPT_BUFFER_MINUTES)
+            text = self.transcript_buffer.get_recent_text(min(minutes, available) * 60)
+            if minutes > available:
+                log.warning("Task asked for %d minutes of transcript, only %d available",
+                            minutes, available)
+                text = f"[Only the last {available} minutes of transcript are available.]\n{text}"
+            return text
+
+        context = self.transcript_index.context_for(task_desc)
+        if context:
+            log.info("Task context: %d relevant transcript excerpts (%d chars)",
+                     context.count("\n") + 1, len(context))
+            return context
+        recent = self.transcript_buffer.get_recent_text(TRANSCRIPT_CONTEXT_MINUTES * 60)
+        return recent[-TASK_CONTEXT_TOKEN_BUDGET * 4:]
+
     async def _silence_monitor(self):
         await asyncio.sleep(10)
         while self._in_session and self._live_session and self._live_session.is_active():
@@ -168,7 +328,14 @@ class Jarvis:
         self._in_session = False
         self.audio_capture.stop()
         self.screen_capture.stop()
+        if self.keyword_spotter:
+            self.keyword_spotter.stop()
+        if self._speculative is not None:
+            self._speculative[1].cancel()
+            self._speculative = None
         self.audio_playback.stop()
+        if self.context_log:
+            self.context_log.close()
         flush()
         log.info("Goodbye!")
 
@@ -1,4 +1,15 @@
+from math import gcd
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Zero crossings of the windowed-sinc prototype on each side of its centre,
+# counted at the lower of the two rates. More means a sharper cutoff.
+_RESAMPLE_ZERO_CROSSINGS = 16
+_RESAMPLE_KAISER_BETA = 8.0
+# Cutoff as a fraction of the lower Nyquist frequency, leaving room for the
+# transition band so that little aliases back below it.
+_RESAMPLE_ROLLOFF = 0.9
 
 
 def pcm_to_numpy(pcm_data, sample_rate=16000, dtype=np.int16):
@@ -11,26 +22,144 @@ def numpy_to_pcm(audio_array):
     return audio_array.astype(np.int16).tobytes()
 
 
+def to_int16(audio, out=None):
+    """Round and clip float samples (int16 scale) to int16."""
+    audio = np.rint(audio)
+    np.clip(audio, -32768, 32767, out=audio)
+    if out is None:
+        return audio.astype(np.int16)
+    out[:] = audio
+    return out
+
+
+class StreamResampler:
+    """Stateful polyphase resampler for a stream of chunks.
+
+    The rate ratio is reduced to up/down integers and a Kaiser-windowed
+    sinc low-pass is split into `up` phases, so each output sample costs
+    one short dot product and nothing is computed at the upsampled rate.
+    The last few input samples and the output phase carry over between
+    `process` calls, so a stream cut into chunks of any size resamples to
+    exactly what the whole signal would. Output lags input by `delay`
+    output samples (half the filter).
+    """
+
+    def __init__(self, orig_rate, target_rate, zero_crossings=_RESAMPLE_ZERO_CROSSINGS):
+        g = gcd(int(orig_rate), int(target_rate))
+        self.orig_rate = orig_rate
+        self.target_rate = target_rate
+        self.up = int(target_rate) // g
+        self.down = int(orig_rate) // g
+
+        # Prototype filter at the upsampled rate, cut off below the lower Nyquist.
+        taps = 2 * zero_crossings * max(self.up, self.down) // self.up + 1
+        n = taps * self.up
+        cutoff = _RESAMPLE_ROLLOFF * 0.5 / max(self.up, self.down)
+        # Centre the filter on an output sample so the delay is a whole
+        # number of output samples and can be trimmed exactly.
+        center = max(1, round((n - 1) / 2 / self.down)) * self.down
+        t = np.arange(n) - center
+        half = max(center, n - 1 - center)
+        window = np.i0(_RESAMPLE_KAISER_BETA * np.sqrt(np.clip(1 - (t / half) ** 2, 0, None)))
+        h = 2 * cutoff * np.sinc(2 * cutoff * t) * window
+        h *= self.up / h.sum()
+        # phases[p] holds taps p, p+up, p+2up, ... reversed to line up with
+        # an input window read oldest-first.
+        self._phases = np.ascontiguousarray(h.reshape(taps, self.up).T[:, ::-1], dtype=np.float32)
+        self._taps = taps
+        self.delay = center // self.down
+        self.reset()
+
+    def reset(self):
+        """Forget the stream so far, e.g. after a flush or a gap."""
+        self._history = np.zeros(self._taps - 1, dtype=np.float32)
+        # Next output's position on the upsampled grid, relative to history[0].
+        self._position = (self._taps - 1) * self.up
+
+    def output_length(self, n):
+        """Samples the next `process` call will return for `n` input samples."""
+        total = len(self._history) + n
+        last = total * self.up - 1
+        if last < self._position:
+            return 0
+        return (last - self._position) // self.down + 1
+
+    def process(self, chunk):
+        """Resample one chunk; return float32 samples at the target rate."""
+        if self.up == self.down:
+            return np.asarray(chunk, dtype=np.float32)
+        x = np.concatenate((self._history, np.asarray(chunk, dtype=np.float32)))
+        count = self.output_length(len(chunk))
+        out = np.empty(count, dtype=np.float32)
+        if count:
+            positions = self._position + np.arange(count) * self.down
+            starts = positions // self.up - (self._taps - 1)
+            windows = sliding_window_view(x, self._taps)
+            if self.up == 1:
+                out[:] = windows[starts] @ self._phases[0]
+            else:
+                phases = positions % self.up
+                # The phase pattern repeats every `up` outputs: one matmul per phase.
+                for first in range(min(self.up, count)):
+                    p = phases[first]
+                    out[first::self.up] = windows[starts[first::self.up]] @ self._phases[p]
+            self._position += count * self.down
+
+        keep = self._taps - 1
+        consumed = len(x) - keep
+        self._history = x[consumed:].copy()
+        self._position -= consumed * self.up
+        return out
+
+
 def resample(audio_array, orig_rate, target_rate):
-    """Simple resampling using linear interpolation."""
+    """Resample a whole signal (anti-aliased, same dtype and duration)."""
     if orig_rate == target_rate:
         return audio_array
-    duration = len(audio_array) / orig_rate
-    target_len = int(duration * target_rate)
-    indices = np.linspace(0, len(audio_array) - 1, target_len)
-    return np.interp(indices, np.arange(len(audio_array)), audio_array).astype(
-        audio_array.dtype
-    )
+    resampler = StreamResampler(orig_rate, target_rate)
+    target_len = int(len(audio_array) * target_rate / orig_rate)
+    pad = np.zeros(int(np.ceil(resampler.delay * orig_rate / target_rate)) + 1, dtype=np.float32)
+    out = np.concatenate((resampler.process(audio_array), resampler.process(pad)))
+    out = out[resampler.delay:resampler.delay + target_len]
+    if np.issubdtype(audio_array.dtype, np.integer):
+        return to_int16(out).astype(audio_array.dtype)
+    return out.astype(audio_array.dtype)
+
+
+def rms(audio):
+    """Root mean square of a block, computed in float32."""
+    if len(audio) == 0:
+        return 0.0
+    audio = np.asarray(audio, dtype=np.float32)
+    return float(np.sqrt(np.dot(audio, audio) / len(audio)))
+
+
+def peak(audio):
+    """Largest absolute sample value of a block."""
+    if len(audio) == 0:
+        return 0.0
+    return max(float(audio.max()), -float(audio.min()))
+
+
+def level_dbfs(audio, full_scale=32768.0):
+    """(rms, peak) of a block in dB relative to full scale (-inf for silence)."""
+    with np.errstate(divide="ignore"):
+        return (
+            float(20 * np.log10(rms(audio) / full_scale)),
+            float(20 * np.log10(peak(audio) / full_scale)),
+        )
+
 
+def normalize_audio(audio_array, target_db=-20, out=None):
+    """Normalize int16 audio to target dB level.
 
-def normalize_audio(audio_array, target_db=-20):
-    """Normalize audio to target dB level."""
+    Pass `out=audio_array` to scale in place instead of allocating.
+    """
     if len(audio_array) == 0:
         return audio_array
-    audio_float = audio_array.astype(np.float64)
-    rms = np.sqrt(np.mean(audio_float**2))
-    if rms == 0:
+    level = rms(audio_array)
+    if level == 0:
         return audio_array
-    target_rms = 10 ** (target_db / 20) * 32768
-    gain = target_rms / rms
-    return (audio_float * gain).clip(-32768, 32767).astype(np.int16)
+    gain = np.float32(10 ** (target_db / 20) * 32768 / level)
+    scaled = np.multiply(audio_array, gain, dtype=np.float32)
+    return to_int16(scaled, out=out)
@@ -1,53 +1,405 @@
+import asyncio
+import io
+import logging
 import time
 import threading
+from bisect import bisect_left
 from collections import deque
 
+log = logging.getLogger("jarvis.buffer")
+
 
 class TranscriptBuffer:
-    """Rolling buffer for transcript text with time-based windowing."""
+    """Rolling buffer for transcript text with time-based windowing.
+
+    Entries live in parallel arrays (timestamps, texts, character offsets)
+    next to one incrementally grown joined string, so a `[t0, t1)` window is
+    two bisects and a single slice no matter how long the buffer is. Expired
+    entries are skipped by advancing a head index and compacted away in bulk.
+
+    Every entry gets a sequence number. Async consumers can wait for entries
+    newer than the last sequence number they saw instead of polling and
+    rescanning the whole window.
+
+    With a `ContextLog` attached every entry is also written to disk, and
+    `get_range` reaches back into the log for anything older than memory.
+    An attached `TranscriptIndex` is updated with every entry as it arrives.
+    """
 
-    def __init__(self, max_minutes=5):
-        self._entries = deque()
+    _SEPARATOR = " "
+
+    def __init__(self, max_minutes=5, context_log=None, index=None):
         self._max_seconds = max_minutes * 60
+        self._context_log = context_log
+        self.index = index
         self._lock = threading.Lock()
+        self._seq = 0
+        self._loop = None
+        self._cond = None
+        self._notify_tasks = set()
+        self._reset(first_seq=1)
+
+    def _reset(self, first_seq):
+        self._times = []
+        self._texts = []
+        self._offsets = []  # start of each entry in the joined text, from _char_base
+        self._joined = ""
+        self._char_base = 0
+        self._head = 0  # first live (untrimmed) index
+        self._seq_base = first_seq  # sequence number of index 0
 
-    def add(self, text):
+    def add(self, text, timestamp=None):
         with self._lock:
-            self._entries.append((time.time(), text))
+            ts = time.time() if timestamp is None else timestamp
+            if self._times and ts < self._times[-1]:
+                ts = self._times[-1]  # keep the index sorted if the clock steps back
+            self._seq += 1
+            # Append through a sole local reference so CPython can grow the
+            # string in place instead of copying the whole window per entry.
+            joined, self._joined = self._joined, None
+            if self._head < len(self._texts):
+                joined += self._SEPARATOR
+            self._offsets.append(self._char_base + len(joined))
+            joined += text
+            self._joined = joined
+            self._times.append(ts)
+            self._texts.append(text)
+            seq = self._seq
             self._trim()
+        if self.index is not None:
+            self.index.add(seq, ts, text)
+        if self._context_log is not None:
+            try:
+                self._context_log.append_transcript(ts, text)
+            except Exception as e:
+                log.error("Context log write failed: %s", e)
+        self._notify()
 
     def _trim(self):
         cutoff = time.time() - self._max_seconds
-        while self._entries and self._entries[0][0] < cutoff:
-            self._entries.popleft()
+        head = bisect_left(self._times, cutoff, self._head)
+        if head == self._head:
+            return
+        self._head = head
+        if head == len(self._texts):
+            self._reset(first_seq=self._seq + 1)
+        elif head > len(self._texts) // 2:
+            self._compact()
+
+    def _compact(self):
+        """Drop the trimmed prefix; amortised O(1) per entry."""
+        head = self._head
+        new_base = self._offsets[head]
+        self._joined = self._joined[new_base - self._char_base:]
+        self._char_base = new_base
+        del self._times[:head]
+        del self._texts[:head]
+        del self._offsets[:head]
+        self._seq_base += head
+        self._head = 0
+
+    def _slice(self, start, stop):
+        """Joined text of entries [start, stop) (list indices)."""
+        if start >= stop:
+            return ""
+        begin = self._offsets[start] - self._char_base
+        end = self._offsets[stop - 1] - self._char_base + len(self._texts[stop - 1])
+        return self._joined[begin:end]
+
+    def _index(self, t):
+        return bisect_left(self._times, t, self._head)
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def __len__(self):
+        with self._lock:
+            return len(self._texts) - self._head
 
     def get_text(self):
         with self._lock:
             self._trim()
-            return " ".join(text for _, text in self._entries)
+            return self._slice(self._head, len(self._texts))
 
     def get_recent_text(self, seconds=10):
+        return self.get_range(time.time() - seconds)
+
+    def get_range(self, t0, t1=None):
+        """Text of the entries timestamped in [t0, t1); open-ended if t1 is None."""
         with self._lock:
-            cutoff = time.time() - seconds
-            return " ".join(
-                text for ts, text in self._entries if ts >= cutoff
-            )
+            stop = len(self._texts) if t1 is None else self._index(t1)
+            text = self._slice(self._index(t0), stop)
+            oldest = self._oldest()
+        older = self._SEPARATOR.join(t for _, t in self._read_log(t0, t1, oldest))
+        return self._SEPARATOR.join(part for part in (older, text) if part)
+
+    def get_segments(self, t0, t1=None):
+        """Return [(timestamp, text)] for entries in [t0, t1), including any from the context log."""
+        with self._lock:
+            stop = len(self._texts) if t1 is None else self._index(t1)
+            start = self._index(t0)
+            recent = list(zip(self._times[start:stop], self._texts[start:stop]))
+            oldest = self._oldest()
+        return self._read_log(t0, t1, oldest) + recent
+
+    def _oldest(self):
+        return self._times[self._head] if self._head < len(self._times) else None
+
+    def _read_log(self, t0, t1, oldest):
+        """Entries in [t0, t1) older than `oldest`, the first one still in memory."""
+        if self._context_log is None:
+            return []
+        if oldest is not None:
+            if t0 >= oldest:
+                return []
+            t1 = oldest if t1 is None else min(t1, oldest)
+        return self._context_log.read_transcript(t0, t1)
+
+    def get_entries_range(self, t0, t1=None):
+        """Return [(seq, timestamp, text)] for entries timestamped in [t0, t1)."""
+        with self._lock:
+            stop = len(self._texts) if t1 is None else self._index(t1)
+            return self._entries(self._index(t0), stop)
+
+    def get_entries_since(self, seq):
+        """Return [(seq, timestamp, text)] for entries newer than `seq`."""
+        with self._lock:
+            if seq >= self._seq:
+                return []
+            start = max(self._head, seq + 1 - self._seq_base)
+            return self._entries(start, len(self._texts))
+
+    def _entries(self, start, stop):
+        base = self._seq_base
+        times, texts = self._times, self._texts
+        return [(base + i, times[i], texts[i]) for i in range(start, stop)]
+
+    async def wait_for_entries(self, after_seq, timeout=None):
+        """Wait until entries newer than `after_seq` exist and return them.
+
+        Returns an empty list if `timeout` seconds pass first.
+        """
+        cond = self._condition()
+        try:
+            async with cond:
+                await asyncio.wait_for(
+                    cond.wait_for(lambda: self._seq > after_seq), timeout
+                )
+        except asyncio.TimeoutError:
+            return []
+        return self.get_entries_since(after_seq)
+
+    def _condition(self):
+        if self._cond is None:
+            self._loop = asyncio.get_running_loop()
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _notify(self):
+        """Wake async waiters; safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            task = loop.create_task(self._notify_waiters())
+            self._notify_tasks.add(task)
+            task.add_done_callback(self._notify_tasks.discard)
+        else:
+            asyncio.run_coroutine_threadsafe(self._notify_waiters(), loop)
+
+    async def _notify_waiters(self):
+        async with self._cond:
+            self._cond.notify_all()
 
     def clear(self):
         with self._lock:
-            self._entries.clear()
+            self._reset(first_seq=self._seq + 1)
+        if self.index is not None:
+            self.index.clear()
+
+
+# Encoded variants cached per frame before the oldest is evicted.
+_MAX_FRAME_VARIANTS = 4
+
+
+class ScreenFrame:
+    """One stored screen capture.
+
+    `data` is the low-res full-screen thumbnail. `crop` optionally holds a
+    native-resolution JPEG of the area that changed (or around the cursor),
+    with `crop_box` its (left, top, right, bottom) in screen pixels.
+
+    Frames either hold finished JPEG bytes, or (in a byte-budgeted buffer) a
+    high-quality source JPEG plus an `encode(image, max_width, quality, crop)`
+    function. Source-backed frames decode and re-encode on demand through
+    `jpeg()` and cache each (part, max_width, quality) variant; `on_grow` is
+    called whenever the cache grows, so the owning buffer can re-check its
+    budget.
+    """
+
+    def __init__(self, frame_id, timestamp, data=None, mime_type="image/jpeg",
+                 crop=None, crop_box=None, source=None, crop_source=None,
+                 encode=None, thumbnail_width=None, on_grow=None):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.mime_type = mime_type
+        self.crop_box = crop_box
+        self._data = data
+        self._crop = crop
+        self._source = source
+        self._crop_source = crop_source
+        self._encode = encode
+        self._thumbnail_width = thumbnail_width
+        self._on_grow = on_grow
+        self._variants = {}
+        self._preview = None
+        self._lock = threading.Lock()
+
+    @property
+    def has_crop(self):
+        return self._crop is not None or self._crop_source is not None
+
+    @property
+    def data(self):
+        return self.jpeg()
+
+    @property
+    def crop(self):
+        return self.jpeg(crop=True) if self.has_crop else None
+
+    def jpeg(self, max_width=None, quality=None, crop=False):
+        """Encoded bytes for the thumbnail (or crop) at the requested size and quality.
+
+        `max_width=None` means the default: the configured thumbnail width
+        for the full frame and native resolution for the crop. Frames stored
+        as finished bytes ignore size and quality.
+        """
+        source = self._crop_source if crop else self._source
+        if source is None:
+            return self._crop if crop else self._data
+        if max_width is None and not crop:
+            max_width = self._thumbnail_width
+
+        key = (crop, max_width, quality)
+        with self._lock:
+            cached = self._variants.pop(key, None)
+            grew = cached is None
+            if grew:
+                cached = self._encode(_decode_jpeg(source, max_width), max_width, quality, crop)
+            self._variants[key] = cached
+            while len(self._variants) > _MAX_FRAME_VARIANTS:
+                self._variants.pop(next(iter(self._variants)))
+        if grew and self._on_grow is not None:
+            self._on_grow()
+        return cached
+
+    @property
+    def stored(self):
+        """(thumbnail, crop) bytes as stored: the source JPEGs, or the finished ones."""
+        if self._source is not None:
+            return self._source, self._crop_source
+        return self._data, self._crop
+
+    def preview(self, size=(32, 18)):
+        """Tiny greyscale copy of the frame for cheap visual comparisons (cached)."""
+        if self._preview is None or self._preview.size != size:
+            from PIL import Image
+
+            img = Image.open(io.BytesIO(self.stored[0]))
+            img.draft("L", (size[0] * 8, size[1] * 8))  # JPEG DCT-domain downscale
+            self._preview = img.convert("L").resize(size, Image.Resampling.BILINEAR)
+        return self._preview
+
+    @property
+    def size_bytes(self):
+        with self._lock:
+            cached = sum(len(v) for v in self._variants.values())
+        data, crop = self.stored
+        return len(data or b"") + len(crop or b"") + cached
+
+
+def _decode_jpeg(data, max_width=None):
+    """Open JPEG bytes, letting libjpeg downscale while decoding when much wider than needed."""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    if max_width and img.width >= 2 * max_width:
+        img.draft("RGB", (max_width, img.height * max_width // img.width))
+    return img
 
 
 class FrameBuffer:
-    """Rolling buffer for screen capture frames."""
+    """Rolling buffer for screen capture frames.
 
-    def __init__(self, max_frames=10):
-        self._frames = deque(maxlen=max_frames)
+    Bounded by frame count by default. With `max_bytes` set it is bounded by
+    the total size of the frames instead (source JPEGs plus cached
+    encodes, re-checked whenever a frame caches a new variant), and
+    producers should store high-quality sources via `add_source` so
+    consumers can ask for the size and quality they need.
+
+    With a `ContextLog` attached every frame is also written to disk as
+    stored (source JPEGs in byte mode), without encoding anything extra.
+    """
+
+    def __init__(self, max_frames=10, max_bytes=None, context_log=None):
+        self.max_bytes = max_bytes
+        self._context_log = context_log
+        self._frames = deque(maxlen=None if max_bytes else max_frames)
         self._lock = threading.Lock()
+        self._next_id = 1
+
+    def add(self, frame_bytes, mime_type="image/jpeg", crop=None, crop_box=None):
+        return self._append(
+            lambda frame_id: ScreenFrame(
+                frame_id, time.time(), frame_bytes, mime_type, crop, crop_box
+            )
+        )
+
+    def add_source(self, source, encode, crop_source=None, crop_box=None,
+                   thumbnail_width=None, mime_type="image/jpeg"):
+        """Store a source JPEG; variants are encoded when a consumer asks for them."""
+        return self._append(
+            lambda frame_id: ScreenFrame(
+                frame_id, time.time(), mime_type=mime_type, crop_box=crop_box,
+                source=source, crop_source=crop_source, encode=encode,
+                thumbnail_width=thumbnail_width, on_grow=self._frame_grew,
+            )
+        )
+
+    def _append(self, make_frame):
+        with self._lock:
+            frame = make_frame(self._next_id)
+            self._next_id += 1
+            self._frames.append(frame)
+            self._enforce_budget()
+        if self._context_log is not None:
+            data, crop = frame.stored
+            try:
+                self._context_log.append_frame(frame.timestamp, data, crop, frame.crop_box)
+            except Exception as e:
+                log.error("Context log write failed: %s", e)
+        return frame
+
+    def _frame_grew(self):
+        with self._lock:
+            self._enforce_budget()
+
+    def _enforce_budget(self):
+        if not self.max_bytes:
+            return
+        total = sum(f.size_bytes for f in self._frames)
+        while len(self._frames) > 1 and total > self.max_bytes:
+            total -= self._frames.popleft().size_bytes
 
-    def add(self, frame_bytes, mime_type="image/jpeg"):
+    @property
+    def total_bytes(self):
         with self._lock:
-            self._frames.append((time.time(), frame_bytes, mime_type))
+            return sum(f.size_bytes for f in self._frames)
 
     def get_frames(self):
         with self._lock:
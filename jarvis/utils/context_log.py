@@ -0,0 +1,340 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from jarvis.config import (
+    CONTEXT_LOG_DIR,
+    CONTEXT_LOG_SEGMENT_BYTES,
+    CONTEXT_LOG_TRANSCRIPT_MAX_BYTES,
+    CONTEXT_LOG_FRAME_MAX_BYTES,
+    CONTEXT_LOG_RETENTION_INTERVAL_SECONDS,
+    SCREEN_MAX_WIDTH,
+)
+from jarvis.utils.buffer import ScreenFrame
+
+log = logging.getLogger("jarvis.contextlog")
+
+# Index record: timestamp, offset into the data file, payload length, kind.
+_INDEX = struct.Struct("<dQII")
+_CROP_BOX = struct.Struct("<4I")
+
+KIND_TEXT = 0
+KIND_FRAME = 1
+KIND_CROP = 2
+
+
+class _Segment:
+    """One data file plus its fixed-width timestamp index."""
+
+    def __init__(self, directory, number):
+        self.number = number
+        base = os.path.join(directory, f"{number:010d}")
+        self.data_path = base + ".log"
+        self.index_path = base + ".idx"
+        self._map = None
+        self._mapped_count = 0
+
+    @property
+    def count(self):
+        try:
+            return os.path.getsize(self.index_path) // _INDEX.size
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def size_bytes(self):
+        total = 0
+        for path in (self.data_path, self.index_path):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    def index(self):
+        """Memory-mapped view of the index and its record count, remapped as it grows."""
+        count = self.count
+        if count != self._mapped_count or self._map is None:
+            self.close()
+            if count == 0:
+                return None, 0
+            with open(self.index_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), count * _INDEX.size, access=mmap.ACCESS_READ)
+            self._mapped_count = count
+        return self._map, self._mapped_count
+
+    def record(self, mapped, i):
+        return _INDEX.unpack_from(mapped, i * _INDEX.size)
+
+    def bisect(self, mapped, count, t):
+        """First record index whose timestamp is >= t."""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _INDEX.unpack_from(mapped, mid * _INDEX.size)[0] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def time_span(self):
+        mapped, count = self.index()
+        if not count:
+            return None
+        return self.record(mapped, 0)[0], self.record(mapped, count - 1)[0]
+
+    def read(self, t0, t1, last=None):
+        """Return [(timestamp, kind, payload)] for records in [t0, t1), at most the `last` ones."""
+        mapped, count = self.index()
+        if not count:
+            return []
+        start = self.bisect(mapped, count, t0)
+        stop = count if t1 is None else self.bisect(mapped, count, t1)
+        if last is not None:
+            start = max(start, stop - last)
+        if start >= stop:
+            return []
+        records = [self.record(mapped, i) for i in range(start, stop)]
+        first_offset = records[0][1]
+        last = records[-1]
+        # Records in a time range are contiguous on disk: one read covers them.
+        with open(self.data_path, "rb") as f:
+            f.seek(first_offset)
+            blob = f.read(last[1] + last[2] - first_offset)
+        return [
+            (ts, kind, blob[offset - first_offset:offset - first_offset + length])
+            for ts, offset, length, kind in records
+        ]
+
+    def recover(self):
+        """Drop a torn tail left by a crash mid-append."""
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        count = self.count
+        with open(self.index_path, "rb") as f:
+            raw = f.read(count * _INDEX.size)
+        valid = count
+        while valid:
+            _, offset, length, _ = _INDEX.unpack_from(raw, (valid - 1) * _INDEX.size)
+            if offset + length <= data_size:
+                break
+            valid -= 1
+        if valid * _INDEX.size != os.path.getsize(self.index_path):
+            with open(self.index_path, "r+b") as f:
+                f.truncate(valid * _INDEX.size)
+        if valid < count:
+            log.warning("Context log segment %d: dropped %d torn records",
+                        self.number, count - valid)
+        return valid
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._mapped_count = 0
+
+    def delete(self):
+        self.close()
+        for path in (self.data_path, self.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class SegmentedLog:
+    """Append-only record log split into size-capped segments.
+
+    Each segment is a data file of raw payloads and an index file of
+    fixed-width (timestamp, offset, length, kind) records. Readers
+    memory-map the index and bisect it, so a time-range read touches only
+    the index pages it needs and one contiguous span of the data file.
+    Timestamps must be non-decreasing; earlier ones are clamped.
+    """
+
+    def __init__(self, directory, segment_bytes=CONTEXT_LOG_SEGMENT_BYTES):
+        self.directory = directory
+        self._segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._segments = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".idx"):
+                segment = _Segment(directory, int(name[:-4]))
+                if segment.recover():
+                    self._segments.append(segment)
+                else:
+                    segment.delete()
+
+        self._last_ts = 0.0
+        if self._segments:
+            self._last_ts = self._segments[-1].time_span()[1]
+        # Never append to a segment a previous run may have left half-written.
+        next_number = self._segments[-1].number + 1 if self._segments else 0
+        self._open_segment(next_number)
+
+    def _open_segment(self, number):
+        segment = _Segment(self.directory, number)
+        self._data = open(segment.data_path, "ab")
+        self._index = open(segment.index_path, "ab")
+        self._offset = self._data.tell()
+        self._segments.append(segment)
+
+    def _roll(self):
+        self._data.close()
+        self._index.close()
+        self._open_segment(self._segments[-1].number + 1)
+
+    def append(self, timestamp, payload, kind=KIND_TEXT):
+        with self._lock:
+            timestamp = max(timestamp, self._last_ts)
+            if self._offset and self._offset + len(payload) > self._segment_bytes:
+                self._roll()
+            self._data.write(payload)
+            self._data.flush()
+            self._index.write(_INDEX.pack(timestamp, self._offset, len(payload), kind))
+            self._index.flush()
+            self._offset += len(payload)
+            self._last_ts = timestamp
+
+    def read(self, t0, t1=None, last=None):
+        """Return [(timestamp, kind, payload)] for records in [t0, t1).
+
+        With `last` set only the newest `last` records of the range are read.
+        """
+        with self._lock:
+            chunks = []
+            wanted = last
+            for segment in reversed(self._segments):
+                span = segment.time_span()
+                if span is None:
+                    continue
+                if span[1] < t0:
+                    break
+                if t1 is not None and span[0] >= t1:
+                    continue
+                chunk = segment.read(t0, t1, wanted)
+                chunks.append(chunk)
+                if wanted is not None:
+                    wanted -= len(chunk)
+                    if wanted <= 0:
+                        break
+            return [record for chunk in reversed(chunks) for record in chunk]
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(s.size_bytes for s in self._segments)
+
+    def enforce_retention(self, max_bytes):
+        """Delete the oldest sealed segments until the log fits in `max_bytes`."""
+        with self._lock:
+            sizes = [s.size_bytes for s in self._segments]
+            total = sum(sizes)
+            removed = 0
+            while len(self._segments) > 1 and total > max_bytes:
+                total -= sizes.pop(0)
+                self._segments.pop(0).delete()
+                removed += 1
+            return removed
+
+    def close(self):
+        with self._lock:
+            self._data.close()
+            self._index.close()
+            for segment in self._segments:
+                segment.close()
+
+
+class ContextLog:
+    """On-disk history of transcript segments and screen frames.
+
+    TranscriptBuffer and FrameBuffer write through to it, so history
+    survives restarts and reaches far beyond what the in-memory buffers
+    hold. Size-based retention runs from `run_retention`.
+    """
+
+    def __init__(self, directory=CONTEXT_LOG_DIR, segment_bytes=CONTEXT_LOG_SEGMENT_BYTES,
+                 transcript_max_bytes=CONTEXT_LOG_TRANSCRIPT_MAX_BYTES,
+                 frame_max_bytes=CONTEXT_LOG_FRAME_MAX_BYTES):
+        directory = os.path.expanduser(directory)
+        self.transcripts = SegmentedLog(os.path.join(directory, "transcript"), segment_bytes)
+        self.frames = SegmentedLog(os.path.join(directory, "frames"), segment_bytes)
+        self._transcript_max_bytes = transcript_max_bytes
+        self._frame_max_bytes = frame_max_bytes
+        self._running = False
+        log.info("Context log at %s (%.1f MB stored)", directory, self.total_bytes / 1e6)
+
+    def append_transcript(self, timestamp, text):
+        self.transcripts.append(timestamp, text.encode("utf-8"))
+
+    def read_transcript(self, t0, t1=None):
+        """Return [(timestamp, text)] for transcript segments in [t0, t1)."""
+        return [
+            (ts, payload.decode("utf-8", "replace"))
+            for ts, _, payload in self.transcripts.read(t0, t1)
+        ]
+
+    def append_frame(self, timestamp, data, crop=None, crop_box=None):
+        self.frames.append(timestamp, data, KIND_FRAME)
+        if crop is not None:
+            self.frames.append(timestamp, _CROP_BOX.pack(*crop_box) + crop, KIND_CROP)
+
+    def read_frames(self, t0, t1=None, last=None, encode=None):
+        """Return ScreenFrames for frames captured in [t0, t1), at most the `last` ones.
+
+        Frames read back from disk get negative ids so they never collide
+        with the live buffer's. With an `encode` function (see ScreenFrame)
+        they are source-backed, so consumers can ask for a smaller variant
+        than the high-quality source that was logged.
+        """
+        parts = []
+        # Each frame is up to two records (thumbnail, crop).
+        records = self.frames.read(t0, t1, None if last is None else last * 2)
+        for ts, kind, payload in records:
+            if kind == KIND_FRAME:
+                parts.append([ts, payload, None, None])
+            elif kind == KIND_CROP and parts and parts[-1][0] == ts:
+                parts[-1][2] = payload[_CROP_BOX.size:]
+                parts[-1][3] = _CROP_BOX.unpack_from(payload)
+        if last is not None:
+            parts = parts[-last:]
+        if encode is not None:
+            return [
+                ScreenFrame(-(i + 1), ts, source=data, crop_source=crop, crop_box=crop_box,
+                            encode=encode, thumbnail_width=SCREEN_MAX_WIDTH)
+                for i, (ts, data, crop, crop_box) in enumerate(parts)
+            ]
+        return [
+            ScreenFrame(-(i + 1), ts, data, crop=crop, crop_box=crop_box)
+            for i, (ts, data, crop, crop_box) in enumerate(parts)
+        ]
+
+    @property
+    def total_bytes(self):
+        return self.transcripts.total_bytes + self.frames.total_bytes
+
+    def enforce_retention(self):
+        removed = self.transcripts.enforce_retention(self._transcript_max_bytes)
+        removed += self.frames.enforce_retention(self._frame_max_bytes)
+        if removed:
+            log.info("Context log retention removed %d segments (%.1f MB stored)",
+                     removed, self.total_bytes / 1e6)
+        return removed
+
+    async def run_retention(self, interval=CONTEXT_LOG_RETENTION_INTERVAL_SECONDS):
+        self._running = True
+        while self._running:
+            try:
+                await asyncio.to_thread(self.enforce_retention)
+            except Exception as e:
+                log.error("Context log retention error: %s", e)
+            await asyncio.sleep(interval)
+
+    def close(self):
+        self._running = False
+        self.transcripts.close()
+        self.frames.close()
@@ -0,0 +1,18 @@
+import logging
+
+from google import genai
+
+from jarvis.config import GEMINI_API_KEY
+
+log = logging.getLogger("jarvis.client")
+
+_client = None
+
+
+def get_client():
+    """Process-wide Gemini client shared by Live sessions and background tasks."""
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=GEMINI_API_KEY)
+        log.debug("Gemini client created")
+    return _client
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from jarvis.config import METRICS_HISTOGRAM_SUB_BUCKETS, METRICS_HTTP_HOST
+
+log = logging.getLogger("jarvis.metrics")
+
+_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """Log-linear histogram in the style of HdrHistogram.
+
+    Each power of two is split into `sub_buckets` equal-width buckets, so
+    every recorded value is kept to within 1/sub_buckets relative error
+    whatever its magnitude, in a handful of sparse counters. Quantiles are
+    read off the bucket counts.
+    """
+
+    kind = "summary"
+
+    def __init__(self, name, help="", sub_buckets=METRICS_HISTOGRAM_SUB_BUCKETS):
+        self.name = name
+        self.help = help
+        self._sub = sub_buckets
+        self._counts = {}  # bucket index -> count; None holds zeros and negatives
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def _index(self, value):
+        if value <= 0:
+            return None
+        mantissa, exponent = math.frexp(value)  # value = mantissa * 2**exponent, 0.5 <= m < 1
+        return exponent * self._sub + int((mantissa - 0.5) * 2 * self._sub)
+
+    def _upper(self, index):
+        if index is None:
+            return 0.0
+        exponent, sub = divmod(index, self._sub)
+        return math.ldexp(0.5 + (sub + 1) / (2 * self._sub), exponent)
+
+    def record(self, value):
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.sum += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None if empty)."""
+        with self._lock:
+            if not self.count:
+                return None
+            target = q * self.count
+            seen = 0
+            for index in sorted(self._counts, key=lambda i: -math.inf if i is None else i):
+                seen += self._counts[index]
+                if seen >= target:
+                    return min(self._upper(index), self.max)
+            return self.max
+
+    def snapshot(self):
+        snap = {"count": self.count, "sum": self.sum, "min": self.min, "max": self.max}
+        for q in _QUANTILES:
+            snap[f"p{q * 100:g}"] = self.quantile(q)
+        return snap
+
+
+class MetricsRegistry:
+    """Named counters, gauges and histograms, exportable as Prometheus text or JSON."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help=""):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help=""):
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name, help=""):
+        return self._get(Histogram, name, help)
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: m.snapshot() for m in metrics}
+
+    def render_prometheus(self):
+        """Prometheus text exposition format; histograms are reported as summaries."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                for q in _QUANTILES:
+                    value = metric.quantile(q)
+                    lines.append(f'{metric.name}{{quantile="{q}"}} {_number(value)}')
+                lines.append(f"{metric.name}_sum {_number(metric.sum)}")
+                lines.append(f"{metric.name}_count {metric.count}")
+            else:
+                lines.append(f"{metric.name} {_number(metric.value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value):
+    if value is None:
+        return "NaN"
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+
+def counter(name, help=""):
+    return registry.counter(name, help)
+
+
+def gauge(name, help=""):
+    return registry.gauge(name, help)
+
+
+def histogram(name, help=""):
+    return registry.histogram(name, help)
+
+
+async def serve(port, host=METRICS_HTTP_HOST):
+    """Serve GET /metrics (Prometheus text) and /metrics.json until cancelled."""
+
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass  # skip headers
+            parts = request.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+            if path.startswith("/metrics.json"):
+                status, ctype = "200 OK", "application/json"
+                body = json.dumps(registry.snapshot())
+            elif path.startswith("/metrics"):
+                status, ctype = "200 OK", "text/plain; version=0.0.4"
+                body = registry.render_prometheus()
+            else:
+                status, ctype, body = "404 Not Found", "text/plain", "not found\n"
+            data = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + data
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            log.debug("Metrics request error: %s", e)
+        finally:
+            writer.close()
+
+    try:
+        server = await asyncio.start_server(handle, host, port)
+    except OSError as e:
+        log.error("Metrics endpoint unavailable on %s:%d: %s", host, port, e)
+        return
+    log.info("Metrics at http://%s:%d/metrics", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+async def dump_json(path, interval):
+    """Write a JSON snapshot of every metric to `path` every `interval` seconds."""
+    path = os.path.expanduser(path)
+    while True:
+        await asyncio.sleep(interval)
+        snapshot = {"timestamp": time.time(), "metrics": registry.snapshot()}
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=1)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.error("Metrics dump to %s failed: %s", path, e)
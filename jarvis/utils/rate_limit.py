@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+
+from jarvis.config import (
+    RATE_LIMITS,
+    RATE_LIMIT_DEFAULT,
+    RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_BACKOFF_BASE_SECONDS,
+    RATE_LIMIT_BACKOFF_MAX_SECONDS,
+)
+from jarvis.utils.metrics import counter, histogram
+
+log = logging.getLogger("jarvis.ratelimit")
+
+_RETRY_DELAY_RE = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?([\d.]+)s")
+_RETRY_IN_RE = re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE)
+
+# After a 429 the request rate is cut by this factor, then grows back by
+# a fraction of the configured rate per successful call.
+_THROTTLE_FACTOR = 0.5
+_RECOVERY_STEP = 0.1
+_MIN_RATE_FRACTION = 0.1
+
+_limiters = {}
+
+_wait_metric = histogram("jarvis_rate_limit_wait_seconds", "Time calls waited for the rate limiter")
+_throttle_metric = counter("jarvis_rate_limit_throttles_total", "Rate-limit (429/503) responses")
+
+
+def is_rate_limited(error):
+    """True for errors that mean "slow down" (HTTP 429 / 503)."""
+    return getattr(error, "code", None) in (429, 503)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, if the error says so."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        try:
+            value = headers.get("retry-after") or headers.get("Retry-After")
+            if value:
+                return float(value)
+        except (TypeError, ValueError):
+            pass
+    text = f"{getattr(error, 'details', '')} {error}"
+    match = _RETRY_DELAY_RE.search(text) or _RETRY_IN_RE.search(text)
+    return float(match.group(1)) if match else None
+
+
+class RateLimiter:
+    """Token bucket plus concurrency cap for calls to one model.
+
+    `acquire` waits first for a free concurrency slot, then for a token
+    (refilled at `rpm` per minute, at most `burst` saved up), and returns
+    how long it waited. Callers are served in arrival order. `throttled`
+    reports a 429: the refill rate is halved, the bucket emptied, and every
+    caller held back for a jittered exponential backoff (at least the
+    server's Retry-After); `succeeded` lets the rate climb back.
+    """
+
+    def __init__(self, name, rpm, burst, concurrency,
+                 backoff_base=RATE_LIMIT_BACKOFF_BASE_SECONDS,
+                 backoff_max=RATE_LIMIT_BACKOFF_MAX_SECONDS,
+                 clock=time.monotonic, sleep=asyncio.sleep, rng=random.random):
+        self.name = name
+        self._configured_rate = rpm / 60.0
+        self.rate = self._configured_rate  # tokens per second
+        self._burst = burst
+        self._concurrency = concurrency
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._clock = clock
+        self._sleep = sleep
+        self._rng = rng
+
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._in_flight = 0
+        self._order = asyncio.Lock()
+        self._slot_free = asyncio.Event()
+
+        self.calls = 0
+        self.throttles = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.last_wait_seconds = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait for a slot and a token; return the seconds spent waiting."""
+        started = self._clock()
+        async with self._order:
+            while self._in_flight >= self._concurrency:
+                self._slot_free.clear()
+                await self._slot_free.wait()
+            while True:
+                now = self._clock()
+                self._refill(now)
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    wait = (1 - self._tokens) / self.rate
+                await self._sleep(wait)
+            self._in_flight += 1
+
+        waited = self._clock() - started
+        self.calls += 1
+        self.last_wait_seconds = waited
+        _wait_metric.record(waited)
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if waited >= 1:
+            log.info("%s: waited %.1fs for the rate limiter", self.name, waited)
+        return waited
+
+    def release(self):
+        self._in_flight -= 1
+        self._slot_free.set()
+
+    @asynccontextmanager
+    async def slot(self):
+        """`async with limiter.slot() as waited:` around one call."""
+        waited = await self.acquire()
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def backoff_delay(self, attempt, hint=None):
+        """Exponential backoff with jitter for the given attempt (1-based)."""
+        delay = min(self._backoff_max, self._backoff_base * 2 ** (attempt - 1))
+        delay *= 0.5 + 0.5 * self._rng()
+        return max(delay, hint or 0.0)
+
+    def throttled(self, attempt=1, hint=None):
+        """Record a 429 on the given attempt; return the backoff applied to all callers."""
+        now = self._clock()
+        delay = self.backoff_delay(attempt, hint)
+        self.throttles += 1
+        _throttle_metric.inc()
+        self.rate = max(self._configured_rate * _MIN_RATE_FRACTION, self.rate * _THROTTLE_FACTOR)
+        self._refill(now)
+        self._tokens = 0.0
+        self._blocked_until = max(self._blocked_until, now + delay)
+        log.warning("%s rate limited (attempt %d), backing off %.1fs, rate now %.1f/min",
+                    self.name, attempt, delay, self.rate * 60)
+        return delay
+
+    def succeeded(self):
+        if self.rate < self._configured_rate:
+            self.rate = min(self._configured_rate,
+                            self.rate + self._configured_rate * _RECOVERY_STEP)
+
+    async def call(self, fn, max_retries=RATE_LIMIT_MAX_RETRIES):
+        """Run `await fn()` in a slot, retrying rate-limit errors with backoff."""
+        for attempt in range(1, max_retries + 1):
+            async with self.slot():
+                try:
+                    result = await fn()
+                except Exception as e:
+                    if not is_rate_limited(e) or attempt == max_retries:
+                        raise
+                    self.throttled(attempt, retry_after(e))
+                    continue
+            self.succeeded()
+            return result
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "in_flight": self._in_flight,
+            "throttles": self.throttles,
+            "rate_per_minute": round(self.rate * 60, 1),
+            "avg_wait_seconds": self.wait_seconds / self.calls if self.calls else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+def _quota_group(model, limits):
+    for group, group_limits in limits.items():
+        if model in group_limits.get("models", ()):
+            return group, group_limits
+    return model, RATE_LIMIT_DEFAULT
+
+
+def get_limiter(model, limits=RATE_LIMITS):
+    """The process-wide limiter for `model`'s quota group in RATE_LIMITS.
+
+    Models in the same group get the same limiter.
+    """
+    group, group_limits = _quota_group(model, limits)
+    limiter = _limiters.get(group)
+    if limiter is None:
+        limiter = RateLimiter(group, group_limits["rpm"], group_limits["burst"],
+                              group_limits["concurrency"])
+        _limiters[group] = limiter
+    return limiter
@@ -0,0 +1,181 @@
+import threading
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Preallocated single-producer, multi-consumer ring buffer for PCM samples.
+
+    The audio callback writes each block once; every consumer reads through
+    its own `RingReader` cursor and gets numpy views into the shared storage,
+    so readers never take audio away from each other. The writer never waits
+    for readers: a reader that falls more than a buffer's worth behind is
+    moved forward and told how many samples it lost.
+    """
+
+    def __init__(self, capacity, dtype=np.int16):
+        self._buf = np.zeros(capacity, dtype=dtype)
+        self._capacity = capacity
+        self._written = 0
+        self._max_write = 0
+        self._readers = []
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def total_written(self):
+        with self._lock:
+            return self._written
+
+    def write(self, samples):
+        """Copy samples into the ring (called from the producer thread only)."""
+        n = len(samples)
+        if n == 0:
+            return
+        skipped = 0
+        if n > self._capacity:
+            skipped = n - self._capacity
+            samples = samples[skipped:]
+            n = self._capacity
+
+        pos = (self._written + skipped) % self._capacity
+        first = min(n, self._capacity - pos)
+        self._buf[pos:pos + first] = samples[:first]
+        if first < n:
+            self._buf[:n - first] = samples[first:]
+
+        with self._lock:
+            self._written += skipped + n
+            self._max_write = max(self._max_write, n)
+
+    def reader(self, name, from_start=False):
+        """Create a consumer cursor.
+
+        New readers start at the current write position unless `from_start`
+        is set, in which case they get everything still held in the ring.
+        """
+        with self._lock:
+            if from_start:
+                cursor = max(0, self._written - self._capacity + self._max_write)
+            else:
+                cursor = self._written
+            reader = RingReader(self, name, cursor)
+            self._readers.append(reader)
+        return reader
+
+    def _remove_reader(self, reader):
+        with self._lock:
+            if reader in self._readers:
+                self._readers.remove(reader)
+
+    def _claim(self, reader, max_samples, multiple):
+        """Advance a reader's cursor; return (start, count, lost)."""
+        with self._lock:
+            lost = 0
+            # Leave room for the block the producer may be writing right now.
+            horizon = self._capacity - self._max_write
+            available = self._written - reader._cursor
+            if available > horizon:
+                lost = available - horizon
+                reader._cursor += lost
+                available = horizon
+
+            count = available if max_samples is None else min(available, max_samples)
+            if multiple > 1:
+                count -= count % multiple
+            start = reader._cursor
+            reader._cursor += count
+            return start, count, lost
+
+    def _views(self, start, count):
+        if count == 0:
+            return []
+        pos = start % self._capacity
+        first = min(count, self._capacity - pos)
+        views = [self._buf[pos:pos + first]]
+        if first < count:
+            views.append(self._buf[:count - first])
+        return views
+
+    def stats(self):
+        with self._lock:
+            return {
+                "capacity": self._capacity,
+                "written": self._written,
+                "readers": {
+                    r.name: {
+                        "lag": self._written - r._cursor,
+                        "overruns": r.overruns,
+                        "lost_samples": r.lost_samples,
+                    }
+                    for r in self._readers
+                },
+            }
+
+
+class RingReader:
+    """A single consumer's cursor into an `AudioRingBuffer`.
+
+    Views returned by `read` alias the ring storage and stay valid until the
+    producer wraps around to them, i.e. for roughly one buffer capacity of
+    new audio. Consumers that need to hold samples longer must copy them.
+    """
+
+    def __init__(self, ring, name, cursor):
+        self.name = name
+        self._ring = ring
+        self._cursor = cursor
+        self.overruns = 0
+        self.lost_samples = 0
+
+    @property
+    def available(self):
+        return self._ring.total_written - self._cursor
+
+    def read(self, max_samples=None, multiple=1):
+        """Return (views, lost) for the unread samples.
+
+        `views` holds zero, one or two arrays (two when the data wraps the end
+        of the ring). `lost` is the number of samples skipped because this
+        reader fell behind since its previous read. With `multiple` set, only
+        a whole number of `multiple`-sized blocks is consumed.
+        """
+        start, count, lost = self._ring._claim(self, max_samples, multiple)
+        if lost:
+            self.overruns += 1
+            self.lost_samples += lost
+        return self._ring._views(start, count), lost
+
+    def read_blocks(self, block_size):
+        """Return (blocks, lost) as fixed-size arrays.
+
+        Blocks are views, except for a block straddling the end of the ring,
+        which is copied into one contiguous array.
+        """
+        views, lost = self.read(multiple=block_size)
+        blocks = []
+        carry = None
+        for view in views:
+            offset = 0
+            if carry is not None:
+                need = block_size - len(carry)
+                blocks.append(np.concatenate((carry, view[:need])))
+                offset = need
+                carry = None
+            end = offset + (len(view) - offset) // block_size * block_size
+            for i in range(offset, end, block_size):
+                blocks.append(view[i:i + block_size])
+            if end < len(view):
+                carry = view[end:]
+        return blocks, lost
+
+    def skip_to_end(self):
+        """Drop everything unread, e.g. when a consumer resumes after a pause."""
+        with self._ring._lock:
+            self._cursor = self._ring._written
+
+    def close(self):
+        self._ring._remove_reader(self)
@@ -0,0 +1,148 @@
+import math
+import re
+import threading
+import time
+from collections import deque
+
+from jarvis.config import (
+    TRANSCRIPT_BUFFER_MINUTES,
+    TASK_CONTEXT_TOP_K,
+    TASK_CONTEXT_TOKEN_BUDGET,
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have he her him his how i "
+    "if in is it its just me my no not of on or our she so that the their them "
+    "then there they this to um uh was we were what when where which who will "
+    "with would you your".split()
+)
+
+# BM25 parameters.
+_K1 = 1.5
+_B = 0.75
+
+
+def tokenize(text):
+    tokens = (t.strip("'") for t in _TOKEN_RE.findall(text.lower()))
+    return [t for t in tokens if len(t) > 1 and t not in _STOPWORDS]
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class TranscriptIndex:
+    """Incremental BM25 inverted index over transcript segments.
+
+    TranscriptBuffer feeds it every entry as it is added; segments older
+    than `max_minutes` are dropped from the postings as new ones arrive.
+    `search` returns the segments most relevant to a query, each with a
+    little surrounding transcript, within a token budget.
+    """
+
+    def __init__(self, max_minutes=TRANSCRIPT_BUFFER_MINUTES, context_segments=1):
+        self._max_seconds = max_minutes * 60
+        self._context = context_segments
+        self._docs = {}  # seq -> (timestamp, text, term counts, length)
+        self._order = deque()  # seqs, oldest first
+        self._postings = {}  # term -> {seq: term frequency}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, seq, timestamp, text):
+        terms = {}
+        for token in tokenize(text):
+            terms[token] = terms.get(token, 0) + 1
+        length = sum(terms.values())
+        with self._lock:
+            self._docs[seq] = (timestamp, text, terms, length)
+            self._order.append(seq)
+            self._total_length += length
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[seq] = tf
+            self._expire(timestamp - self._max_seconds)
+
+    def _expire(self, cutoff):
+        while self._order and self._docs[self._order[0]][0] < cutoff:
+            seq = self._order.popleft()
+            _, _, terms, length = self._docs.pop(seq)
+            self._total_length -= length
+            for term in terms:
+                postings = self._postings[term]
+                del postings[seq]
+                if not postings:
+                    del self._postings[term]
+
+    def _score(self, query_terms):
+        n = len(self._docs)
+        avg_length = self._total_length / n if n else 0
+        scores = {}
+        for term in set(query_terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for seq, tf in postings.items():
+                length = self._docs[seq][3]
+                norm = tf + _K1 * (1 - _B + _B * length / (avg_length or 1))
+                scores[seq] = scores.get(seq, 0.0) + idf * tf * (_K1 + 1) / norm
+        return scores
+
+    def search(self, query, top_k=TASK_CONTEXT_TOP_K, token_budget=TASK_CONTEXT_TOKEN_BUDGET):
+        """Return [(timestamp, snippet)] for the best matches, in time order.
+
+        Each hit is widened by `context_segments` neighbours on either side;
+        overlapping hits are merged. Hits that would overflow `token_budget`
+        are skipped in favour of lower-ranked ones that still fit.
+        """
+        query_terms = tokenize(query)
+        with self._lock:
+            scores = self._score(query_terms)
+            ranked = sorted(scores, key=scores.get, reverse=True)
+
+            chosen = set()
+            used = 0
+            hits = 0
+            for seq in ranked:
+                if hits >= top_k:
+                    break
+                window = [
+                    s for s in range(seq - self._context, seq + self._context + 1)
+                    if s in self._docs and s not in chosen
+                ]
+                cost = sum(estimate_tokens(self._docs[s][1]) for s in window)
+                if used + cost > token_budget:
+                    continue
+                chosen.update(window)
+                used += cost
+                hits += 1
+
+            snippets = []
+            previous = None
+            for seq in sorted(chosen):
+                timestamp, text = self._docs[seq][:2]
+                if previous is not None and seq == previous + 1:
+                    snippets[-1] = (snippets[-1][0], f"{snippets[-1][1]} {text}")
+                else:
+                    snippets.append((timestamp, text))
+                previous = seq
+            return snippets
+
+    def context_for(self, query, top_k=TASK_CONTEXT_TOP_K, token_budget=TASK_CONTEXT_TOKEN_BUDGET):
+        """Relevant transcript excerpts for `query` as prompt text ("" if none match)."""
+        return "\n".join(
+            f"[{time.strftime('%H:%M:%S', time.localtime(ts))}] {text}"
+            for ts, text in self.search(query, top_k, token_budget)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._order.clear()
+            self._postings.clear()
+            self._total_length = 0
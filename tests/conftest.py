@@ -0,0 +1,58 @@
+import asyncio
+import gc
+
+import pytest
+
+
+class FakeClock:
+    """Virtual time for code that takes injectable `clock` and `sleep`.
+
+    Calling it returns the current time; `sleep` advances the clock instead
+    of waiting and records the requested delay in `slept`.
+    """
+
+    def __init__(self, now=0.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += max(0.0, seconds)
+        await asyncio.sleep(0)
+
+
+class AsyncRunner:
+    """Runs a coroutine on a fresh event loop and returns its result.
+
+    Errors the loop would otherwise only log (such as "exception was never
+    retrieved") are collected in `errors`.
+    """
+
+    def __init__(self):
+        self.errors = []
+
+    def __call__(self, coro):
+        async def main():
+            asyncio.get_running_loop().set_exception_handler(
+                lambda loop, context: self.errors.append(context)
+            )
+            try:
+                return await coro
+            finally:
+                gc.collect()
+                await asyncio.sleep(0)
+
+        return asyncio.run(main())
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def run():
+    return AsyncRunner()
@@ -0,0 +1,116 @@
+import asyncio
+
+import numpy as np
+
+from jarvis.layer2 import audio_playback
+from jarvis.layer2.audio_playback import AudioPlayback
+
+RATE = 24000
+BLOCK = RATE // 50  # 20 ms
+
+
+class FakeOutputDevice:
+    """In-memory output device: each `pull` runs one device callback."""
+
+    def __init__(self, rate=RATE, channels=1, block_frames=BLOCK):
+        self.rate = rate
+        self.channels = channels
+        self.block_frames = block_frames
+        self._fill = None
+
+    def start(self, fill):
+        self._fill = fill
+
+    def pull(self, blocks=1):
+        out = []
+        for _ in range(blocks):
+            block = np.zeros(self.block_frames * self.channels, dtype=np.int16)
+            self._fill(block)
+            out.append(block)
+        return np.concatenate(out)
+
+    def stop(self):
+        self._fill = None
+
+
+def _tone(ms, value=1000):
+    return np.full(RATE * ms // 1000, value, dtype=np.int16).tobytes()
+
+
+async def _playing(test, device=None, jitter_ms=60):
+    device = device or FakeOutputDevice()
+    playback = AudioPlayback(device, jitter_ms=jitter_ms)
+    task = asyncio.create_task(playback.start())
+    await asyncio.sleep(0)
+    try:
+        await test(playback, device)
+    finally:
+        playback.stop()
+        await task
+
+
+def test_jitter_buffer_holds_playback_until_filled(run):
+    async def test(playback, device):
+        await playback.enqueue(_tone(40))
+        assert not device.pull(1).any()  # 40 ms < 60 ms jitter buffer
+        await playback.enqueue(_tone(40))
+        assert (device.pull(4) == 1000).all()
+        assert playback.played_samples == 4 * BLOCK
+
+    run(_playing(test))
+
+
+def test_end_of_response_is_not_an_underrun(run):
+    async def test(playback, device):
+        await playback.enqueue(_tone(70))  # ends mid-block
+        device.pull(5)
+        assert playback.played_samples == RATE * 70 // 1000
+        assert playback.underruns == 0
+
+    run(_playing(test))
+
+
+def test_audio_arriving_after_running_dry_is_an_underrun(run):
+    async def test(playback, device):
+        await playback.enqueue(_tone(70))
+        device.pull(4)
+        await playback.enqueue(_tone(100))  # the response continues
+        assert playback.underruns == 1
+        assert playback.underrun_samples == 4 * BLOCK - RATE * 70 // 1000
+
+    run(_playing(test))
+
+
+def test_next_response_after_a_pause_is_not_an_underrun(run, monkeypatch):
+    async def test(playback, device):
+        await playback.enqueue(_tone(70))
+        device.pull(4)
+        monkeypatch.setattr(audio_playback, "_UNDERRUN_GAP_SECONDS", 0.0)
+        await playback.enqueue(_tone(100))
+        assert playback.underruns == 0
+
+    run(_playing(test))
+
+
+def test_flush_drops_buffered_audio(run):
+    async def test(playback, device):
+        await playback.enqueue(_tone(500))
+        device.pull(2)
+        playback.flush()
+        assert not device.pull(3).any()
+        assert playback.flushes == 1
+        assert playback.flushed_samples == RATE // 2 - 2 * BLOCK
+        await playback.enqueue(_tone(100))  # after a flush, not an underrun
+        assert playback.underruns == 0
+
+    run(_playing(test))
+
+
+def test_device_rate_is_resampled(run):
+    async def test(playback, device):
+        await playback.enqueue(_tone(200))
+        out = device.pull(5)
+        assert len(out) == 5 * 960
+        assert abs(int(out[-960:].mean()) - 1000) < 20
+
+    run(_playing(test, FakeOutputDevice(rate=48000, block_frames=960), jitter_ms=20))
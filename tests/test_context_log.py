@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from jarvis.utils.context_log import ContextLog, SegmentedLog
+
+
+@pytest.fixture
+def segmented(tmp_path):
+    # Tiny segments, so a handful of records spans several files.
+    log = SegmentedLog(str(tmp_path), segment_bytes=16)
+    for t in range(10):
+        log.append(float(t), f"rec{t}".encode())
+    yield log
+    log.close()
+
+
+def _texts(records):
+    return [payload.decode() for _, _, payload in records]
+
+
+def test_time_range_reads_across_segments(segmented):
+    assert len(os.listdir(segmented.directory)) > 4
+    assert _texts(segmented.read(3, 7)) == ["rec3", "rec4", "rec5", "rec6"]
+    assert _texts(segmented.read(8)) == ["rec8", "rec9"]
+    assert _texts(segmented.read(2.5, 3)) == []
+    assert _texts(segmented.read(20)) == []
+
+
+def test_last_reads_only_the_newest_records(segmented):
+    assert _texts(segmented.read(0, last=3)) == ["rec7", "rec8", "rec9"]
+    assert _texts(segmented.read(0, 5, last=2)) == ["rec3", "rec4"]
+
+
+def test_timestamps_never_go_backwards(segmented):
+    segmented.append(4.0, b"late")
+    assert segmented.read(9)[-1][0] == 9.0
+    assert _texts(segmented.read(9)) == ["rec9", "late"]
+
+
+def test_history_survives_a_restart_with_a_torn_tail(segmented):
+    segmented.close()
+    newest = sorted(n for n in os.listdir(segmented.directory) if n.endswith(".log"))[-1]
+    path = os.path.join(segmented.directory, newest)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 1)  # crash mid-append
+
+    reopened = SegmentedLog(segmented.directory, segment_bytes=16)
+    try:
+        assert _texts(reopened.read(0))[-1] == "rec8"
+        reopened.append(10.0, b"rec10")
+        assert _texts(reopened.read(8)) == ["rec8", "rec10"]
+    finally:
+        reopened.close()
+
+
+def test_retention_deletes_the_oldest_segments(segmented):
+    total = segmented.total_bytes
+    removed = segmented.enforce_retention(total // 2)
+    assert removed > 0
+    assert segmented.total_bytes <= total // 2
+    remaining = _texts(segmented.read(0))
+    assert remaining and remaining[-1] == "rec9" and "rec0" not in remaining
+
+
+def test_transcripts_and_frames_round_trip(tmp_path):
+    context_log = ContextLog(directory=str(tmp_path))
+    try:
+        context_log.append_transcript(1.0, "hello")
+        context_log.append_transcript(2.0, "wörld")
+        context_log.append_frame(1.5, b"jpeg1")
+        context_log.append_frame(2.5, b"jpeg2", crop=b"crop2", crop_box=(1, 2, 3, 4))
+        context_log.append_frame(3.5, b"jpeg3")
+
+        assert context_log.read_transcript(0) == [(1.0, "hello"), (2.0, "wörld")]
+        frames = context_log.read_frames(2, last=2)
+        assert [f.timestamp for f in frames] == [2.5, 3.5]
+        assert frames[0].stored == (b"jpeg2", b"crop2")
+        assert frames[0].crop_box == (1, 2, 3, 4)
+        assert all(f.frame_id < 0 for f in frames)
+    finally:
+        context_log.close()
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from jarvis.layer2.context_pack import ContextPacker, collapse_repeats
+from jarvis.utils.search_index import estimate_tokens
+
+NOW = 10_000.0
+
+
+def _frame(frame_id, level, has_crop=False):
+    preview = np.full((8, 8), level, dtype=np.uint8)
+    return SimpleNamespace(frame_id=frame_id, timestamp=float(frame_id), has_crop=has_crop,
+                           preview=lambda: preview)
+
+
+def _packer(**kwargs):
+    settings = dict(token_budget=1000, max_frames=3, image_tokens=100, half_life=60,
+                    relevance_weight=1.0, query_seconds=10, min_frame_distance=5.0)
+    settings.update(kwargs)
+    return ContextPacker(**settings)
+
+
+def test_collapse_repeats():
+    assert collapse_repeats("Thank you. Thank you. thank you! Bye.") == "Thank you. (x3) Bye."
+    assert collapse_repeats("One. Two. One.") == "One. Two. One."
+
+
+def test_transcript_fits_the_budget_in_time_order():
+    segments = [(NOW - 100 + i, f"segment number {i:02d} about nothing much") for i in range(50)]
+    report = {}
+    text = _packer().pack_transcript(segments, budget=60, now=NOW, report=report)
+    lines = text.splitlines()
+    assert report["transcript_tokens"] <= 60
+    assert report["segments_kept"] + report["segments_dropped"] == 50
+    kept = [int(line.split("number ")[1].split()[0]) for line in lines if line != "..."]
+    assert kept == sorted(kept) and kept[-1] == 49  # newest survive, rendered oldest first
+
+
+def test_repeated_segments_are_kept_once_at_their_latest_time():
+    segments = [(NOW - 30, "ok"), (NOW - 20, "the deploy failed"), (NOW - 10, "OK")]
+    report = {}
+    text = _packer().pack_transcript(segments, budget=1000, now=NOW, report=report)
+    assert text.splitlines()[-1].endswith("OK (repeated 2x)")
+    assert report["repeats_collapsed"] == 1
+
+
+def test_relevant_old_segment_beats_recent_chatter():
+    segments = [(NOW - 600, "the staging deploy needs the new database password")]
+    segments += [(NOW - 60 + i, f"random chatter {i}") for i in range(5)]
+    budget = estimate_tokens(_packer()._render([NOW, segments[0][1], [], 1])) + 10
+    text = _packer(half_life=30).pack_transcript(
+        segments, budget, query="what about the staging deploy", now=NOW)
+    assert "database password" in text
+
+
+def test_frames_skip_near_duplicates_and_keep_the_latest():
+    frames = [_frame(1, 0), _frame(2, 1), _frame(3, 200), _frame(4, 201), _frame(5, 100)]
+    report = {}
+    chosen = _packer().select_frames(frames, report)
+    ids = [f.frame_id for f in chosen]
+    assert 5 in ids and len(ids) == 3
+    assert ids == sorted(ids)
+    assert not {1, 2} <= set(ids) and not {3, 4} <= set(ids)
+    assert report["frames_dropped"] == 2
+
+
+def test_identical_frames_collapse_to_one():
+    report = {}
+    chosen = _packer().select_frames([_frame(i, 50) for i in range(4)], report)
+    assert [f.frame_id for f in chosen] == [3]
+    assert report["frames_near_duplicate"] == 3
+
+
+def test_image_tokens_come_off_the_transcript_budget():
+    segments = [(NOW - 50 + i, f"words words words {i:02d}") for i in range(50)]
+    frames = [_frame(1, 0), _frame(2, 200, has_crop=True)]
+    packed = _packer(token_budget=400).pack(segments, frames, now=NOW)
+    assert packed.report["image_tokens"] == 300  # a crop costs a second image
+    assert packed.report["transcript_tokens"] <= 100
+    assert [f.frame_id for f in packed.frames] == [1, 2]
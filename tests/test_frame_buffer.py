@@ -0,0 +1,81 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from jarvis.layer1.screen_capture import ScreenCapture
+from jarvis.utils.buffer import FrameBuffer
+
+
+def _screen(seed, size=(1920, 1080)):
+    rng = np.random.default_rng(seed)
+    # Flat panels with some noisy "text" rows, roughly like a desktop.
+    pixels = np.full((size[1], size[0], 3), 235, dtype=np.uint8)
+    pixels[::16] = rng.integers(0, 255, (len(pixels[::16]), size[0], 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+def _capture(max_bytes):
+    buffer = FrameBuffer(max_bytes=max_bytes)
+    return ScreenCapture(buffer), buffer
+
+
+def test_sources_are_compressed():
+    capture, buffer = _capture(64 * 1024 * 1024)
+    img = _screen(0)
+    capture._store_frame((img, img.crop((0, 0, 800, 600)), (0, 0, 800, 600)))
+    frame = buffer.get_latest()
+    source, crop = frame.stored
+    assert source[:2] == b"\xff\xd8" and crop[:2] == b"\xff\xd8"
+    # Far below the ~4.3 MB an uncompressed 1600 px RGB source would take.
+    assert frame.size_bytes < 1024 * 1024
+    assert capture.sources_encoded == 1
+
+
+def test_lazy_encodes_are_counted():
+    capture, buffer = _capture(64 * 1024 * 1024)
+    img = _screen(1)
+    capture._store_frame((img, img.crop((0, 0, 800, 600)), (0, 0, 800, 600)))
+    frame = buffer.get_latest()
+    assert capture.frames_encoded == capture.crops_encoded == 0
+
+    thumb = frame.jpeg()
+    assert Image.open(io.BytesIO(thumb)).width == 1024
+    frame.jpeg(quality=30)
+    frame.jpeg(crop=True)
+    frame.jpeg()  # cached
+    assert capture.frames_encoded == 2
+    assert capture.crops_encoded == 1
+
+
+def test_cached_variants_count_against_the_budget():
+    capture, buffer = _capture(64 * 1024 * 1024)
+    for seed in range(6):
+        img = _screen(seed)
+        capture._store_frame((img, None, None))
+    buffer.max_bytes = buffer.total_bytes  # exactly full
+
+    newest = buffer.get_latest()
+    newest.jpeg(max_width=640)
+    newest.jpeg(quality=20)
+    assert buffer.total_bytes <= buffer.max_bytes
+    assert len(buffer.get_frames()) < 6
+    assert buffer.get_latest() is newest
+
+
+def test_context_log_write_through_does_not_encode(tmp_path):
+    from jarvis.utils.context_log import ContextLog
+
+    context_log = ContextLog(directory=str(tmp_path))
+    buffer = FrameBuffer(max_bytes=64 * 1024 * 1024, context_log=context_log)
+    capture = ScreenCapture(buffer)
+    for seed in range(5):
+        img = _screen(seed)
+        capture._store_frame((img, img.crop((0, 0, 800, 600)), (0, 0, 800, 600)))
+    assert capture.frames_encoded == capture.crops_encoded == 0
+
+    logged = context_log.read_frames(0, encode=capture._encode_variant)
+    assert len(logged) == 5 and all(f.has_crop for f in logged)
+    assert Image.open(io.BytesIO(logged[-1].jpeg())).width == 1024
+    assert capture.frames_encoded == 1
+    context_log.close()
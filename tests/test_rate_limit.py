@@ -0,0 +1,134 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from jarvis.config import BACKGROUND_MODEL, LIVE_API_MODEL
+from jarvis.utils import rate_limit
+from jarvis.utils.rate_limit import RateLimiter, get_limiter, is_rate_limited, retry_after
+
+
+class RateLimitError(Exception):
+    def __init__(self, message="429 RESOURCE_EXHAUSTED", code=429, headers=None):
+        super().__init__(message)
+        self.code = code
+        self.response = SimpleNamespace(headers=headers) if headers else None
+
+
+def _limiter(clock, rpm=60, burst=2, concurrency=4, **kwargs):
+    return RateLimiter("test", rpm, burst, concurrency, clock=clock, sleep=clock.sleep,
+                       rng=lambda: 1.0, **kwargs)
+
+
+def test_burst_then_refill_rate(run, clock):
+    async def main():
+        limiter = _limiter(clock, rpm=60, burst=2)
+        waits = []
+        for _ in range(5):
+            waits.append(await limiter.acquire())
+            limiter.release()
+        return waits
+
+    waits = run(main())
+    assert waits[:2] == [0.0, 0.0]  # the burst
+    assert waits[2:] == pytest.approx([1.0, 1.0, 1.0])  # then one per second
+    assert clock.now == pytest.approx(3.0)
+
+
+def test_concurrency_cap(run, clock):
+    limiter = _limiter(clock, rpm=6000, burst=10, concurrency=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await clock.sleep(1)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    run(main())
+    assert peak == 2
+
+
+def test_retry_after_hints():
+    assert retry_after(RateLimitError(headers={"retry-after": "7"})) == 7.0
+    assert retry_after(RateLimitError("429 ... 'retryDelay': '17s'")) == 17.0
+    assert retry_after(RateLimitError("Please retry in 3.5s.")) == 3.5
+    assert retry_after(RateLimitError("429")) is None
+    assert is_rate_limited(RateLimitError(code=503))
+    assert not is_rate_limited(ValueError())
+
+
+def test_429_waits_for_retry_after_and_retries(run, clock):
+    limiter = _limiter(clock, rpm=600, burst=5, backoff_base=2, backoff_max=60)
+    attempts = []
+
+    async def call():
+        attempts.append(clock.now)
+        if len(attempts) == 1:
+            raise RateLimitError("429 RESOURCE_EXHAUSTED retryDelay: '17s'")
+        return "ok"
+
+    assert run(limiter.call(call, max_retries=3)) == "ok"
+    assert attempts[1] - attempts[0] >= 17.0
+    assert limiter.throttles == 1
+    assert limiter.rate < 10  # halved from 600/min
+
+
+def test_backoff_is_exponential_and_capped(clock):
+    limiter = _limiter(clock, backoff_base=2, backoff_max=10)
+    assert [limiter.backoff_delay(n) for n in (1, 2, 3, 4)] == [2, 4, 8, 10]
+    assert limiter.backoff_delay(1, hint=30) == 30
+
+
+def test_gives_up_after_max_retries(run, clock):
+    limiter = _limiter(clock)
+
+    async def call():
+        raise RateLimitError()
+
+    with pytest.raises(RateLimitError):
+        run(limiter.call(call, max_retries=3))
+    assert limiter.throttles == 2
+
+
+def test_rate_recovers_after_successes(clock):
+    limiter = _limiter(clock, rpm=60, burst=1)
+    limiter.throttled()
+    assert limiter.rate == pytest.approx(0.5)
+    for _ in range(10):
+        limiter.succeeded()
+    assert limiter.rate == pytest.approx(1.0)
+
+
+def test_non_rate_limit_errors_are_not_retried(run, clock):
+    limiter = _limiter(clock)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        run(limiter.call(call))
+    assert len(calls) == 1 and limiter.in_flight == 0
+
+
+def test_models_in_a_quota_group_share_a_limiter(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    live, background = get_limiter(LIVE_API_MODEL), get_limiter(BACKGROUND_MODEL)
+    assert live is background
+    # A 429 on one layer slows the other down too.
+    live.throttled()
+    assert background.throttles == 1
+
+
+def test_models_outside_a_group_get_their_own_limiter(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    limits = {"pro": {"models": ["a", "b"], "rpm": 10, "burst": 1, "concurrency": 1}}
+    assert get_limiter("a", limits) is get_limiter("b", limits)
+    other = get_limiter("c", limits)
+    assert other is not get_limiter("a", limits) and other.name == "c"
+    assert other is get_limiter("c", limits)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from jarvis.utils.audio_utils import StreamResampler, resample
+
+RATE_PAIRS = [(48000, 16000), (16000, 24000), (44100, 16000), (24000, 48000)]
+
+
+def _noise(rate, seconds=0.5):
+    return (np.random.default_rng(0).standard_normal(int(rate * seconds)) * 3000).astype(np.float32)
+
+
+@pytest.mark.parametrize("orig, target", RATE_PAIRS)
+def test_chunked_output_equals_whole_signal(orig, target):
+    audio = _noise(orig)
+    whole = StreamResampler(orig, target).process(audio)
+
+    resampler = StreamResampler(orig, target)
+    sizes = np.random.default_rng(1).integers(1, 700, size=len(audio))
+    bounds = np.cumsum(sizes)
+    chunks = np.split(audio, bounds[bounds < len(audio)])
+    streamed = np.concatenate([resampler.process(chunk) for chunk in chunks])
+
+    assert len(streamed) == len(whole)
+    np.testing.assert_allclose(streamed, whole, atol=1e-2)
+
+
+@pytest.mark.parametrize("orig, target", RATE_PAIRS)
+def test_output_length_matches_the_rate_ratio(orig, target):
+    resampler = StreamResampler(orig, target)
+    produced = sum(len(resampler.process(np.zeros(orig // 100, np.float32))) for _ in range(100))
+    assert abs(produced - target) <= resampler.delay + 1
+    assert resampler.output_length(0) == 0
+
+
+def test_tone_keeps_its_frequency_and_level():
+    t = np.arange(48000) / 48000
+    tone = (np.sin(2 * np.pi * 1000 * t) * 10000).astype(np.int16)
+    out = resample(tone, 48000, 16000)
+    assert out.dtype == np.int16 and len(out) == 16000
+    spectrum = np.abs(np.fft.rfft(out[1000:-1000].astype(np.float32)))
+    peak_hz = np.argmax(spectrum) * 16000 / len(out[1000:-1000])
+    assert abs(peak_hz - 1000) < 5
+    assert abs(np.abs(out[1000:-1000]).max() - 10000) < 300
+
+
+def test_content_above_the_new_nyquist_is_removed():
+    t = np.arange(48000) / 48000
+    tone = (np.sin(2 * np.pi * 12000 * t) * 10000).astype(np.float32)  # above 8 kHz
+    out = resample(tone, 48000, 16000)
+    assert np.abs(out[1000:-1000]).max() < 100
+
+
+def test_reset_forgets_the_stream():
+    resampler = StreamResampler(48000, 16000)
+    resampler.process(_noise(48000))
+    resampler.reset()
+    fresh = StreamResampler(48000, 16000)
+    chunk = _noise(48000, 0.1)
+    np.testing.assert_array_equal(resampler.process(chunk), fresh.process(chunk))
+
+
+def test_same_rate_passes_through():
+    audio = np.arange(10, dtype=np.int16)
+    assert resample(audio, 16000, 16000) is audio
+    np.testing.assert_array_equal(StreamResampler(16000, 16000).process(audio), audio)
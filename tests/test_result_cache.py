@@ -0,0 +1,138 @@
+import os
+from types import SimpleNamespace
+
+from jarvis.layer3.result_cache import ResultCache, cache_key
+from jarvis.layer3.task_executor import TaskExecutor
+from jarvis.utils.rate_limit import RateLimiter
+
+
+class _StubClient:
+    """Stands in for genai.Client: counts calls and answers with canned text."""
+
+    def __init__(self, text="42"):
+        self.text = text
+        self.calls = 0
+        self.aio = SimpleNamespace(models=SimpleNamespace(
+            generate_content=self._generate, generate_content_stream=self._stream,
+        ))
+
+    async def _generate(self, model, contents, config):
+        self.calls += 1
+        return SimpleNamespace(text=f"{self.text} #{self.calls}")
+
+    async def _stream(self, model, contents, config):
+        self.calls += 1
+        calls = self.calls
+
+        async def chunks():
+            for piece in (self.text, f" #{calls}"):
+                yield SimpleNamespace(text=piece)
+        return chunks()
+
+
+def _executor(tmp_path, clock, ttl=600):
+    cache = ResultCache(max_entries=8, ttl_seconds=ttl, directory=str(tmp_path),
+                        clock=clock)
+    limiter = RateLimiter("test", rpm=6000, burst=100, concurrency=4)
+    client = _StubClient()
+    return TaskExecutor(client=client, cache=cache, limiter=limiter), client
+
+
+def test_cache_key_ignores_case_spacing_and_timestamps():
+    assert cache_key("Summarise  the call", "[10:01:02] hi") == cache_key("summarise the call", "[10:05:00] hi")
+    assert cache_key("a", "b") != cache_key("a", "c")
+
+
+def test_repeated_task_is_served_from_cache(run, clock, tmp_path):
+    async def main():
+        executor, client = _executor(tmp_path, clock)
+        first = await executor.execute("What is 6 * 7?", "context")
+        second = await executor.execute("what is 6 *  7?", "context")
+        assert first == second == "42 #1"
+        assert client.calls == 1
+        assert executor.cache.stats()["hits"] == 1
+
+    run(main())
+
+
+def test_fresh_bypasses_and_refreshes_the_cache(run, clock, tmp_path):
+    async def main():
+        executor, client = _executor(tmp_path, clock)
+        await executor.execute("task")
+        assert await executor.execute("task", use_cache=False) == "42 #2"
+        assert await executor.execute("task") == "42 #2"
+        assert client.calls == 2
+
+    run(main())
+
+
+def test_entries_expire(run, clock, tmp_path):
+    async def main():
+        executor, client = _executor(tmp_path, clock, ttl=60)
+        await executor.execute("task")
+        clock.now += 61
+        assert await executor.execute("task") == "42 #2"
+        assert executor.cache.stats()["expired"] >= 1
+
+    run(main())
+
+
+def test_disk_tier_survives_a_restart(run, clock, tmp_path):
+    async def main():
+        executor, client = _executor(tmp_path, clock)
+        await executor.execute("task", "ctx")
+
+        restarted, client2 = _executor(tmp_path, clock)
+        assert await restarted.execute("task", "ctx") == "42 #1"
+        assert client2.calls == 0
+        assert restarted.cache.stats()["disk_hits"] == 1
+
+    run(main())
+
+
+def test_expired_disk_entries_are_pruned_on_startup(clock, tmp_path):
+    ResultCache(directory=str(tmp_path), ttl_seconds=60, clock=clock).put("k", "v")
+    clock.now += 120
+    cache = ResultCache(directory=str(tmp_path), ttl_seconds=60, clock=clock)
+    assert not list(tmp_path.iterdir())
+    assert cache.get("k") is None
+
+
+def test_streamed_results_are_cached(run, clock, tmp_path):
+    async def main():
+        executor, client = _executor(tmp_path, clock)
+        streamed = "".join([p async for p in executor.execute_stream("task")])
+        cached = [p async for p in executor.execute_stream("task")]
+        assert streamed == "42 #1" and cached == ["42 #1"]
+        assert client.calls == 1
+
+    run(main())
+
+
+def test_disk_tier_is_off_by_default(clock):
+    assert ResultCache(clock=clock)._directory is None
+
+
+def test_bad_disk_entries_are_misses(clock, tmp_path):
+    cache = ResultCache(directory=str(tmp_path), clock=clock)
+    (tmp_path / "old.json").write_text('{"value": "no timestamp"}')
+    (tmp_path / "cut.json").write_text('{"created": 1')
+    assert cache.get("old") is None and cache.get("cut") is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_disk_tier_only_touches_its_own_files(clock, tmp_path):
+    (tmp_path / "notes.txt").write_text("keep me")
+    cache = ResultCache(directory=str(tmp_path), clock=clock)
+    cache.put("k", "v")
+    cache.clear()
+    assert [p.name for p in tmp_path.iterdir()] == ["notes.txt"]
+
+
+def test_disk_tier_is_capped_on_write(clock, tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_disk_entries=3, clock=clock)
+    for i in range(5):
+        cache.put(f"k{i}", i)
+        os.utime(tmp_path / f"k{i}.json", (i, i))  # distinct mtimes, oldest first
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["k2.json", "k3.json", "k4.json"]
+    assert cache.stats()["disk_evictions"] == 2
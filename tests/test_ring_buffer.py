@@ -0,0 +1,83 @@
+import numpy as np
+
+from jarvis.utils.ring_buffer import AudioRingBuffer
+
+
+def _write(ring, start, count):
+    ring.write(np.arange(start, start + count, dtype=np.int16))
+
+
+def _read(reader, **kwargs):
+    views, lost = reader.read(**kwargs)
+    return (np.concatenate(views).tolist() if views else []), lost
+
+
+def test_reads_across_the_wrap():
+    ring = AudioRingBuffer(10)
+    reader = ring.reader("r")
+    _write(ring, 0, 3)
+    _write(ring, 3, 3)
+    assert _read(reader) == ([0, 1, 2, 3, 4, 5], 0)
+    _write(ring, 6, 3)
+    _write(ring, 9, 3)  # wraps the end of the storage
+    views, lost = reader.read()
+    assert len(views) == 2 and lost == 0
+    assert np.concatenate(views).tolist() == [6, 7, 8, 9, 10, 11]
+
+
+def test_slow_reader_loses_overwritten_samples():
+    ring = AudioRingBuffer(10)
+    reader = ring.reader("slow")
+    for start in range(0, 16, 4):
+        _write(ring, start, 4)
+    # Room is kept for the producer's next block, so 6 samples survive.
+    assert _read(reader) == ([10, 11, 12, 13, 14, 15], 10)
+    assert reader.overruns == 1 and reader.lost_samples == 10
+    assert ring.stats()["readers"]["slow"] == {"lag": 0, "overruns": 1, "lost_samples": 10}
+
+
+def test_readers_do_not_take_audio_from_each_other():
+    ring = AudioRingBuffer(32)
+    a = ring.reader("a")
+    _write(ring, 0, 4)
+    b = ring.reader("b")
+    late = ring.reader("late", from_start=True)
+    _write(ring, 4, 4)
+    assert _read(a) == ([0, 1, 2, 3, 4, 5, 6, 7], 0)
+    assert _read(b) == ([4, 5, 6, 7], 0)
+    assert _read(late) == ([0, 1, 2, 3, 4, 5, 6, 7], 0)
+    assert _read(a) == ([], 0)
+
+
+def test_read_in_whole_blocks():
+    ring = AudioRingBuffer(11)
+    reader = ring.reader("r")
+    _write(ring, 0, 2)
+    _write(ring, 2, 2)
+    assert _read(reader, multiple=3) == ([0, 1, 2], 0)
+    assert reader.available == 1
+    _write(ring, 4, 2)
+    _write(ring, 6, 2)
+    _write(ring, 8, 2)
+    _write(ring, 10, 2)  # storage wraps after sample 10
+    blocks, lost = reader.read_blocks(3)
+    assert [b.tolist() for b in blocks] == [[3, 4, 5], [6, 7, 8], [9, 10, 11]]
+    assert not np.shares_memory(blocks[2], ring._buf)  # straddling block is a copy
+    assert lost == 0
+
+
+def test_oversized_write_keeps_the_newest_samples():
+    ring = AudioRingBuffer(4)
+    _write(ring, 0, 10)
+    assert ring.total_written == 10
+    assert ring._buf.tolist() == [8, 9, 6, 7]  # samples 6-9, in ring order
+
+
+def test_skip_to_end_and_close():
+    ring = AudioRingBuffer(10)
+    reader = ring.reader("r")
+    _write(ring, 0, 5)
+    reader.skip_to_end()
+    assert reader.available == 0
+    reader.close()
+    assert ring.stats()["readers"] == {}
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from jarvis.layer3.scheduler import PRIORITY_HIGH, PRIORITY_LOW, TaskScheduler
+
+
+async def _with_scheduler(test):
+    scheduler = TaskScheduler(workers=1, max_queue=2)
+    try:
+        await test(scheduler)
+    finally:
+        await scheduler.stop()
+
+
+def _job(log, name, seconds=0.01):
+    async def run():
+        await asyncio.sleep(seconds)
+        log.append(name)
+        return name
+    return run
+
+
+def test_priority_order(run):
+    order = []
+
+    async def test(scheduler):
+        blocker = scheduler.submit("block", _job(order, "block", 0.05))
+        await asyncio.sleep(0)  # let the worker pick it up
+        scheduler.submit("low", _job(order, "low"), priority=PRIORITY_LOW)
+        high = scheduler.submit("high", _job(order, "high"), priority=PRIORITY_HIGH)
+        await blocker.result()
+        await high.result()
+        await asyncio.sleep(0.05)
+
+    run(_with_scheduler(test))
+    assert order == ["block", "high", "low"]
+
+
+def test_identical_tasks_are_coalesced(run):
+    ran = []
+
+    async def test(scheduler):
+        first = scheduler.submit("same", _job(ran, "x"))
+        second = scheduler.submit("same", _job(ran, "x"))
+        assert first is second and first.requests == 2
+        assert await second.result() == "x"
+
+    run(_with_scheduler(test))
+    assert ran == ["x"]
+
+
+def test_dropped_fire_and_forget_tasks_are_quiet(run):
+    async def test(scheduler):
+        scheduler.submit("block", _job([], "block", 0.05))
+        await asyncio.sleep(0)
+        for i in range(4):
+            scheduler.submit(i, _job([], i), priority=PRIORITY_LOW)  # never awaited
+        assert scheduler.dropped == 2
+        await asyncio.sleep(0.1)
+
+    run(_with_scheduler(test))
+    assert not [e for e in run.errors if "never retrieved" in e.get("message", "")]
+
+
+def test_dropped_task_still_raises_for_an_awaiting_caller(run):
+    async def test(scheduler):
+        scheduler.submit("block", _job([], "block", 0.05))
+        await asyncio.sleep(0)
+        victim = scheduler.submit("a", _job([], "a"), priority=PRIORITY_LOW)
+        scheduler.submit("b", _job([], "b"))
+        scheduler.submit("c", _job([], "c"))
+        with pytest.raises(RuntimeError, match="dropped"):
+            await victim.result()
+
+    run(_with_scheduler(test))
+
+
+def test_cancel_owner(run):
+    owner = object()
+
+    async def test(scheduler):
+        running = scheduler.submit("r", _job([], "r", 1.0), owner=owner)
+        await asyncio.sleep(0)
+        queued = scheduler.submit("q", _job([], "q"), owner=owner)
+        other = scheduler.submit("o", _job([], "o"))
+        await asyncio.sleep(0.01)
+        assert scheduler.cancel_owner(owner) == 2
+        assert running.future.cancelled() and queued.future.cancelled()
+        assert await other.result() == "o"
+        assert scheduler.pending(owner) == 0
+
+    run(_with_scheduler(test))
@@ -0,0 +1,67 @@
+from jarvis.utils.search_index import TranscriptIndex, tokenize
+
+_TRANSCRIPT = [
+    "morning everyone let's get started",
+    "the quarterly budget is over by ten percent",
+    "marketing spent most of it on the conference",
+    "ok moving on to hiring",
+    "we have two open backend roles",
+    "the budget for hiring is frozen until march",
+    "any questions before we wrap up",
+]
+
+
+def _index(context_segments=0, **kwargs):
+    index = TranscriptIndex(max_minutes=60, context_segments=context_segments, **kwargs)
+    for seq, text in enumerate(_TRANSCRIPT, 1):
+        index.add(seq, 1000.0 + seq, text)
+    return index
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("What's the BUDGET, Q3's?") == ["what's", "budget", "q3's"]
+    assert tokenize("uh I mean -- a b") == ["mean"]
+
+
+def test_best_matches_come_back_in_time_order():
+    # The segment with both terms ranks first, but hits come back by time.
+    index = _index()
+    assert index.search("hiring budget", top_k=1) == [
+        (1006.0, "the budget for hiring is frozen until march")]
+    assert [ts for ts, _ in index.search("hiring budget", top_k=3)] == [1002.0, 1004.0, 1006.0]
+
+
+def test_rare_terms_outweigh_common_ones():
+    # "conference" appears once, "budget" twice: the rare term wins.
+    [(ts, text)] = _index().search("budget conference", top_k=1)
+    assert "conference" in text
+
+
+def test_neighbouring_segments_are_merged_into_one_snippet():
+    hits = _index(context_segments=1).search("conference", top_k=1)
+    assert hits == [(1002.0, " ".join(_TRANSCRIPT[1:4]))]
+
+
+def test_token_budget_skips_hits_that_do_not_fit():
+    index = TranscriptIndex(max_minutes=60, context_segments=0)
+    index.add(1, 1.0, "budget " + "very long tangent " * 40)
+    index.add(2, 2.0, "budget budget")
+    index.add(3, 3.0, "unrelated")
+    assert index.search("budget", token_budget=20) == [(2.0, "budget budget")]
+
+
+def test_old_segments_expire_from_the_postings():
+    index = TranscriptIndex(max_minutes=1)
+    index.add(1, 0.0, "budget review")
+    index.add(2, 30.0, "hiring plan")
+    index.add(3, 90.0, "more hiring")
+    assert len(index) == 2
+    assert index.search("budget") == []
+    assert index.search("hiring") == [(30.0, "hiring plan more hiring")]  # adjacent: merged
+
+
+def test_context_for_formats_timestamped_lines():
+    assert _index().context_for("nothing matches xyzzy") == ""
+    lines = _index().context_for("budget", top_k=2).splitlines()
+    assert len(lines) == 2 and all(line.startswith("[") for line in lines)
+    assert lines[0].endswith("the quarterly budget is over by ten percent")
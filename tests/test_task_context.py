@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from jarvis.config import TRANSCRIPT_BUFFER_MINUTES
+from jarvis.main import Jarvis
+
+
+class _Transcript:
+    def __init__(self):
+        self.asked = []
+
+    def get_recent_text(self, seconds):
+        self.asked.append(seconds)
+        return "transcript"
+
+
+def _jarvis(context_log=None):
+    return SimpleNamespace(
+        context_log=context_log,
+        transcript_buffer=_Transcript(),
+        transcript_index=SimpleNamespace(context_for=lambda task: "relevant"),
+    )
+
+
+def test_lookback_accepts_numbers_in_any_form():
+    for value, seconds in [(5, 300), ("5", 300), (2.7, 120), (0.2, 60)]:
+        jarvis = _jarvis()
+        assert Jarvis._task_context(jarvis, "task", value) == "transcript"
+        assert jarvis.transcript_buffer.asked == [seconds]
+
+
+def test_invalid_lookback_falls_back_to_relevant_excerpts():
+    for value in ["an hour", [5], "inf"]:
+        jarvis = _jarvis()
+        assert Jarvis._task_context(jarvis, "task", value) == "relevant"
+        assert jarvis.transcript_buffer.asked == []
+
+
+def test_lookback_past_the_buffer_is_clamped_and_reported():
+    jarvis = _jarvis()
+    text = Jarvis._task_context(jarvis, "task", TRANSCRIPT_BUFFER_MINUTES * 3)
+    assert jarvis.transcript_buffer.asked == [TRANSCRIPT_BUFFER_MINUTES * 60]
+    assert text.startswith(f"[Only the last {TRANSCRIPT_BUFFER_MINUTES} minutes")
+
+    jarvis = _jarvis(context_log=object())
+    assert Jarvis._task_context(jarvis, "task", TRANSCRIPT_BUFFER_MINUTES * 3) == "transcript"
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from jarvis.utils.buffer import TranscriptBuffer
+
+
+def _filled(count=10, max_minutes=5, **kwargs):
+    """A buffer with entries "w0".."w<count-1>", one second apart, ending now."""
+    buffer = TranscriptBuffer(max_minutes=max_minutes, **kwargs)
+    now = time.time()
+    for i in range(count):
+        buffer.add(f"w{i}", timestamp=now - count + i)
+    return buffer, now - count
+
+
+def test_time_range_slices():
+    buffer, t0 = _filled()
+    assert buffer.get_range(t0 + 3, t0 + 6) == "w3 w4 w5"
+    assert buffer.get_range(t0 + 8) == "w8 w9"
+    assert buffer.get_range(t0 + 3.5, t0 + 4) == ""
+    assert buffer.get_segments(t0 + 8) == [(t0 + 8, "w8"), (t0 + 9, "w9")]
+    assert buffer.get_text() == " ".join(f"w{i}" for i in range(10))
+
+
+def test_expired_entries_are_trimmed_and_compacted():
+    buffer = TranscriptBuffer(max_minutes=1)
+    now = time.time()
+    for i in range(10):
+        buffer.add(f"old{i}", timestamp=now - 120 + i)
+    for i in range(3):
+        buffer.add(f"new{i}", timestamp=now - 3 + i)
+    assert len(buffer) == 3
+    assert buffer.get_text() == "new0 new1 new2"
+    assert buffer.get_range(0) == "new0 new1 new2"
+
+
+def test_sequence_numbers_survive_compaction():
+    buffer = TranscriptBuffer(max_minutes=1)
+    now = time.time()
+    for i in range(6):
+        buffer.add(f"old{i}", timestamp=now - 120)
+    buffer.add("a", timestamp=now - 2)
+    buffer.add("b", timestamp=now - 1)
+    assert buffer.last_seq == 8
+    assert buffer.get_entries_since(6) == [(7, now - 2, "a"), (8, now - 1, "b")]
+    assert buffer.get_entries_since(0) == [(7, now - 2, "a"), (8, now - 1, "b")]
+    assert buffer.get_entries_since(8) == []
+
+
+def test_clock_stepping_back_keeps_the_index_sorted():
+    buffer, t0 = _filled(3)
+    buffer.add("late", timestamp=t0)
+    assert buffer.get_entries_since(3) == [(4, t0 + 2, "late")]
+    assert buffer.get_range(t0 + 2) == "w2 late"
+
+
+def test_older_history_comes_from_the_context_log():
+    class Log:
+        def __init__(self):
+            self.appended = []
+
+        def append_transcript(self, ts, text):
+            self.appended.append(text)
+
+        def read_transcript(self, t0, t1=None):
+            return [(t0, "from disk")]
+
+    context_log = Log()
+    buffer, t0 = _filled(3, context_log=context_log)
+    assert context_log.appended == ["w0", "w1", "w2"]
+    assert buffer.get_range(t0 - 60) == "from disk w0 w1 w2"
+    assert buffer.get_range(t0 + 1) == "w1 w2"  # all in memory: no disk read
+
+
+def test_waiters_wake_on_new_entries(run):
+    buffer, _ = _filled(2)
+
+    async def main():
+        waiter = asyncio.create_task(buffer.wait_for_entries(2, timeout=1))
+        await asyncio.sleep(0)
+        buffer.add("w2")
+        entries = await waiter
+        timed_out = await buffer.wait_for_entries(3, timeout=0.01)
+        return entries, timed_out
+
+    entries, timed_out = run(main())
+    assert [text for _, _, text in entries] == ["w2"]
+    assert timed_out == []
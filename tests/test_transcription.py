@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from jarvis.layer1 import transcription
+from jarvis.layer1.transcription import SlidingWindow, TranscriptionScheduler, TranscriptMerger
+
+RATE = 16000
+
+
+class _FakeWhisperModel:
+    """Loads instantly; like the real model it cannot be pickled."""
+
+    load_dir = None
+
+    def __init__(self, name, **kwargs):
+        self.name = name
+        self._lock = threading.Lock()
+        open(os.path.join(self.load_dir, f"{name}-{os.getpid()}"), "w").close()
+
+    def transcribe(self, audio, **kwargs):
+        seconds = len(audio) / RATE
+        return iter([SimpleNamespace(start=0.0, end=seconds, text=f"{self.name} {seconds:.0f}s")]), None
+
+
+def _words(*words):
+    """A segment with word timestamps, from (text, start, end) triples."""
+    return SimpleNamespace(words=[SimpleNamespace(word=w, start=s, end=e) for w, s, e in words])
+
+
+def _block(seconds, rate=10):
+    return np.zeros(int(seconds * rate), dtype=np.float32)
+
+
+def test_sliding_window_emits_overlapping_windows():
+    window = SlidingWindow(window_seconds=5, hop_seconds=3, sample_rate=10)
+    cuts = []
+    for _ in range(11):
+        cuts += window.feed(_block(1))
+    assert [(start, len(audio)) for start, audio in cuts] == [(0, 50), (30, 50), (60, 50)]
+    assert window.overlap_seconds == 2
+    assert [(start, len(audio)) for start, audio in window.flush()] == [(90, 20)]
+
+
+def test_sliding_window_restarts_after_a_gap():
+    window = SlidingWindow(window_seconds=5, hop_seconds=3, sample_rate=10)
+    window.feed(_block(4))
+    window.skip(20)
+    assert window.feed(_block(4)) == []
+    [(start, audio)] = window.feed(_block(1))
+    assert (start, len(audio)) == (60, 50)
+
+
+def test_sliding_window_skips_windows_without_speech():
+    class Gate:
+        def is_speech(self, block):
+            return bool(block.any())
+
+    window = SlidingWindow(window_seconds=2, hop_seconds=2, gate=Gate(), sample_rate=10)
+    assert window.feed(_block(2)) == []
+    assert len(window.feed(np.ones(20, dtype=np.float32))) == 1
+    assert (window.windows, window.skipped_windows) == (1, 1)
+
+
+def test_merger_emits_each_word_once():
+    merger = TranscriptMerger(overlap_seconds=2)
+    # Windows are 5 s long every 3 s; "brown" and "fox" sit in the first
+    # window's overlap with the second, "jumps" in the second's with the third.
+    first = merger.merge(0, 5, [_words((" the", 0.5, 0.8), (" quick", 1.0, 1.4),
+                                       (" brown", 3.6, 4.0), (" fo", 4.7, 5.0))])
+    second = merger.merge(3, 5, [_words((" brown", 0.6, 1.0), (" fox", 1.7, 2.1),
+                                        (" jumps", 3.2, 3.6))])
+    third = merger.merge(6, 1, [_words((" jumps", 0.2, 0.6), (" over", 0.7, 0.9))], final=True)
+    assert [first, second, third] == ["the quick", "brown fox", "jumps over"]
+
+
+def test_merger_handles_segments_without_word_timestamps():
+    merger = TranscriptMerger(overlap_seconds=1)
+    segment = SimpleNamespace(start=0.0, end=2.0, text=" Hello there. ", words=None)
+    assert merger.merge(0, 4, [segment]) == "Hello there."
+    assert merger.merge(3, 4, [SimpleNamespace(start=-3.0, end=-1.0, text="Hello there.", words=None)]) == ""
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_process_workers_load_their_own_model(run, monkeypatch, tmp_path):
+    monkeypatch.setattr(transcription, "WhisperModel", _FakeWhisperModel)
+    monkeypatch.setattr(transcription, "_models", {})
+    monkeypatch.setattr(_FakeWhisperModel, "load_dir", str(tmp_path))
+    results = []
+
+    async def main():
+        scheduler = TranscriptionScheduler(
+            lambda job, segments: results.append(segments[0].text),
+            workers=2, kind="process", model_name="fake",
+        )
+        await scheduler.start()
+        for i in range(3):
+            scheduler.submit(i * RATE, np.zeros(RATE * (i + 1), dtype=np.float32))
+        await scheduler.stop()
+        return scheduler.stats()
+
+    stats = run(main())
+    assert results == ["fake 1s", "fake 2s", "fake 3s"]
+    assert stats["processed_jobs"] == 3
+    # Every worker process warmed up with its own model; the parent loaded none.
+    assert _wait_for(lambda: len(list(tmp_path.iterdir())) == 2)
+    assert f"fake-{os.getpid()}" not in os.listdir(tmp_path)
+    assert transcription._models == {}
@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+
+from jarvis.layer2 import uplink
+from jarvis.layer2.uplink import ThroughputMeter, Uplink, VideoRateController
+
+
+def _send(meter, clock, nbytes, seconds, backlogged):
+    clock.now += seconds
+    meter.record(nbytes, backlogged)
+
+
+def test_saturated_window_measures_drained_bytes(clock):
+    meter = ThroughputMeter(window=2.0, clock=clock)
+    # A 50 KB/s link: with a backlog, 1 KB goes out every 20 ms whatever a
+    # single write's duration would suggest.
+    for _ in range(101):
+        _send(meter, clock, 1000, 0.02, backlogged=True)
+    assert 45_000 < meter.throughput < 55_000
+
+
+def test_idle_link_does_not_lower_the_estimate(clock):
+    meter = ThroughputMeter(window=2.0, clock=clock)
+    for _ in range(101):
+        _send(meter, clock, 1000, 0.02, backlogged=True)
+    measured = meter.throughput
+    # Light traffic that the link keeps up with says nothing about capacity.
+    for _ in range(30):
+        _send(meter, clock, 1000, 0.2, backlogged=False)
+    assert meter.throughput == measured
+
+
+def test_unsaturated_traffic_above_the_estimate_raises_it(clock):
+    meter = ThroughputMeter(window=2.0, clock=clock)
+    for _ in range(101):
+        _send(meter, clock, 1000, 0.02, backlogged=True)
+    for _ in range(101):
+        _send(meter, clock, 4000, 0.02, backlogged=False)
+    assert meter.throughput > 150_000
+
+
+def test_fast_writes_alone_give_no_estimate(clock):
+    meter = ThroughputMeter(window=2.0, clock=clock)
+    for _ in range(200):
+        _send(meter, clock, 1280, 0.04, backlogged=False)
+    assert meter.throughput is None
+
+
+def test_controller_backs_off_over_budget_frames(clock):
+    controller = VideoRateController(interval=1.0, quality=50, share=0.5)
+    controller.meter = ThroughputMeter(window=2.0, clock=clock)
+    for _ in range(101):
+        _send(controller.meter, clock, 1000, 0.02, backlogged=True)  # ~50 KB/s
+    controller.update(frame_bytes=60_000, send_latency=0.05)
+    assert controller.interval > 1.0 and controller.quality < 50
+    controller.update(frame_bytes=10_000, send_latency=0.05)
+    assert controller.quality == 45
+
+
+class _Session:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.images = []
+
+    def is_active(self):
+        return True
+
+    async def send_image(self, payload):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("socket closed")
+        self.images.append(payload)
+
+    async def send_audio(self, data):
+        pass
+
+
+class _StaticScreen:
+    """A frame buffer whose newest frame never changes."""
+
+    def __init__(self):
+        self.frame = SimpleNamespace(frame_id=1, has_crop=False, jpeg=lambda quality: b"frame")
+
+    def get_latest(self):
+        return self.frame
+
+
+def _stream(session, seconds=0.1, **kwargs):
+    link = Uplink(session, audio_reader=None, frame_buffer=_StaticScreen(),
+                  audio_event=asyncio.Event(),
+                  video_rate=VideoRateController(interval=0.01, min_interval=0.01), **kwargs)
+
+    async def main():
+        task = asyncio.create_task(link.run())
+        await asyncio.sleep(seconds)
+        link.stop()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    return link, main()
+
+
+def test_frame_lost_to_a_send_error_is_resent(run):
+    session = _Session(failures=1)
+    link, main = _stream(session)
+    run(main)
+    assert session.images == [b"frame"]
+    assert link.frames_sent == 1 and link.frames_unchanged > 0
+
+
+def test_stale_frame_drops_are_counted_and_retried(run):
+    before = uplink._dropped_metric.value
+    link, main = _stream(_Session(), frame_max_age=-1)
+    run(main)
+    assert link.frames_sent == 0
+    assert link.frames_dropped >= 2  # queued again after each drop
+    assert uplink._dropped_metric.value - before == link.frames_dropped
@@ -0,0 +1,60 @@
+import numpy as np
+
+from jarvis.layer1.audio_capture import VoiceActivityGate
+
+RATE = 16000
+BLOCK = RATE // 10
+
+
+def _noise(seconds, level, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(seconds * RATE)) * level).astype(np.float32)
+
+
+def _speechlike(seconds, level, modulation_db, seed=1):
+    """Noise with a 4 Hz syllable-rate envelope swinging by `modulation_db`."""
+    t = np.arange(int(seconds * RATE)) / RATE
+    depth = 10 ** (-modulation_db / 20)
+    envelope = depth + (1 - depth) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))
+    return _noise(seconds, level, seed) * envelope.astype(np.float32)
+
+
+def _detected(gate, audio):
+    blocks = [audio[i:i + BLOCK] for i in range(0, len(audio) - BLOCK + 1, BLOCK)]
+    return np.array([gate.is_speech(b) for b in blocks])
+
+
+def test_long_continuous_speech_stays_detected():
+    gate = VoiceActivityGate()
+    _detected(gate, _noise(2, 0.002))
+    flags = _detected(gate, _speechlike(60, 0.1, modulation_db=6))
+    assert flags[:50].mean() > 0.9
+    assert flags[-100:].mean() > 0.9
+
+
+def test_steady_sound_becomes_the_floor():
+    gate = VoiceActivityGate()
+    _detected(gate, _noise(2, 0.002))
+    flags = _detected(gate, _noise(10, 0.05, seed=2))
+    assert flags[:40].all()
+    assert not flags[-40:].any()
+
+
+def test_speech_over_steady_background():
+    gate = VoiceActivityGate()
+    background = _noise(40, 0.01, seed=3)
+    _detected(gate, background[:5 * RATE])
+    flags = _detected(gate, background[5 * RATE:] + _speechlike(35, 0.1, modulation_db=20))
+    assert flags[-100:].mean() > 0.5
+    assert not _detected(gate, _noise(3, 0.01, seed=4))[-10:].any()
+
+
+def test_floor_follows_background_up_and_down():
+    gate = VoiceActivityGate()
+    # Slowly rising background is tracked, not mistaken for speech.
+    ramp = np.concatenate([_noise(1, level, seed=i) for i, level in
+                           enumerate(np.geomspace(0.004, 0.03, 40))])
+    assert _detected(gate, ramp)[-10:].mean() < 0.2
+    # A quieter room lowers the floor again, so normal speech gets through.
+    _detected(gate, _noise(3, 0.003, seed=50))
+    assert _detected(gate, _noise(1, 0.02, seed=51)).all()
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from jarvis.layer1.wake_word import KeywordSpotter, wake_word_score, word_score
+
+
+@pytest.mark.parametrize("word", ["jarvis", "Jarvis", "jarvis's", "jervis", "jarvus", "javis"])
+def test_wake_word_renderings_match(word):
+    assert word_score(word) >= 0.8
+
+
+@pytest.mark.parametrize("word", ["jars", "jar", "java", "paris", "davis", "travis", "marvin",
+                                  "various", "harvest", "arrives", "carries", "jarred"])
+def test_ordinary_words_do_not_match(word):
+    assert word_score(word) < 0.7
+
+
+def test_wake_word_score_takes_best_word():
+    assert wake_word_score("Hey, Jarvis, what's that?") == 1.0
+    assert wake_word_score("We flew to Paris with Davis") == 0.0
+    assert wake_word_score("") == 0.0
+
+
+class _ScriptedModel:
+    """Stands in for WhisperModel: returns the scripted texts in order."""
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs):
+        self.calls += 1
+        text = self.texts.pop(0) if self.texts else ""
+        return [SimpleNamespace(text=text)], None
+
+
+def _spotter(texts):
+    spotter = KeywordSpotter(window_seconds=0.4, hop_seconds=0.2)
+    spotter._model = _ScriptedModel(texts)
+    return spotter
+
+
+def _speech_blocks(n):
+    rng = np.random.default_rng(0)
+    return [(rng.standard_normal(1600) * 8000).astype(np.int16) for _ in range(n)]
+
+
+def test_batch_is_finished_after_a_detection():
+    spotter = _spotter(["hey jarvis"])
+    assert spotter._feed_blocks(_speech_blocks(12))
+    assert spotter.detections == 1
+    # Blocks after the detection were fed into a fresh window, not dropped.
+    assert spotter.windows_checked > 1
+
+
+def test_reset_request_is_applied_by_the_worker():
+    spotter = _spotter([])
+    spotter._feed_blocks(_speech_blocks(3))
+    window = spotter._window
+    spotter.request_reset()
+    assert spotter._window is window
+    spotter._feed_blocks(_speech_blocks(1))
+    assert spotter._window is not window
+    assert not spotter._reset_pending